@@ -0,0 +1,80 @@
+"""
+Compares the CLIP inference backends on the CPU: images encoded per second, and the latency of encoding a
+query. Graphs are exported on first use and cached, so the first run of a backend takes longer to start.
+
+Usage:
+    python benchmarks/clip_backends.py photos/ --backends torch onnx torchscript --threads 4
+"""
+import argparse
+import os
+import statistics
+import time
+
+from PIL import Image
+
+from deepsearchai.embedding_models.clip import Clip
+from deepsearchai.embedding_models.registry import model_registry
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.data_source import DataSource
+
+QUERIES = [
+    "a dog playing in the snow",
+    "sunset over the ocean",
+    "a red car parked on the street",
+    "people sitting around a table",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("directory", help="Directory of images to encode")
+    parser.add_argument(
+        "--backends", nargs="+", default=["torch", "onnx", "torchscript"]
+    )
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--interop-threads", type=int, default=None)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=50)
+    args = parser.parse_args()
+
+    # Decoded once, so that only encoding is timed
+    images = []
+    for name in sorted(os.listdir(args.directory)):
+        try:
+            images.append(Image.open(os.path.join(args.directory, name)).convert("RGB"))
+        except OSError:
+            continue
+    print("Images: {}".format(len(images)))
+    print(
+        "{:<12} {:>12} {:>12} {:>12}".format(
+            "backend", "images/sec", "query p50ms", "query p95ms"
+        )
+    )
+    for backend in args.backends:
+        model = Clip(
+            batch_size=args.batch_size,
+            backend=backend,
+            num_threads=args.threads,
+            num_interop_threads=args.interop_threads,
+        )
+        # Loading and exporting the model is a one off cost, left out of the measurement
+        model_registry.warmup([model]).join()
+        start = time.perf_counter()
+        model.get_media_encodings(images, MEDIA_TYPE.IMAGE, DataSource.LOCAL)
+        images_per_second = len(images) / (time.perf_counter() - start)
+
+        latencies = []
+        for i in range(args.queries):
+            start = time.perf_counter()
+            model.get_text_encoding(QUERIES[i % len(QUERIES)])
+            latencies.append((time.perf_counter() - start) * 1000)
+        percentiles = statistics.quantiles(latencies, n=20)
+        print(
+            "{:<12} {:>12.1f} {:>12.1f} {:>12.1f}".format(
+                backend, images_per_second, percentiles[9], percentiles[18]
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Measures how image encoding throughput scales with the number of embedding worker processes, for CLIP and
+BLIP. Every worker count encodes the same images, split into batches which are all in flight at once, as
+during ingestion.
+
+Usage:
+    python benchmarks/embedding_workers.py photos/ --workers 1 2 4 8 --models clip blip
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from deepsearchai.embedding_models.blip_image_captioning import BlipImageCaptioning
+from deepsearchai.embedding_models.clip import Clip
+from deepsearchai.embedding_models.worker_pool import EmbeddingWorkerPool
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.data_source import DataSource
+from deepsearchai.sources.image_preprocessing import ImagePreprocessor
+
+MODELS = {"clip": Clip, "blip": BlipImageCaptioning}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("directory", help="Directory of images to encode")
+    parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    parser.add_argument("--models", nargs="+", choices=MODELS, default=["clip"])
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    # Decoded once, so that only encoding is timed
+    preprocessor = ImagePreprocessor()
+    images = []
+    for name in sorted(os.listdir(args.directory)):
+        try:
+            images.append(preprocessor.preprocess(os.path.join(args.directory, name)))
+        except OSError:
+            continue
+    batches = [
+        images[i : i + args.batch_size] for i in range(0, len(images), args.batch_size)
+    ]
+    print("Images: {}, cpus: {}".format(len(images), os.cpu_count()))
+    print("{:<6} {:>8} {:>12} {:>8}".format("model", "workers", "images/sec", "speedup"))
+    for model_name in args.models:
+        model = MODELS[model_name]()
+        baseline = None
+        for num_workers in args.workers:
+            pool = EmbeddingWorkerPool(num_workers)
+            # Loading the model in every worker is a one off cost, left out of the measurement
+            with ThreadPoolExecutor(max_workers=num_workers) as executor:
+                list(
+                    executor.map(
+                        lambda batch: pool.encode(
+                            model, batch, MEDIA_TYPE.IMAGE, DataSource.LOCAL
+                        ),
+                        batches[:num_workers],
+                    )
+                )
+                start = time.perf_counter()
+                list(
+                    executor.map(
+                        lambda batch: pool.encode(
+                            model, batch, MEDIA_TYPE.IMAGE, DataSource.LOCAL
+                        ),
+                        batches,
+                    )
+                )
+                images_per_second = len(images) / (time.perf_counter() - start)
+            pool.shutdown()
+            baseline = baseline if baseline else images_per_second
+            print(
+                "{:<6} {:>8} {:>12.1f} {:>8.2f}".format(
+                    model_name,
+                    num_workers,
+                    images_per_second,
+                    images_per_second / baseline,
+                )
+            )
+
+
+if __name__ == "__main__":
+    main()
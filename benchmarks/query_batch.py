@@ -0,0 +1,59 @@
+"""
+Compares the throughput of answering many queries one at a time with `App.get_data`, and all at once with
+`App.get_data_batch`, against an already ingested database.
+
+Usage:
+    python benchmarks/query_batch.py queries.txt --db db --media-types image audio --n-results 5
+"""
+import argparse
+import time
+
+from deepsearchai.app import App
+from deepsearchai.caches.query_cache import QueryEmbeddingCache
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.vector_databases.chromadb import ChromaDB
+from deepsearchai.vector_databases.configs.chromadb import ChromaDbConfig
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("queries", help="File with one query per line")
+    parser.add_argument("--db", default="db", help="Directory of the ChromaDB database")
+    parser.add_argument("--media-types", nargs="+", default=["image"])
+    parser.add_argument("--n-results", type=int, default=5)
+    args = parser.parse_args()
+
+    with open(args.queries) as f:
+        queries = [line.strip() for line in f if line.strip()]
+    media_types = [MEDIA_TYPE[media_type.upper()] for media_type in args.media_types]
+    app = App(vector_database=ChromaDB(config=ChromaDbConfig(dir=args.db)))
+    # Loading the models is a one off cost, left out of the measurement
+    app.get_data("warmup", media_types, args.n_results)
+
+    print("Queries: {}".format(len(queries)))
+    print("{:<10} {:>12} {:>9}".format("api", "queries/sec", "speedup"))
+
+    def run_one_at_a_time():
+        for query in queries:
+            app.get_data(query, media_types, args.n_results)
+
+    def run_batch():
+        app.get_data_batch(queries, media_types, args.n_results)
+
+    baseline = None
+    for name, run in [("get_data", run_one_at_a_time), ("batch", run_batch)]:
+        # Every api starts from a cold query cache, so that queries are encoded again
+        app.vector_database.query_cache = QueryEmbeddingCache()
+        start = time.perf_counter()
+        run()
+        queries_per_second = len(queries) / (time.perf_counter() - start)
+        baseline = baseline if baseline else queries_per_second
+        print(
+            "{:<10} {:>12.1f} {:>8.2f}x".format(
+                name, queries_per_second, queries_per_second / baseline
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+Measures the real-time factor of local whisper transcription on the CPU, for every combination of the
+supplied settings. The real-time factor is the transcription time divided by the duration of the audio,
+so anything below 1 transcribes faster than real time.
+
+Usage:
+    python benchmarks/whisper_cpu.py recording.mp3 --models tiny base --threads 4 8
+"""
+import argparse
+import itertools
+import time
+
+from deepsearchai.embedding_models.registry import model_registry
+from deepsearchai.embedding_models.whisper_model import Whisper
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.data_source import DataSource
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("file", help="Audio file to transcribe")
+    parser.add_argument("--models", nargs="+", default=["base"])
+    parser.add_argument("--threads", nargs="+", type=int, default=[4])
+    parser.add_argument(
+        "--quantize", nargs="+", type=int, choices=[0, 1], default=[0, 1]
+    )
+    parser.add_argument("--vad", nargs="+", type=int, choices=[0, 1], default=[0, 1])
+    args = parser.parse_args()
+
+    import whisper
+
+    # Decoded once, so that only transcription is timed
+    samples = whisper.load_audio(args.file)
+    duration = len(samples) / Whisper.SAMPLE_RATE
+    print("Audio duration: {:.1f}s".format(duration))
+    print(
+        "{:<12} {:>8} {:>8} {:>4} {:>10} {:>6} {:>9}".format(
+            "model", "threads", "quantize", "vad", "seconds", "rtf", "segments"
+        )
+    )
+    for model_name, num_threads, quantize, vad in itertools.product(
+        args.models, args.threads, args.quantize, args.vad
+    ):
+        model = Whisper(
+            model_name=model_name,
+            device="cpu",
+            quantize=bool(quantize),
+            vad=bool(vad),
+            num_threads=num_threads,
+        )
+        # Loading and quantizing the model is a one off cost, left out of the measurement
+        model_registry.warmup([model]).join()
+        start = time.perf_counter()
+        encoding = model.get_media_encoding(samples, MEDIA_TYPE.AUDIO, DataSource.LOCAL)
+        elapsed = time.perf_counter() - start
+        print(
+            "{:<12} {:>8} {:>8} {:>4} {:>10.1f} {:>6.2f} {:>9}".format(
+                model_name,
+                num_threads,
+                quantize,
+                vad,
+                elapsed,
+                elapsed / duration,
+                len(encoding["documents"]),
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
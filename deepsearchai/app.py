@@ -1,12 +1,13 @@
 from typing import Dict, List, Optional
 import os
 
+from deepsearchai.embedding_models.registry import model_registry
 from deepsearchai.embedding_models_config import EmbeddingModelsConfig
 from deepsearchai.enums import MEDIA_TYPE
 from deepsearchai.llms.base import BaseLLM
 from deepsearchai.llms.openai import OpenAi
 from deepsearchai.sources.utils import SourceUtils
-from deepsearchai.types import MediaData, QueryResult
+from deepsearchai.types import MediaData, QueryResult, QueryTimings
 from deepsearchai.vector_databases.base import BaseVectorDatabase
 from deepsearchai.vector_databases.chromadb import ChromaDB
 
@@ -17,7 +18,14 @@ class App:
             embedding_models_config: Optional[EmbeddingModelsConfig] = None,
             vector_database: Optional[BaseVectorDatabase] = None,
             llm: Optional[BaseLLM] = None,
+            source_utils: Optional[SourceUtils] = None,
+            warmup: bool = False,
     ):
+        """
+        :param warmup: Whether the embedding models are loaded in the background right away, so that
+            the first query does not wait for them. Models are shared by all the apps of a process
+            through `model_registry`, see `ModelRegistry` to unload idle ones
+        """
         self.embedding_models_config = (
             embedding_models_config
             if embedding_models_config
@@ -30,10 +38,24 @@ class App:
         )
 
         self.llm = llm if llm else OpenAi(self.vector_database)
-        self.source_utils = SourceUtils()
+        self.source_utils = source_utils if source_utils else SourceUtils()
+        if warmup:
+            model_registry.warmup(
+                self.embedding_models_config.get_all_embedding_models()
+            )
 
-    def add_data(self, source: str):
-        self.source_utils.add_data(
+    def add_data(self, source: str) -> Optional[List[str]]:
+        """
+        Ingests the supplied source. Returns the previously ingested documents which no longer exist
+        in the source, and whose vectors were deleted, for sources which track them.
+        """
+        return self.source_utils.add_data(
+            source, self.embedding_models_config, self.vector_database
+        )
+
+    async def aadd_data(self, source: str) -> Optional[List[str]]:
+        """Asyncio variant of `add_data`, ingesting the source in a bounded pool of threads."""
+        return await self.source_utils.aadd_data(
             source, self.embedding_models_config, self.vector_database
         )
 
@@ -44,11 +66,74 @@ class App:
         response = self.llm.query(query, data)
         return response
 
-    def get_data(
+    async def aquery(
             self, query: str, media_types: List[MEDIA_TYPE] = [MEDIA_TYPE.IMAGE], n_results: int = 1
+    ) -> QueryResult:
+        """
+        Asyncio variant of `query`. Queries are encoded and searched in bounded pools of threads, and the
+        LLM is awaited without holding a thread when it has an asyncio client.
+        """
+        data = await self.aget_data(query, media_types, n_results)
+        response = await self.llm.aquery(query, data)
+        return response
+
+    def get_data(
+            self,
+            query: str,
+            media_types: List[MEDIA_TYPE] = [MEDIA_TYPE.IMAGE],
+            n_results: int = 1,
+            timings: Optional[QueryTimings] = None,
     ) -> Dict[MEDIA_TYPE, List[MediaData]]:
+        """
+        :param timings: Filled in with how long the query took to search each collection when supplied,
+            see `SourceUtils.get_data`
+        """
         return self.source_utils.get_data(
-            query, media_types, self.embedding_models_config, self.vector_database, n_results
+            query,
+            media_types,
+            self.embedding_models_config,
+            self.vector_database,
+            n_results,
+            timings,
+        )
+
+    def get_data_batch(
+            self,
+            queries: List[str],
+            media_types: List[MEDIA_TYPE] = [MEDIA_TYPE.IMAGE],
+            n_results: int = 1,
+            timings: Optional[QueryTimings] = None,
+    ) -> List[Dict[MEDIA_TYPE, List[MediaData]]]:
+        """
+        Returns the results of `get_data` for every query, in order. Queries are encoded in batches and
+        every collection is searched for all of them in a single call, which is much faster than calling
+        `get_data` for each of them, e.g. for evaluations or bulk tagging.
+
+        :param timings: Filled in with how long the whole batch took when supplied
+        """
+        return self.source_utils.get_data_batch(
+            queries,
+            media_types,
+            self.embedding_models_config,
+            self.vector_database,
+            n_results,
+            timings,
+        )
+
+    async def aget_data(
+            self,
+            query: str,
+            media_types: List[MEDIA_TYPE] = [MEDIA_TYPE.IMAGE],
+            n_results: int = 1,
+            timings: Optional[QueryTimings] = None,
+    ) -> Dict[MEDIA_TYPE, List[MediaData]]:
+        return await self.source_utils.aget_data(
+            query,
+            media_types,
+            self.embedding_models_config,
+            self.vector_database,
+            n_results,
+            timings,
         )
 
     def run(self):
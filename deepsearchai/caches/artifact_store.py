@@ -0,0 +1,84 @@
+import json
+import os
+import sqlite3
+import threading
+import uuid
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+
+class ArtifactStore:
+    """
+    Content-addressed store of embedding model outputs, persisted in SQLite.
+
+    Artifacts, i.e. CLIP vectors, BLIP captions or Whisper segments, are keyed by the sha256 of the
+    media they were computed from along with the model name and version. The same bytes found under
+    another path, in another source, or re-indexed into a fresh vector database are therefore only
+    encoded once.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS artifacts ("
+                "content_hash TEXT, model_name TEXT, model_version TEXT, artifact TEXT, "
+                "PRIMARY KEY (content_hash, model_name, model_version))"
+            )
+
+    def get(
+        self, content_hash: str, model_name: str, model_version: str
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Returns the stored encodings in the format of `BaseEmbeddingModel.get_media_encoding`, with
+        freshly generated ids, or None when the media has not been encoded by this model yet.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT artifact FROM artifacts "
+                "WHERE content_hash = ? AND model_name = ? AND model_version = ?",
+                (content_hash, model_name, model_version),
+            ).fetchone()
+        if row is None:
+            return None
+        encodings = json.loads(row[0])
+        # Ids identify records in the vector database, so every copy of the media needs its own
+        encodings["ids"] = [str(uuid.uuid4()) for _ in range(encodings.pop("size"))]
+        return encodings
+
+    def put(
+        self,
+        content_hash: str,
+        model_name: str,
+        model_version: str,
+        encodings: Dict[str, Any],
+    ):
+        artifact = {key: value for key, value in encodings.items() if key != "ids"}
+        artifact["size"] = len(encodings.get("ids", []))
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO artifacts "
+                "(content_hash, model_name, model_version, artifact) VALUES (?, ?, ?, ?)",
+                (
+                    content_hash,
+                    model_name,
+                    model_version,
+                    json.dumps(artifact, default=_to_json),
+                ),
+            )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def _to_json(value: Any) -> Any:
+    # Embeddings are NumPy arrays
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError("{} is not JSON serializable".format(type(value)))
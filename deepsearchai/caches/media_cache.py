@@ -0,0 +1,162 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+
+class MediaCache:
+    """
+    Bounded on-disk cache of downloaded media, e.g. S3 objects or YouTube audio streams.
+
+    Files are keyed by the sha256 of their source URI and version, such as an S3 URL and its ETag, so
+    that a new version of an object never reuses a stale download. Downloads are written to a
+    temporary file and moved in place once complete, so a crash never leaves a partial file behind.
+    Once the cached files exceed `max_bytes`, the least recently used ones are deleted. Files can be
+    pinned while they are in use, e.g. until they are transcribed, in which case they are only deleted
+    once released.
+
+    The cache survives restarts: the files found in `directory` are picked up again, ordered by
+    their last use.
+    """
+
+    _TMP_SUFFIX = ".part"
+
+    def __init__(self, directory: str, max_bytes: int):
+        if max_bytes < 1:
+            raise ValueError("max_bytes should be a positive integer")
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._lock = threading.Lock()
+        # File name -> size in bytes, from the least to the most recently used
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        # File name -> number of users which have pinned it and not released it yet
+        self._pins: Dict[str, int] = {}
+        self._load()
+
+    def get(
+        self,
+        uri: str,
+        version: Optional[str] = None,
+        suffix: str = "",
+        pin: bool = False,
+    ) -> Optional[str]:
+        """
+        Returns the path of the cached media, or None if it has not been downloaded yet.
+
+        :param pin: Whether the file is kept until `release` is called with its path, defaults to False
+        """
+        name = self._get_name(uri, version, suffix)
+        with self._lock:
+            if name not in self._entries:
+                return None
+            self._entries.move_to_end(name)
+            if pin:
+                self._pin(name)
+        path = os.path.join(self.directory, name)
+        try:
+            # Keeps the order of use across restarts
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self.size -= self._entries.pop(name, 0)
+                self._pins.pop(name, None)
+            return None
+        return path
+
+    def get_or_download(
+        self,
+        uri: str,
+        version: Optional[str],
+        download: Callable[[str], None],
+        suffix: str = "",
+        pin: bool = False,
+    ) -> str:
+        """
+        Returns the path of the cached media, downloading it first if needed.
+
+        :param uri: Identifier of the media at its source, e.g. an S3 URL
+        :param version: Version of the media, e.g. an ETag. None for media which never changes
+        :param download: Writes the media to the path it is called with
+        :param suffix: Extension of the cached file, e.g. ".mp3", for tools which infer the format from it
+        :param pin: Whether the file is kept until `release` is called with its path, even if it falls
+            out of the budget, defaults to False
+        """
+        path = self.get(uri, version, suffix, pin)
+        if path:
+            return path
+
+        name = self._get_name(uri, version, suffix)
+        path = os.path.join(self.directory, name)
+        tmp_path = "{}.{}{}".format(path, threading.get_ident(), self._TMP_SUFFIX)
+        try:
+            download(tmp_path)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        size = os.path.getsize(path)
+        with self._lock:
+            self.size += size - self._entries.pop(name, 0)
+            self._entries[name] = size
+            if pin:
+                self._pin(name)
+            self._evict(keep=name)
+        return path
+
+    def release(self, path: str):
+        """Unpins a file returned with `pin`, which can be evicted again once all its users released it."""
+        name = os.path.basename(path)
+        with self._lock:
+            pins = self._pins.get(name)
+            if not pins:
+                return
+            if pins > 1:
+                self._pins[name] = pins - 1
+                return
+            del self._pins[name]
+            # Files pinned beyond the budget are evicted as soon as possible
+            self._evict()
+
+    def _pin(self, name: str):
+        self._pins[name] = self._pins.get(name, 0) + 1
+
+    def _evict(self, keep: Optional[str] = None):
+        # Pinned files are in use, and the file which was just added is kept even if it is larger than
+        # the whole budget
+        for name in list(self._entries):
+            if self.size <= self.max_bytes:
+                break
+            if name == keep or name in self._pins:
+                continue
+            self.size -= self._entries.pop(name)
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                pass
+
+    def _load(self):
+        files = []
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            if not os.path.isfile(path):
+                continue
+            if name.endswith(self._TMP_SUFFIX):
+                # Left over by an interrupted download
+                os.remove(path)
+                continue
+            stat = os.stat(path)
+            files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self._entries[name] = size
+            self.size += size
+        with self._lock:
+            if self._entries:
+                self._evict(keep=next(reversed(self._entries)))
+
+    def _get_name(self, uri: str, version: Optional[str], suffix: str) -> str:
+        key = "{}\0{}".format(uri, version if version else "")
+        return hashlib.sha256(key.encode("utf-8")).hexdigest() + suffix
@@ -0,0 +1,120 @@
+import os
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple
+
+import numpy as np
+from typing_extensions import TypedDict
+
+
+class QueryCacheStats(TypedDict):
+    memory_hits: int
+    disk_hits: int
+    misses: int
+
+
+class QueryEmbeddingCache:
+    """
+    Cache of query embeddings, keyed by model and normalized query text.
+
+    Lookups go through an in-memory LRU of `max_entries` embeddings first, then through an optional
+    SQLite file which survives restarts. Embeddings found on disk are promoted to memory.
+    """
+
+    def __init__(self, max_entries: int = 10_000, path: Optional[str] = None):
+        """
+        :param max_entries: Number of embeddings kept in memory, defaults to 10000
+        :param path: Path of the SQLite file backing the in-memory tier, defaults to None which keeps
+            embeddings in memory only
+        """
+        if max_entries < 1:
+            raise ValueError("max_entries should be a positive integer")
+        self.max_entries = max_entries
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Tuple[str, str], np.ndarray]" = OrderedDict()
+        self._stats: QueryCacheStats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+        self._connection = None
+        if path:
+            directory = os.path.dirname(os.path.abspath(path))
+            os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(path, check_same_thread=False)
+            with self._lock, self._connection:
+                self._connection.execute(
+                    "CREATE TABLE IF NOT EXISTS query_embeddings ("
+                    "model TEXT, query TEXT, embedding BLOB, PRIMARY KEY (model, query))"
+                )
+
+    def get_or_compute(
+        self, model: str, query: str, compute: Callable[[], Any]
+    ) -> np.ndarray:
+        """Returns the cached embedding of a query, calling `compute` to embed it on a miss."""
+        embedding = self.get(model, query)
+        if embedding is None:
+            embedding = self.put(model, query, compute())
+        return embedding
+
+    def get(self, model: str, query: str) -> Optional[np.ndarray]:
+        key = (model, self.normalize(query))
+        with self._lock:
+            embedding = self._entries.get(key)
+            if embedding is not None:
+                self._entries.move_to_end(key)
+                self._stats["memory_hits"] += 1
+                return embedding
+            if self._connection is not None:
+                row = self._connection.execute(
+                    "SELECT embedding FROM query_embeddings WHERE model = ? AND query = ?",
+                    key,
+                ).fetchone()
+                if row is not None:
+                    embedding = np.frombuffer(row[0], dtype=np.float32)
+                    self._remember(key, embedding)
+                    self._stats["disk_hits"] += 1
+                    return embedding
+            self._stats["misses"] += 1
+        return None
+
+    def put(self, model: str, query: str, embedding: Any) -> np.ndarray:
+        """Caches the embedding of a query, returned as the float32 array it is stored as."""
+        key = (model, self.normalize(query))
+        embedding = np.asarray(embedding, dtype=np.float32)
+        # Shared by every lookup, so it must not change under them
+        embedding.flags.writeable = False
+        with self._lock:
+            self._remember(key, embedding)
+            if self._connection is not None:
+                with self._connection:
+                    self._connection.execute(
+                        "INSERT OR REPLACE INTO query_embeddings (model, query, embedding) "
+                        "VALUES (?, ?, ?)",
+                        (*key, embedding.tobytes()),
+                    )
+        return embedding
+
+    def get_stats(self) -> QueryCacheStats:
+        """Returns the number of hits of either tier, and of misses, since the cache was created."""
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+    @staticmethod
+    def normalize(query: str) -> str:
+        """
+        Folds queries which only differ in case, whitespace or unicode representation together. The
+        tokenizers of CLIP and of the default sentence transformer lowercase their input anyway.
+        """
+        return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+    def _remember(self, key: Tuple[str, str], embedding: np.ndarray):
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
@@ -0,0 +1,146 @@
+import io
+from typing import List, Tuple
+
+import numpy as np
+from pydub import AudioSegment
+
+# Upload limit of OpenAI's transcription API
+MAX_UPLOAD_BYTES = 25 * 1024 * 1024
+# Duration of the windows loudness is measured over
+WINDOW_MS = 10
+
+
+def get_loudness(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """
+    Returns the loudness, in dBFS, of every `WINDOW_MS` window of mono samples scaled to [-1, 1].
+
+    Loudness is measured once per window over the whole file, rather than over a sliding window like
+    `pydub.silence` does, which keeps hours long recordings cheap to analyse.
+    """
+    samples_per_window = max(1, int(sample_rate * WINDOW_MS / 1000))
+    n_windows = len(samples) // samples_per_window
+    windows = np.asarray(samples[: n_windows * samples_per_window], dtype=np.float64)
+    rms = np.sqrt(np.mean(windows.reshape(n_windows, samples_per_window) ** 2, axis=1))
+    with np.errstate(divide="ignore"):
+        return 20 * np.log10(rms)
+
+
+def find_runs(mask: np.ndarray, min_duration_ms: int) -> List[Tuple[int, int]]:
+    """
+    Returns the runs of consecutive windows flagged in `mask` lasting at least `min_duration_ms`, as
+    start and end offsets in milliseconds.
+    """
+    edges = np.diff(np.concatenate(([0], mask.astype(np.int8), [0])))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    return [
+        (int(run_start) * WINDOW_MS, int(run_end) * WINDOW_MS)
+        for run_start, run_end in zip(run_starts, run_ends)
+        if (run_end - run_start) * WINDOW_MS >= min_duration_ms
+    ]
+
+
+class AudioChunkPlanner:
+    """
+    Splits audio into chunks for transcription, cutting at silences rather than mid-word.
+
+    Every chunk lasts between `min_chunk_ms` and `max_chunk_ms`, apart from the last one. Within that
+    range the cut is placed in the middle of the longest pause, and only falls back to a hard cut at
+    `max_chunk_ms` when the range contains no pause at all. Chunks are exported as mono compressed
+    audio at `frame_rate`, which is all speech recognition needs and keeps uploads small.
+    """
+
+    def __init__(
+        self,
+        min_chunk_ms: int = 60_000,
+        max_chunk_ms: int = 300_000,
+        min_silence_ms: int = 300,
+        silence_threshold_db: float = 16.0,
+        frame_rate: int = 16_000,
+        export_format: str = "mp3",
+        bitrate: str = "32k",
+        max_upload_bytes: int = MAX_UPLOAD_BYTES,
+    ):
+        """
+        :param min_chunk_ms: Minimum duration of a chunk, but the last one, defaults to 1 minute
+        :param max_chunk_ms: Maximum duration of a chunk, defaults to 5 minutes. It is lowered when
+            chunks of that duration could exceed `max_upload_bytes` at `bitrate`
+        :param min_silence_ms: Minimum duration of a pause the audio can be cut at, defaults to 300ms
+        :param silence_threshold_db: How many decibels below the average loudness of the file audio
+            has to be to count as silence, defaults to 16
+        :param frame_rate: Sample rate chunks are exported at, defaults to 16kHz
+        :param export_format: Format chunks are exported in, defaults to mp3
+        :param bitrate: Bitrate chunks are exported at, defaults to 32kbps
+        :param max_upload_bytes: Maximum size of an exported chunk, defaults to the API's 25MB limit
+        """
+        if not 0 < min_chunk_ms <= max_chunk_ms:
+            raise ValueError("min_chunk_ms should be positive and at most max_chunk_ms")
+        self.min_silence_ms = min_silence_ms
+        self.silence_threshold_db = silence_threshold_db
+        self.frame_rate = frame_rate
+        self.export_format = export_format
+        self.bitrate = bitrate
+        # Keeps a margin for the container overhead of the exported file
+        bytes_per_ms = self._parse_bitrate(bitrate) / 8 / 1000
+        self.max_chunk_ms = min(max_chunk_ms, int(max_upload_bytes * 0.9 / bytes_per_ms))
+        self.min_chunk_ms = min(min_chunk_ms, self.max_chunk_ms)
+
+    def load(self, file: str) -> AudioSegment:
+        """Decodes a file into the mono audio at `frame_rate` that chunks are planned and exported from."""
+        return AudioSegment.from_file(file).set_channels(1).set_frame_rate(self.frame_rate)
+
+    def plan(self, audio: AudioSegment) -> List[Tuple[int, int]]:
+        """Returns the start and end offsets, in milliseconds, of the chunks to transcribe."""
+        duration = len(audio)
+        silences = self._detect_silences(audio)
+        chunks = []
+        start = 0
+        while duration - start > self.max_chunk_ms:
+            window_start = start + self.min_chunk_ms
+            window_end = start + self.max_chunk_ms
+            end = window_end
+            longest_silence = 0
+            for silence_start, silence_end in silences:
+                if silence_end <= window_start:
+                    continue
+                if silence_start >= window_end:
+                    break
+                # Only the part of the pause inside the window counts
+                overlap_start = max(silence_start, window_start)
+                overlap_end = min(silence_end, window_end)
+                if overlap_end - overlap_start > longest_silence:
+                    longest_silence = overlap_end - overlap_start
+                    end = (overlap_start + overlap_end) // 2
+            chunks.append((start, end))
+            start = end
+        chunks.append((start, duration))
+        return chunks
+
+    def export(self, audio: AudioSegment, chunk: Tuple[int, int]) -> io.BytesIO:
+        """Encodes a chunk of planned audio into an in-memory file, ready to be uploaded."""
+        start, end = chunk
+        buffer = io.BytesIO()
+        buffer.name = "chunk.{}".format(self.export_format)
+        audio[start:end].export(buffer, format=self.export_format, bitrate=self.bitrate)
+        buffer.seek(0)
+        return buffer
+
+    def _detect_silences(self, audio: AudioSegment) -> List[Tuple[int, int]]:
+        """Returns the pauses of at least `min_silence_ms`, as start and end offsets in milliseconds."""
+        average_loudness = audio.dBFS
+        if np.isinf(average_loudness):
+            # Entirely silent, any point is as good as another
+            return [(0, len(audio))]
+        max_amplitude = float(1 << (8 * audio.sample_width - 1))
+        samples = np.array(audio.get_array_of_samples(), dtype=np.float64) / max_amplitude
+        loudness = get_loudness(samples, audio.frame_rate)
+        return find_runs(
+            loudness < average_loudness - self.silence_threshold_db, self.min_silence_ms
+        )
+
+    @staticmethod
+    def _parse_bitrate(bitrate: str) -> int:
+        """Returns a bitrate such as "32k" in bits per second."""
+        if bitrate.lower().endswith("k"):
+            return int(float(bitrate[:-1]) * 1000)
+        return int(bitrate)
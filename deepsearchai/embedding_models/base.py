@@ -1,10 +1,21 @@
-from typing import Any
+from typing import Any, Dict, List
 
 from deepsearchai.enums import MEDIA_TYPE
 from deepsearchai.sources.data_source import DataSource
+from .registry import ModelKey, model_registry
 
 
 class BaseEmbeddingModel:
+    MODEL_NAME = None
+    # Bump whenever the output of a model changes, so that previously cached artifacts are not reused
+    MODEL_VERSION = "1"
+    # Whether the model runs on weights loaded in the process, which `EmbeddingWorkerPool` can spread over
+    # several processes. Models calling a remote API are run in the ingesting process instead
+    LOCAL_WEIGHTS = True
+    # Whether the model reads the frames of videos. Sources which only fetch the audio of videos, e.g.
+    # YouTube, skip these models
+    REQUIRES_VIDEO_STREAM = False
+
     def __init__(self):
         pass
 
@@ -13,8 +24,46 @@ class BaseEmbeddingModel:
     ):
         raise NotImplementedError
 
+    def get_media_encodings(
+        self, data: List[Any], data_type: MEDIA_TYPE, datasource: DataSource
+    ) -> List[Dict[str, Any]]:
+        """
+        Batch variant of `get_media_encoding`, returns one encoding per item of `data`, in order.
+
+        Models which can encode several inputs in a single forward pass should override this.
+        """
+        return [self.get_media_encoding(item, data_type, datasource) for item in data]
+
+    def get_model_version(self) -> str:
+        """Version of the model outputs, part of the key under which they are cached."""
+        return self.MODEL_VERSION
+
     def get_text_encoding(self, query: str):
         raise NotImplementedError
 
+    def get_text_encodings(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """
+        Batch variant of `get_text_encoding`, returns one encoding per query, in order.
+
+        Models which can encode several texts in a single forward pass should override this.
+        """
+        return [self.get_text_encoding(query) for query in queries]
+
     def get_collection_name(self, media_type: MEDIA_TYPE):
         raise NotImplementedError
+
+    def _use_model(self):
+        """
+        Returns a context manager yielding the model's weights. They are shared with every other instance
+        of the same model, device and precision in the process through `model_registry`, and loaded with
+        `_create_model` on first use.
+        """
+        return model_registry.use(self._get_model_key(), self._create_model)
+
+    def _get_model_key(self) -> ModelKey:
+        """Returns the model name, device and precision the weights are shared under."""
+        raise NotImplementedError
+
+    def _create_model(self) -> Any:
+        """Loads the model's weights, called by `model_registry` on first use."""
+        raise NotImplementedError
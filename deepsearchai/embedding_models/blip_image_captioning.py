@@ -1,27 +1,75 @@
 import uuid
-from typing import Any
+from typing import Any, List, Optional
 
 from deepsearchai.enums import MEDIA_TYPE
 from deepsearchai.sources.data_source import DataSource
 from .base import BaseEmbeddingModel
+from .quantization import quantize_dynamic_int8
 
 
 class BlipImageCaptioning(BaseEmbeddingModel):
     MODEL_NAME = "Salesforce/blip-image-captioning-base"
 
-    def __init__(self):
-        self.processor = None
-        self.model = None
+    def __init__(
+        self,
+        batch_size: int = 16,
+        max_new_tokens: int = 30,
+        num_beams: int = 1,
+        quantize: bool = False,
+        device: Optional[str] = None,
+    ):
+        """
+        :param batch_size: Number of images captioned together, defaults to 16
+        :param max_new_tokens: Maximum number of tokens generated per caption, defaults to 30
+        :param num_beams: Number of beams of the beam search, 1 being greedy decoding, defaults to 1
+        :param quantize: Whether the linear layers are quantized to int8 for faster CPU inference, at a
+            small cost in accuracy. Only supported on the CPU, defaults to False
+        :param device: Device the model runs on, e.g. "cuda", defaults to None which uses the CPU
+        """
+        if batch_size < 1:
+            raise ValueError("batch_size should be a positive integer")
+        if quantize and device not in (None, "cpu"):
+            raise ValueError("Quantized BLIP models only run on the cpu")
+        self.batch_size = batch_size
+        self.max_new_tokens = max_new_tokens
+        self.num_beams = num_beams
+        self.quantize = quantize
+        self.device = device if device else "cpu"
 
     def get_media_encoding(
         self, data: Any, data_type: MEDIA_TYPE, datasource: DataSource
     ):
-        self._load_model()
-        inputs = self.processor(data, return_tensors="pt")
-        out = self.model.generate(**inputs)
-        caption = self.processor.decode(out[0], skip_special_tokens=True)
-        id = str(uuid.uuid4())
-        return {"documents": [caption], "ids": [id], "metadata": [{"type": "caption"}]}
+        return self.get_media_encodings([data], data_type, datasource)[0]
+
+    def get_media_encodings(
+        self, data: List[Any], data_type: MEDIA_TYPE, datasource: DataSource
+    ):
+        """
+        Captions a list of images, generating the captions of `batch_size` images at a time
+        """
+        import torch
+
+        captions = []
+        with self._use_model() as (processor, model):
+            for i in range(0, len(data), self.batch_size):
+                inputs = processor(
+                    images=data[i : i + self.batch_size], return_tensors="pt"
+                ).to(self.device)
+                with torch.inference_mode():
+                    out = model.generate(
+                        **inputs,
+                        max_new_tokens=self.max_new_tokens,
+                        num_beams=self.num_beams,
+                    )
+                captions.extend(processor.batch_decode(out, skip_special_tokens=True))
+        return [
+            {
+                "documents": [caption],
+                "ids": [str(uuid.uuid4())],
+                "metadata": [{"type": "caption"}],
+            }
+            for caption in captions
+        ]
 
     def get_text_encoding(self, query: str):
         return {"text": query}
@@ -29,18 +77,31 @@ class BlipImageCaptioning(BaseEmbeddingModel):
     def get_collection_name(self, media_type: MEDIA_TYPE):
         return "deepsearch-{}-captioning".format(media_type.name.lower())
 
-    def _load_model(self):
-        if not self.processor or not self.model:
-            try:
-                from transformers import (BlipForConditionalGeneration,
-                                          BlipProcessor)
-
-                self.processor = BlipProcessor.from_pretrained(self.MODEL_NAME)
-                self.model = BlipForConditionalGeneration.from_pretrained(
-                    self.MODEL_NAME
-                )
-            except ModuleNotFoundError:
-                raise ModuleNotFoundError(
-                    "The required dependencies for audio/video are not installed."
-                    ' Please install with `pip install --upgrade "deepsearchai[image]"`'
-                )
+    def get_model_version(self) -> str:
+        # Generation settings and quantization change the captions
+        version = "{}-t{}-b{}".format(
+            super().get_model_version(), self.max_new_tokens, self.num_beams
+        )
+        if self.quantize:
+            version += "-int8"
+        return version
+
+    def _get_model_key(self):
+        return self.MODEL_NAME, self.device, "int8" if self.quantize else "float32"
+
+    def _create_model(self):
+        try:
+            from transformers import (BlipForConditionalGeneration,
+                                      BlipProcessor)
+
+            processor = BlipProcessor.from_pretrained(self.MODEL_NAME)
+            model = BlipForConditionalGeneration.from_pretrained(self.MODEL_NAME)
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(
+                "The required dependencies for audio/video are not installed."
+                ' Please install with `pip install --upgrade "deepsearchai[image]"`'
+            )
+        model.eval()
+        if self.quantize:
+            model = quantize_dynamic_int8(model)
+        return processor, model.to(self.device)
@@ -1,17 +1,74 @@
+import os
+import tempfile
 import uuid
-from typing import Any
+from typing import Any, Dict, List, Optional
+
+import numpy as np
 
 from deepsearchai.enums import MEDIA_TYPE
 from deepsearchai.sources.data_source import DataSource
+from deepsearchai.utils import EMBEDDING_DTYPES
 from .base import BaseEmbeddingModel
+from .clip_backends import CLIP_BACKENDS, load_exported_clip
 
 
 class Clip(BaseEmbeddingModel):
     MODEL_NAME = "clip-ViT-B-32"
     SUPPORTED_MEDIA_TYPES = [MEDIA_TYPE.IMAGE]
 
-    def __init__(self):
-        self.model = None
+    def __init__(
+        self,
+        batch_size: int = 32,
+        backend: str = "torch",
+        num_threads: Optional[int] = None,
+        num_interop_threads: Optional[int] = None,
+        export_path: Optional[str] = None,
+        dtype: str = "float32",
+    ):
+        """
+        :param batch_size: Number of images encoded per forward pass, defaults to 32
+        :param backend: "torch" runs the model eagerly with sentence_transformers, picking CUDA when
+            available. "onnx" and "torchscript" run a graph exported from it on the cpu, which is faster
+            there. The graph is exported on first use, defaults to "torch"
+        :param num_threads: Number of threads an exported graph runs each operator with, defaults to None
+            which leaves the runtime's default
+        :param num_interop_threads: Number of threads an exported graph runs independent operators
+            with, defaults to None which leaves the runtime's default. torch shares a single inter-op
+            pool across the process, which can only be sized before its first use, so with the
+            "torchscript" backend this applies to the whole process and is only logged when too late
+        :param export_path: Directory the exported graph is cached in, defaults to
+            `<tempdir>/deepsearch/cache/models/<model>-<backend>`
+        :param dtype: Precision of the NumPy arrays embeddings are returned as, "float32" or "float16".
+            float16 halves the memory held by embeddings waiting to be written, defaults to "float32"
+        """
+        if backend not in CLIP_BACKENDS:
+            raise ValueError(
+                "Unsupported backend {}, expected one of {}".format(
+                    backend, CLIP_BACKENDS
+                )
+            )
+        if dtype not in EMBEDDING_DTYPES:
+            raise ValueError(
+                "Unsupported dtype {}, expected one of {}".format(
+                    dtype, EMBEDDING_DTYPES
+                )
+            )
+        self.batch_size = batch_size
+        self.backend = backend
+        self.dtype = dtype
+        self.num_threads = num_threads
+        self.num_interop_threads = num_interop_threads
+        self.export_path = (
+            export_path
+            if export_path
+            else os.path.join(
+                tempfile.gettempdir(),
+                "deepsearch",
+                "cache",
+                "models",
+                "{}-{}".format(self.MODEL_NAME, backend),
+            )
+        )
 
     def get_media_encoding(
         self, data: Any, data_type: MEDIA_TYPE, datasource: DataSource
@@ -19,31 +76,87 @@ class Clip(BaseEmbeddingModel):
         """
         Applies the CLIP model to evaluate the vector representation of the supplied image
         """
-        self._load_model()
-        if data_type not in self.SUPPORTED_MEDIA_TYPES:
-            raise ValueError(
-                "Unsupported dataType. Clip model supports only {}".format(
-                    self.SUPPORTED_MEDIA_TYPES
-                )
+        self._validate_media_type(data_type)
+        with self._use_model() as model:
+            image_features = model.encode(data)
+        return {
+            "embedding": self._to_dtype(image_features)[np.newaxis],
+            "ids": [str(uuid.uuid4())],
+        }
+
+    def get_media_encodings(
+        self, data: List[Any], data_type: MEDIA_TYPE, datasource: DataSource
+    ):
+        """
+        Applies the CLIP model to a list of images, running the encoder over `batch_size` images at a time
+        """
+        self._validate_media_type(data_type)
+        with self._use_model() as model:
+            image_features = self._to_dtype(
+                model.encode(data, batch_size=self.batch_size)
             )
-        image_features = self.model.encode(data)
-        return {"embedding": [image_features.tolist()], "ids": [str(uuid.uuid4())]}
+        # Every encoding holds a 1 row view of the batch's matrix, rather than a copy
+        return [
+            {"embedding": image_features[i : i + 1], "ids": [str(uuid.uuid4())]}
+            for i in range(len(image_features))
+        ]
 
     def get_text_encoding(self, query: str):
         """
         Applies the CLIP model to evaluate the vector representation of the supplied text
         """
-        self._load_model()
-        text_features = self.model.encode(query)
-        return {"embedding": text_features.tolist(), "meta_data": {}}
+        with self._use_model() as model:
+            text_features = model.encode(query)
+        return {"embedding": self._to_dtype(text_features), "meta_data": {}}
+
+    def get_text_encodings(self, queries: List[str]) -> List[Dict[str, Any]]:
+        """
+        Applies the CLIP model to a list of texts, running the encoder over `batch_size` texts at a time
+        """
+        with self._use_model() as model:
+            text_features = self._to_dtype(
+                model.encode(queries, batch_size=self.batch_size)
+            )
+        return [
+            {"embedding": text_features[i], "meta_data": {}}
+            for i in range(len(text_features))
+        ]
+
+    def _get_model_key(self):
+        if self.backend != "torch":
+            return "{}-{}".format(self.MODEL_NAME, self.backend), "cpu", "float32"
+        # sentence_transformers picks CUDA when available
+        return self.MODEL_NAME, "auto", "float32"
+
+    def _create_model(self):
+        if self.backend != "torch":
+            return load_exported_clip(
+                self.MODEL_NAME,
+                self.backend,
+                self.export_path,
+                self.num_threads,
+                self.num_interop_threads,
+            )
+        from sentence_transformers import SentenceTransformer
 
-    def _load_model(self):
-        """Load data from a director of images."""
-        if self.model is None:
-            from sentence_transformers import SentenceTransformer
+        return SentenceTransformer(self.MODEL_NAME)
 
-            # load model
-            self.model = SentenceTransformer(self.MODEL_NAME)
+    def get_model_version(self) -> str:
+        version = super().get_model_version()
+        if self.dtype != "float32":
+            version += "-" + self.dtype
+        return version
+
+    def _to_dtype(self, features: Any) -> np.ndarray:
+        return np.ascontiguousarray(features, dtype=self.dtype)
 
     def get_collection_name(self, media_type: MEDIA_TYPE):
         return "deepsearch-{}".format(media_type.name.lower())
+
+    def _validate_media_type(self, data_type: MEDIA_TYPE):
+        if data_type not in self.SUPPORTED_MEDIA_TYPES:
+            raise ValueError(
+                "Unsupported dataType. Clip model supports only {}".format(
+                    self.SUPPORTED_MEDIA_TYPES
+                )
+            )
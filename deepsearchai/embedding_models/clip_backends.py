@@ -0,0 +1,311 @@
+import inspect
+import logging
+import os
+import shutil
+import tempfile
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .torch_threads import torch_num_threads
+
+logger = logging.getLogger(__name__)
+
+# Eager PyTorch through sentence_transformers, or a graph exported from it
+CLIP_BACKENDS = ["torch", "torchscript", "onnx"]
+
+_ENCODER_FILES = {
+    "torchscript": ("image_encoder.pt", "text_encoder.pt"),
+    "onnx": ("image_encoder.onnx", "text_encoder.onnx"),
+}
+_IMAGE_INPUTS = ["pixel_values"]
+_TEXT_INPUTS = ["input_ids", "attention_mask"]
+
+# Takes the encoder's inputs as numpy arrays and returns the embeddings
+Encoder = Callable[..., np.ndarray]
+
+
+class ExportedClip:
+    """
+    CLIP image and text encoders running an exported graph, with the `encode` interface of
+    sentence_transformers' CLIP model, so that `Clip` uses either interchangeably.
+    """
+
+    def __init__(self, processor: Any, image_encoder: Encoder, text_encoder: Encoder):
+        self.processor = processor
+        self.image_encoder = image_encoder
+        self.text_encoder = text_encoder
+
+    def encode(self, inputs: Any, batch_size: int = 32) -> np.ndarray:
+        """
+        Returns the embeddings of an image or text, or of a list of images and texts in the same order.
+        """
+        if not isinstance(inputs, list):
+            return self.encode([inputs], batch_size=batch_size)[0]
+        embeddings: List[Optional[np.ndarray]] = [None] * len(inputs)
+        text_indexes = [i for i, item in enumerate(inputs) if isinstance(item, str)]
+        image_indexes = [i for i, item in enumerate(inputs) if not isinstance(item, str)]
+        for indexes, encode_batch in [
+            (image_indexes, self._encode_images),
+            (text_indexes, self._encode_texts),
+        ]:
+            for start in range(0, len(indexes), batch_size):
+                batch = indexes[start : start + batch_size]
+                for index, embedding in zip(
+                    batch, encode_batch([inputs[i] for i in batch])
+                ):
+                    embeddings[index] = embedding
+        return np.stack(embeddings)
+
+    def _encode_images(self, images: List[Any]) -> np.ndarray:
+        features = self.processor(images=images, return_tensors="np")
+        return self.image_encoder(
+            pixel_values=features["pixel_values"].astype(np.float32)
+        )
+
+    def _encode_texts(self, texts: List[str]) -> np.ndarray:
+        features = self.processor(
+            text=texts, return_tensors="np", padding=True, truncation=True
+        )
+        return self.text_encoder(
+            **{name: features[name].astype(np.int64) for name in _TEXT_INPUTS}
+        )
+
+
+def load_exported_clip(
+    model_name: str,
+    backend: str,
+    directory: str,
+    num_threads: Optional[int] = None,
+    num_interop_threads: Optional[int] = None,
+) -> ExportedClip:
+    """
+    Loads the exported encoders of a sentence_transformers CLIP model from `directory`, exporting them
+    there first if they are not yet.
+    """
+    from transformers import CLIPProcessor
+
+    if not is_exported(backend, directory):
+        from sentence_transformers import SentenceTransformer
+
+        clip_module = SentenceTransformer(model_name, device="cpu")[0]
+        logger.info("Exporting %s to %s", model_name, backend)
+        export_clip(
+            clip_module.model, backend, directory, processor=clip_module.processor
+        )
+    image_encoder, text_encoder = load_encoders(
+        backend, directory, num_threads, num_interop_threads
+    )
+    return ExportedClip(
+        CLIPProcessor.from_pretrained(directory), image_encoder, text_encoder
+    )
+
+
+def is_exported(backend: str, directory: str) -> bool:
+    return all(
+        os.path.exists(os.path.join(directory, name))
+        for name in _ENCODER_FILES[backend]
+    )
+
+
+def export_clip(model: Any, backend: str, directory: str, processor: Any = None):
+    """
+    Exports the image and text encoders of a transformers `CLIPModel` to TorchScript or ONNX, along with
+    its processor. The files are written to a temporary directory first and moved in place once complete,
+    so that an interrupted export is never loaded.
+    """
+    import torch
+
+    config = model.config.vision_config
+    pixel_values = torch.zeros(1, 3, config.image_size, config.image_size)
+    input_ids = torch.ones(2, 7, dtype=torch.long)
+    attention_mask = torch.ones(2, 7, dtype=torch.long)
+    image_encoder, text_encoder = _wrap_encoders(model)
+    encoders = [
+        (image_encoder, (pixel_values,), _IMAGE_INPUTS),
+        (text_encoder, (input_ids, attention_mask), _TEXT_INPUTS),
+    ]
+
+    parent = os.path.dirname(os.path.abspath(directory))
+    os.makedirs(parent, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=parent, prefix=".export-")
+    try:
+        for (encoder, example, names), file_name in zip(
+            encoders, _ENCODER_FILES[backend]
+        ):
+            path = os.path.join(staging, file_name)
+            if backend == "onnx":
+                _export_onnx(encoder, example, names, path)
+            else:
+                with torch.inference_mode():
+                    traced = torch.jit.freeze(torch.jit.trace(encoder, example))
+                torch.jit.save(traced, path)
+        if processor is not None:
+            processor.save_pretrained(staging)
+        try:
+            os.replace(staging, directory)
+        except OSError:
+            # Exported concurrently by another process, whose files are kept
+            if not is_exported(backend, directory):
+                raise
+    finally:
+        shutil.rmtree(staging, ignore_errors=True)
+
+
+def load_encoders(
+    backend: str,
+    directory: str,
+    num_threads: Optional[int] = None,
+    num_interop_threads: Optional[int] = None,
+) -> Tuple[Encoder, Encoder]:
+    """Returns the exported image and text encoders in `directory`."""
+    image_file, text_file = _ENCODER_FILES[backend]
+    if backend == "onnx":
+        return (
+            _OnnxEncoder(
+                os.path.join(directory, image_file), num_threads, num_interop_threads
+            ),
+            _OnnxEncoder(
+                os.path.join(directory, text_file), num_threads, num_interop_threads
+            ),
+        )
+    if num_interop_threads:
+        _set_torch_interop_threads(num_interop_threads)
+    return (
+        _TorchScriptEncoder(
+            os.path.join(directory, image_file), _IMAGE_INPUTS, num_threads
+        ),
+        _TorchScriptEncoder(
+            os.path.join(directory, text_file), _TEXT_INPUTS, num_threads
+        ),
+    )
+
+
+def _wrap_encoders(model: Any) -> Tuple[Any, Any]:
+    """Returns torch modules computing the image and text features of a transformers `CLIPModel`."""
+    import torch
+
+    class ImageEncoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, pixel_values):
+            return _get_features(self.model.get_image_features(pixel_values=pixel_values))
+
+    class TextEncoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.model = model
+
+        def forward(self, input_ids, attention_mask):
+            return _get_features(
+                self.model.get_text_features(
+                    input_ids=input_ids, attention_mask=attention_mask
+                )
+            )
+
+    return ImageEncoder().eval(), TextEncoder().eval()
+
+
+def _get_features(output: Any) -> Any:
+    # Recent versions of transformers return the projected features as the pooler output
+    return output if hasattr(output, "shape") else output.pooler_output
+
+
+def _export_onnx(encoder: Any, example: Tuple[Any, ...], names: List[str], path: str):
+    import torch
+
+    # Dynamic batch and sequence lengths
+    dynamic_axes = {name: {0: "batch"} for name in names}
+    for name in set(names) & set(_TEXT_INPUTS):
+        dynamic_axes[name][1] = "sequence"
+    kwargs: Dict[str, Any] = {}
+    if "dynamo" in inspect.signature(torch.onnx.export).parameters:
+        # Recent versions of torch default to the dynamo exporter, which needs onnxscript
+        kwargs["dynamo"] = False
+    try:
+        torch.onnx.export(
+            encoder,
+            example,
+            path,
+            input_names=names,
+            output_names=["embeddings"],
+            dynamic_axes=dynamic_axes,
+            opset_version=17,
+            **kwargs
+        )
+    except torch.onnx.OnnxExporterError as e:
+        raise ModuleNotFoundError(
+            "The required dependencies for the onnx backend are not installed."
+            " Please install with `pip install --upgrade onnx onnxruntime`"
+        ) from e
+
+
+class _OnnxEncoder:
+    def __init__(
+        self,
+        path: str,
+        num_threads: Optional[int] = None,
+        num_interop_threads: Optional[int] = None,
+    ):
+        try:
+            import onnxruntime
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(
+                "The required dependencies for the onnx backend are not installed."
+                " Please install with `pip install --upgrade onnx onnxruntime`"
+            )
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = (
+            onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        )
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        if num_interop_threads:
+            # Inter-op threads only run independent branches of the graph in parallel mode
+            options.execution_mode = onnxruntime.ExecutionMode.ORT_PARALLEL
+            options.inter_op_num_threads = num_interop_threads
+        self.session = onnxruntime.InferenceSession(
+            path, options, providers=["CPUExecutionProvider"]
+        )
+
+    def __call__(self, **inputs: np.ndarray) -> np.ndarray:
+        return self.session.run(None, inputs)[0]
+
+
+class _TorchScriptEncoder:
+    def __init__(
+        self, path: str, input_names: List[str], num_threads: Optional[int] = None
+    ):
+        import torch
+
+        self.module = torch.jit.load(path, map_location="cpu")
+        self.input_names = input_names
+        self.num_threads = num_threads
+
+    def __call__(self, **inputs: np.ndarray) -> np.ndarray:
+        import torch
+
+        # Only CLIP's forward passes run with its thread count, other models keep theirs
+        with torch_num_threads(self.num_threads), torch.inference_mode():
+            output = self.module(
+                *[torch.from_numpy(inputs[name]) for name in self.input_names]
+            )
+        return output.numpy()
+
+
+def _set_torch_interop_threads(num_interop_threads: int):
+    import torch
+
+    if torch.get_num_interop_threads() == num_interop_threads:
+        return
+    try:
+        torch.set_num_interop_threads(num_interop_threads)
+    except RuntimeError:
+        # torch's inter-op pool is shared by the whole process, and sized once before its first use
+        logger.warning(
+            "Could not set the number of inter-op threads to %s, torch already started its pool of %s",
+            num_interop_threads,
+            torch.get_num_interop_threads(),
+        )
@@ -0,0 +1,16 @@
+def quantize_dynamic_int8(model):
+    """
+    Quantizes the linear layers of a torch model to int8 for CPU inference, with activations quantized
+    on the fly. The model is quantized in place, which avoids holding a float copy of the weights, and
+    returned.
+    """
+    import torch
+
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            # torch only quantizes the exact nn.Linear type. Subclasses such as whisper's only cast their
+            # weights to the input's dtype, which is always float32 on the cpu
+            module.__class__ = torch.nn.Linear
+    return torch.quantization.quantize_dynamic(
+        model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True
+    )
@@ -0,0 +1,181 @@
+import contextlib
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, Optional, Tuple
+
+from typing_extensions import TypedDict
+
+# Model name, device and precision, e.g. ("clip-ViT-B-32", "cpu", "float32")
+ModelKey = Tuple[str, str, str]
+
+
+class LoadedModelInfo(TypedDict):
+    # Bytes held by the model's parameters and buffers
+    memory_bytes: int
+    # Seconds it took to load the model
+    load_seconds: float
+    # Seconds since the model was last used
+    idle_seconds: float
+    # Number of threads currently using the model
+    users: int
+
+
+class _Entry:
+    def __init__(self):
+        # Held while loading, so that concurrent first uses load the model once
+        self.lock = threading.Lock()
+        self.model: Any = None
+        self.memory_bytes = 0
+        self.load_seconds = 0.0
+        self.last_used = time.monotonic()
+        self.users = 0
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of loaded models, holding one shared instance per model, device and precision.
+
+    Embedding models fetch their weights from the registry whenever they use them rather than holding
+    them, so that every `App`, vector database and `EmbeddingModelsConfig` in a process shares them, and
+    so that they can be unloaded once idle. Models are loaded on first use, or ahead of it with `warmup`.
+    """
+
+    def __init__(self, idle_timeout: Optional[float] = None):
+        """
+        :param idle_timeout: Seconds after which a model which has not been used is unloaded, defaults
+            to None which keeps models loaded for the lifetime of the process
+        """
+        self._lock = threading.Lock()
+        self._entries: Dict[ModelKey, _Entry] = {}
+        self._reaper: Optional[threading.Thread] = None
+        self.idle_timeout = None
+        self.set_idle_timeout(idle_timeout)
+
+    def set_idle_timeout(self, idle_timeout: Optional[float]):
+        """Sets the seconds after which unused models are unloaded, None keeping them loaded."""
+        if idle_timeout is not None and idle_timeout <= 0:
+            raise ValueError("idle_timeout should be positive")
+        with self._lock:
+            self.idle_timeout = idle_timeout
+            if idle_timeout is not None and self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap, daemon=True)
+                self._reaper.start()
+
+    @contextlib.contextmanager
+    def use(self, key: ModelKey, loader: Callable[[], Any]) -> Iterator[Any]:
+        """
+        Yields the shared instance of a model, calling `loader` to load it if it is not loaded yet. The
+        model is not unloaded while in use.
+        """
+        with self._lock:
+            entry = self._entries.setdefault(key, _Entry())
+            entry.users += 1
+        try:
+            with entry.lock:
+                if entry.model is None:
+                    start = time.monotonic()
+                    entry.model = loader()
+                    entry.load_seconds = time.monotonic() - start
+                    entry.memory_bytes = get_memory_usage(entry.model)
+            yield entry.model
+        finally:
+            with self._lock:
+                entry.users -= 1
+                entry.last_used = time.monotonic()
+
+    def warmup(self, models: Iterable[Any]) -> threading.Thread:
+        """
+        Loads the weights of the supplied embedding models in a background thread, so that the first
+        query does not pay for them. Returns the thread, which can be joined to wait for the warmup.
+        """
+        models = list(models)
+
+        def load():
+            for model in models:
+                try:
+                    with model._use_model():
+                        pass
+                except NotImplementedError:
+                    # Models without local weights, e.g. ones calling an API
+                    continue
+                except Exception as e:
+                    print("Error while warming up {}".format(model.MODEL_NAME))
+                    print(e)
+
+        thread = threading.Thread(target=load, daemon=True)
+        thread.start()
+        return thread
+
+    def unload(self, key: ModelKey):
+        """Drops the registry's reference to a model, which is freed once its current users are done."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+        if entry is not None:
+            with entry.lock:
+                entry.model = None
+
+    def unload_idle(self):
+        """Unloads the models which have not been used for `idle_timeout` seconds."""
+        if self.idle_timeout is None:
+            return
+        now = time.monotonic()
+        with self._lock:
+            idle_keys = [
+                key
+                for key, entry in self._entries.items()
+                if entry.model is not None
+                and entry.users == 0
+                and now - entry.last_used >= self.idle_timeout
+            ]
+            for key in idle_keys:
+                del self._entries[key]
+
+    def get_loaded_models(self) -> Dict[ModelKey, LoadedModelInfo]:
+        """Returns the models currently loaded, along with the memory they hold."""
+        now = time.monotonic()
+        with self._lock:
+            return {
+                key: {
+                    "memory_bytes": entry.memory_bytes,
+                    "load_seconds": entry.load_seconds,
+                    "idle_seconds": 0.0 if entry.users else now - entry.last_used,
+                    "users": entry.users,
+                }
+                for key, entry in self._entries.items()
+                if entry.model is not None
+            }
+
+    def get_memory_usage(self) -> int:
+        """Returns the bytes held by all the loaded models."""
+        return sum(
+            info["memory_bytes"] for info in self.get_loaded_models().values()
+        )
+
+    def _reap(self):
+        while True:
+            idle_timeout = self.idle_timeout
+            # Checks a few times per timeout, so that models are unloaded at most a quarter late
+            time.sleep(min(idle_timeout / 4, 60) if idle_timeout else 60)
+            self.unload_idle()
+
+
+def get_memory_usage(model: Any) -> int:
+    """Returns the bytes held by the tensors of a torch module, or of a tuple of modules."""
+    if isinstance(model, (tuple, list)):
+        return sum(get_memory_usage(item) for item in model)
+    if not hasattr(model, "state_dict"):
+        return 0
+    return sum(_get_tensor_bytes(value) for value in model.state_dict().values())
+
+
+def _get_tensor_bytes(value: Any) -> int:
+    if isinstance(value, (tuple, list)):
+        # Quantized layers store their packed weights and bias as a tuple
+        return sum(_get_tensor_bytes(item) for item in value)
+    if hasattr(value, "element_size") and hasattr(value, "numel"):
+        return value.element_size() * value.numel()
+    return 0
+
+
+# Shared by all the embedding models of the process
+model_registry = ModelRegistry()
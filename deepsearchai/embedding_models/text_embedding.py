@@ -0,0 +1,120 @@
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional
+
+import numpy as np
+
+from deepsearchai.utils import EMBEDDING_DTYPES
+from .registry import model_registry
+from .torch_threads import torch_num_threads
+
+
+class TextEmbeddingModel:
+    """
+    Embeds the text documents stored by the transcription and captioning models, and the queries which
+    search them, with a sentence_transformers model.
+
+    Vector databases hand documents to `embed` in batches of their own rather than letting the database
+    embed them on insert, so that the batch size, threads and precision are under our control. Embeddings
+    of the last `cache_size` distinct texts are kept in memory, so that repeated transcript segments and
+    captions are only embedded once across files.
+
+    Also usable as a ChromaDB embedding function.
+    """
+
+    DEFAULT_MODEL_NAME = "all-MiniLM-L6-v2"
+
+    def __init__(
+        self,
+        model_name: str = DEFAULT_MODEL_NAME,
+        batch_size: int = 64,
+        num_threads: Optional[int] = None,
+        dtype: str = "float32",
+        cache_size: int = 10_000,
+    ):
+        """
+        :param model_name: Name of the sentence_transformers model, defaults to "all-MiniLM-L6-v2", the
+            model ChromaDB embeds documents with by default
+        :param batch_size: Number of texts embedded per forward pass, defaults to 64
+        :param num_threads: Number of threads torch runs on the cpu while embedding, defaults to None which
+            leaves torch's default
+        :param dtype: Precision of the NumPy arrays embeddings are returned as, "float32" or "float16",
+            defaults to "float32"
+        :param cache_size: Number of embeddings kept in memory, defaults to 10000. 0 disables the cache
+        """
+        if dtype not in EMBEDDING_DTYPES:
+            raise ValueError(
+                "Unsupported dtype {}, expected one of {}".format(
+                    dtype, EMBEDDING_DTYPES
+                )
+            )
+        if batch_size < 1:
+            raise ValueError("batch_size should be a positive integer")
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.dtype = dtype
+        self.cache_size = cache_size
+        self._lock = threading.Lock()
+        self._cache: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+    def __call__(self, input: List[str]) -> List[List[float]]:
+        # The signature of ChromaDB's embedding functions, which expect lists of floats
+        return self.embed(input).tolist()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Returns the embeddings of `texts` as a matrix with one row per text, in order."""
+        embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
+        # Texts missing from the cache, with the positions they appear at
+        missing: "OrderedDict[str, List[int]]" = OrderedDict()
+        with self._lock:
+            for i, text in enumerate(texts):
+                embedding = self._cache.get(text)
+                if embedding is not None:
+                    self._cache.move_to_end(text)
+                    embeddings[i] = embedding
+                else:
+                    missing.setdefault(text, []).append(i)
+
+        if missing:
+            with model_registry.use(
+                self._get_model_key(), self._create_model
+            ) as model, torch_num_threads(self.num_threads):
+                computed = np.asarray(
+                    model.encode(
+                        list(missing),
+                        batch_size=self.batch_size,
+                        convert_to_numpy=True,
+                    ),
+                    dtype=self.dtype,
+                )
+            with self._lock:
+                for (text, positions), embedding in zip(missing.items(), computed):
+                    for i in positions:
+                        embeddings[i] = embedding
+                    self._remember(text, embedding)
+
+        if not embeddings:
+            return np.empty((0, 0), dtype=self.dtype)
+        return np.ascontiguousarray(np.stack(embeddings), dtype=self.dtype)
+
+    def get_model_version(self) -> str:
+        """Identifies the embeddings, texts embedded by models with different versions cannot be compared."""
+        return self.model_name
+
+    def _remember(self, text: str, embedding: np.ndarray):
+        if self.cache_size <= 0:
+            return
+        # Copied, so that the cache does not hold on to the whole batch's matrix
+        self._cache[text] = embedding.copy()
+        self._cache.move_to_end(text)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _get_model_key(self):
+        return self.model_name, "cpu", "float32"
+
+    def _create_model(self) -> Any:
+        from sentence_transformers import SentenceTransformer
+
+        return SentenceTransformer(self.model_name, device="cpu")
@@ -0,0 +1,37 @@
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+_lock = threading.Lock()
+# Number of threads inside `torch_num_threads`, and torch's thread count before the first one entered
+_users = 0
+_default_num_threads: Optional[int] = None
+
+
+@contextmanager
+def torch_num_threads(num_threads: Optional[int]) -> Iterator[None]:
+    """
+    Runs torch's CPU inference with `num_threads` threads, restoring the previous count afterwards.
+
+    torch's thread count is process-wide, so models setting their own would otherwise change it for
+    every other model of the process. When several threads overlap, the count of the last one to enter
+    applies until all of them have left. None leaves the count untouched.
+    """
+    global _users, _default_num_threads
+    if not num_threads:
+        yield
+        return
+    import torch
+
+    with _lock:
+        if _users == 0:
+            _default_num_threads = torch.get_num_threads()
+        _users += 1
+        torch.set_num_threads(num_threads)
+    try:
+        yield
+    finally:
+        with _lock:
+            _users -= 1
+            if _users == 0:
+                torch.set_num_threads(_default_num_threads)
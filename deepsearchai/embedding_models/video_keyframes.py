@@ -0,0 +1,262 @@
+import subprocess
+import tempfile
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.data_source import DataSource
+from .base import BaseEmbeddingModel
+from .clip import Clip
+
+
+class SceneChangeDetector:
+    """
+    Selects the first frame of every scene, by comparing the colour histogram of each frame with the one of
+    the last selected frame.
+
+    Histograms are computed over a subsample of the frame's pixels, which costs next to nothing compared
+    to encoding it. Comparing with the last keyframe rather than the previous frame catches slow
+    transitions and pans as well as cuts.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.35,
+        min_scene_seconds: float = 1.0,
+        bins: int = 16,
+        stride: int = 4,
+    ):
+        """
+        :param threshold: Share of the histogram which has to change for a frame to start a new scene,
+            between 0 and 1, defaults to 0.35
+        :param min_scene_seconds: Minimum duration of a scene, which keeps flashes and fast cuts from
+            selecting every frame, defaults to 1 second
+        :param bins: Number of histogram bins per colour channel, defaults to 16
+        :param stride: Only every `stride`th pixel along each axis is counted, defaults to 4
+        """
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold should be between 0 and 1")
+        if 256 % bins:
+            raise ValueError("bins should divide 256")
+        self.threshold = threshold
+        self.min_scene_seconds = min_scene_seconds
+        self.bins = bins
+        self.stride = stride
+        self._keyframe_histogram: Optional[np.ndarray] = None
+        self._keyframe_timestamp = 0.0
+
+    def is_new_scene(self, frame: np.ndarray, timestamp: float) -> bool:
+        """Returns whether a HxWx3 uint8 frame starts a new scene, in which case it becomes the reference."""
+        histogram = self.get_histogram(frame)
+        if self._keyframe_histogram is not None:
+            if timestamp - self._keyframe_timestamp < self.min_scene_seconds:
+                return False
+            if self.get_distance(self._keyframe_histogram, histogram) < self.threshold:
+                return False
+        self._keyframe_histogram = histogram
+        self._keyframe_timestamp = timestamp
+        return True
+
+    def reset(self):
+        self._keyframe_histogram = None
+        self._keyframe_timestamp = 0.0
+
+    def get_histogram(self, frame: np.ndarray) -> np.ndarray:
+        pixels = frame[:: self.stride, :: self.stride].reshape(-1, 3)
+        # Bin of every channel value, offset so that the three channels share a single bincount
+        indexes = pixels // (256 // self.bins) + np.arange(3) * self.bins
+        histogram = np.bincount(indexes.ravel(), minlength=3 * self.bins)
+        return histogram / len(pixels)
+
+    @staticmethod
+    def get_distance(first: np.ndarray, second: np.ndarray) -> float:
+        """Share of pixels whose bin changed, averaged over the channels, between 0 and 1."""
+        return float(np.abs(first - second).sum() / 6)
+
+
+class VideoKeyframes(BaseEmbeddingModel):
+    """
+    Indexes what videos show, by encoding the first frame of every scene with CLIP.
+
+    Frames are streamed from ffmpeg at `sample_fps`, already resized and center cropped to the input size
+    of CLIP, and only those starting a new scene according to `SceneChangeDetector` are encoded. The cost
+    therefore grows with the number of scenes rather than with the number of frames, and a single frame is
+    held in memory besides the keyframes waiting to be encoded. Every keyframe is stored with the start
+    and end of its scene in seconds.
+
+    Requires the ffmpeg executable. Keyframes are not indexed by default, pass
+    `EmbeddingModelsConfig(image_embedding_model=clip, video_keyframes_model=VideoKeyframes(clip))` to
+    index them with the image model's weights.
+    """
+
+    MODEL_NAME = "video-keyframes"
+    SUPPORTED_MEDIA_TYPES = [MEDIA_TYPE.VIDEO]
+    REQUIRES_VIDEO_STREAM = True
+
+    def __init__(
+        self,
+        image_embedding_model: Optional[BaseEmbeddingModel] = None,
+        sample_fps: float = 2.0,
+        scene_threshold: float = 0.35,
+        min_scene_seconds: float = 1.0,
+        frame_size: int = 224,
+        batch_size: int = 32,
+    ):
+        """
+        :param image_embedding_model: Model keyframes and queries are encoded with, defaults to None which
+            uses `Clip()`
+        :param sample_fps: Number of frames per second considered by the scene change detector, defaults
+            to 2
+        :param scene_threshold: Share of the colour histogram which has to change for a frame to start a
+            new scene, see `SceneChangeDetector`, defaults to 0.35
+        :param min_scene_seconds: Minimum duration of a scene, defaults to 1 second
+        :param frame_size: Side of the square frames streamed from ffmpeg, defaults to 224, CLIP's input size
+        :param batch_size: Number of keyframes encoded together, defaults to 32
+        """
+        self.image_embedding_model = (
+            image_embedding_model if image_embedding_model else Clip()
+        )
+        self.sample_fps = sample_fps
+        self.scene_threshold = scene_threshold
+        self.min_scene_seconds = min_scene_seconds
+        self.frame_size = frame_size
+        self.batch_size = batch_size
+
+    def get_media_encoding(
+        self, data: str, data_type: MEDIA_TYPE, datasource: DataSource
+    ) -> Dict[str, Any]:
+        """
+        Encodes the keyframes of the video file at `data`.
+
+        Returns the CLIP embedding of every keyframe, along with the start and end of its scene in seconds.
+        Videos without any frame, e.g. audio files, have no records.
+        """
+        if data_type not in self.SUPPORTED_MEDIA_TYPES:
+            raise ValueError(
+                "Unsupported dataType. Video keyframes support only {}".format(
+                    self.SUPPORTED_MEDIA_TYPES
+                )
+            )
+        detector = SceneChangeDetector(self.scene_threshold, self.min_scene_seconds)
+        embeddings: List[np.ndarray] = []
+        starts: List[float] = []
+        keyframes: List[Image.Image] = []
+        end = 0.0
+        for timestamp, frame in self._read_frames(data):
+            end = timestamp + 1 / self.sample_fps
+            if not detector.is_new_scene(frame, timestamp):
+                continue
+            keyframes.append(Image.fromarray(frame))
+            starts.append(timestamp)
+            if len(keyframes) >= self.batch_size:
+                embeddings.extend(self._encode(keyframes, datasource))
+                keyframes = []
+        if keyframes:
+            embeddings.extend(self._encode(keyframes, datasource))
+
+        ends = starts[1:] + [end]
+        return {
+            "embedding": np.concatenate(embeddings) if embeddings else None,
+            "documents": [data] * len(starts),
+            "metadata": [
+                {"start": start, "end": scene_end}
+                for start, scene_end in zip(starts, ends)
+            ],
+            "ids": [str(uuid.uuid4()) for _ in starts],
+        }
+
+    def get_text_encoding(self, query: str):
+        return self.image_embedding_model.get_text_encoding(query)
+
+    def get_text_encodings(self, queries: List[str]) -> List[Dict[str, Any]]:
+        return self.image_embedding_model.get_text_encodings(queries)
+
+    def get_collection_name(self, media_type: MEDIA_TYPE):
+        return "deepsearch-{}-keyframes".format(media_type.name.lower())
+
+    def get_model_version(self) -> str:
+        # Keyframes change with the detector's settings, and their embeddings with the image model
+        return "{}-{}-{}-fps{}-t{}-s{}".format(
+            super().get_model_version(),
+            self.image_embedding_model.MODEL_NAME,
+            self.image_embedding_model.get_model_version(),
+            self.sample_fps,
+            self.scene_threshold,
+            self.min_scene_seconds,
+        )
+
+    def _use_model(self):
+        return self.image_embedding_model._use_model()
+
+    def _encode(
+        self, keyframes: List[Image.Image], datasource: DataSource
+    ) -> List[np.ndarray]:
+        encodings = self.image_embedding_model.get_media_encodings(
+            keyframes, MEDIA_TYPE.IMAGE, datasource
+        )
+        return [encoding["embedding"] for encoding in encodings]
+
+    def _read_frames(self, file: str) -> Iterator[Tuple[float, np.ndarray]]:
+        """Yields the timestamp and pixels of the frames sampled from a video, decoded by ffmpeg."""
+        size = self.frame_size
+        command = [
+            "ffmpeg",
+            "-loglevel",
+            "error",
+            "-nostdin",
+            "-i",
+            file,
+            # The first video stream if any, audio files have none
+            "-map",
+            "0:v:0?",
+            "-vf",
+            # Resizes the shorter side and center crops, as CLIP's preprocessing does
+            "fps={},scale={}:{}:force_original_aspect_ratio=increase,crop={}:{}".format(
+                self.sample_fps, size, size, size, size
+            ),
+            "-f",
+            "rawvideo",
+            "-pix_fmt",
+            "rgb24",
+            "pipe:1",
+        ]
+        # Errors go to a file rather than a pipe, which ffmpeg could fill with warnings, e.g. about a
+        # damaged stream, and then block on while frames are still being read
+        with tempfile.TemporaryFile() as errors:
+            try:
+                process = subprocess.Popen(
+                    command, stdout=subprocess.PIPE, stderr=errors
+                )
+            except FileNotFoundError:
+                raise FileNotFoundError(
+                    "ffmpeg is required to index video frames, please install it and add it to the PATH"
+                ) from None
+
+            frame_bytes = size * size * 3
+            index = 0
+            try:
+                while True:
+                    buffer = process.stdout.read(frame_bytes)
+                    if len(buffer) < frame_bytes:
+                        break
+                    yield index / self.sample_fps, np.frombuffer(
+                        buffer, np.uint8
+                    ).reshape(size, size, 3)
+                    index += 1
+            finally:
+                process.stdout.close()
+                # Stops ffmpeg when the caller stopped reading early
+                if process.poll() is None:
+                    process.kill()
+                process.wait()
+            errors.seek(0)
+            error = errors.read().decode(errors="replace").strip()
+        if (
+            process.returncode
+            and index == 0
+            and "does not contain any stream" not in error
+        ):
+            raise RuntimeError("ffmpeg could not decode {}: {}".format(file, error))
@@ -1,17 +1,61 @@
 import uuid
-from typing import Any
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
 
 from deepsearchai.enums import MEDIA_TYPE
 from deepsearchai.sources.data_source import DataSource
+from .audio_chunking import WINDOW_MS, find_runs, get_loudness
 from .base import BaseEmbeddingModel
+from .quantization import quantize_dynamic_int8
+from .torch_threads import torch_num_threads
 
 
 class Whisper(BaseEmbeddingModel):
     MODEL_NAME = "base"
     SUPPORTED_MEDIA_TYPES = [MEDIA_TYPE.AUDIO, MEDIA_TYPE.VIDEO]
+    # Sample rate whisper decodes audio at
+    SAMPLE_RATE = 16000
 
-    def __init__(self):
-        self.model = None
+    def __init__(
+        self,
+        model_name: str = "base",
+        device: Optional[str] = None,
+        quantize: bool = False,
+        vad: bool = False,
+        num_threads: Optional[int] = None,
+        vad_min_silence_ms: int = 1000,
+        vad_threshold_db: float = 16.0,
+        vad_padding_ms: int = 200,
+    ):
+        """
+        :param model_name: Whisper model size, e.g. "tiny", "base", "small" or "medium.en", defaults to "base"
+        :param device: Device the model runs on, defaults to None which picks CUDA when available, and
+            the CPU otherwise
+        :param quantize: Whether the linear layers are quantized to int8 for faster CPU inference, at a
+            small cost in accuracy. Only supported on the CPU, defaults to False
+        :param vad: Whether only the parts of the audio with voice activity are decoded. Pauses of at
+            least `vad_min_silence_ms` quieter than the average loudness of the file by
+            `vad_threshold_db` are cut out before transcription, defaults to False
+        :param num_threads: Number of threads torch runs CPU inference with, restored once a file is
+            transcribed, defaults to None which leaves torch's default
+        :param vad_min_silence_ms: Minimum duration of a pause skipped by voice activity detection,
+            defaults to 1 second
+        :param vad_threshold_db: How many decibels below the average loudness of the file audio has to
+            be to count as silence, defaults to 16
+        :param vad_padding_ms: Audio kept on either side of every voiced region, so that word onsets
+            and endings are not clipped, defaults to 200ms
+        """
+        if quantize and device not in (None, "cpu"):
+            raise ValueError("Quantized whisper models only run on the cpu")
+        self.model_name = model_name
+        self.device = "cpu" if quantize else device
+        self.quantize = quantize
+        self.vad = vad
+        self.num_threads = num_threads
+        self.vad_min_silence_ms = vad_min_silence_ms
+        self.vad_threshold_db = vad_threshold_db
+        self.vad_padding_ms = vad_padding_ms
 
     def get_media_encoding(
         self, data: Any, data_type: MEDIA_TYPE, datasource: DataSource
@@ -19,13 +63,12 @@ class Whisper(BaseEmbeddingModel):
         """Get the media encoding using OpenAI's Whisper model.
 
         Args:
-            data: The media data.
-            dataType: The media type, either "audio" or "video".
+            data: The path of the audio or video file.
+            data_type: The media type, either "audio" or "video".
+            datasource: The datasource the file originates from.
 
         Returns:
-            The media encoding, or None if the encoding could not be determined.
-            :param data:
-            :param data_type:
+            The transcript of every segment, along with its start and end offsets in seconds.
         """
 
         if data_type not in self.SUPPORTED_MEDIA_TYPES:
@@ -34,12 +77,15 @@ class Whisper(BaseEmbeddingModel):
                     self.SUPPORTED_MEDIA_TYPES
                 )
             )
-        self._load_model()
-        transcription = self.model.transcribe(data)
+        with self._use_model() as model:
+            if self.vad:
+                segments = self._transcribe_voiced_regions(model, data)
+            else:
+                segments = self._transcribe(model, data)
         documents = []
         metadata = []
         ids = []
-        for segment in transcription.get("segments"):
+        for segment in segments:
             documents.append(segment.get("text"))
             metadata.append(
                 {
@@ -58,16 +104,108 @@ class Whisper(BaseEmbeddingModel):
     def get_collection_name(self, media_type: MEDIA_TYPE):
         return "deepsearch-{}".format(media_type.name.lower())
 
-    def _load_model(self):
-        if not self.model:
-            try:
-                import whisper
-
-                # Load the Whisper Model
-                self.model = whisper.load_model(self.MODEL_NAME)
-            except ModuleNotFoundError:
-                raise ModuleNotFoundError(
-                    "The required dependencies for audio/video are not installed."
-                    ' Please install with `pip install --upgrade "deepsearchai[audio]"` '
-                    'or `pip install --upgrade "deepsearchai[video]"`'
-                )
+    def get_model_version(self) -> str:
+        # The model size, quantization and voice activity detection all change the transcripts
+        version = super().get_model_version()
+        if self.model_name != self.MODEL_NAME:
+            version += "-{}".format(self.model_name)
+        if self.quantize:
+            version += "-int8"
+        if self.vad:
+            version += "-vad"
+        return version
+
+    def _transcribe(self, model: Any, audio: Any) -> List[dict]:
+        with torch_num_threads(self.num_threads):
+            # Half precision is only supported on GPUs
+            transcription = model.transcribe(audio, fp16=model.device.type != "cpu")
+        return transcription.get("segments")
+
+    def _transcribe_voiced_regions(self, model: Any, data: Any) -> List[dict]:
+        """
+        Transcribes the voiced regions of the audio only. They are concatenated and transcribed in one
+        go, since whisper pads every input to 30 seconds, and the timestamps are mapped back to the
+        original audio afterwards.
+        """
+        samples = self._load_audio(data)
+        regions = self._detect_voiced_regions(samples)
+        if not regions:
+            return []
+        segments = self._transcribe(
+            model,
+            np.concatenate([samples[start:end] for start, end in regions])
+        )
+
+        # Start of every region, in seconds, in the original and the concatenated audio
+        region_starts = np.array([start for start, _ in regions]) / self.SAMPLE_RATE
+        lengths = np.array([end - start for start, end in regions]) / self.SAMPLE_RATE
+        concatenated_starts = np.concatenate(([0.0], np.cumsum(lengths)[:-1]))
+
+        def to_original_time(time: float, is_end: bool) -> float:
+            # A segment ending exactly where a region starts ends in the previous region
+            side = "left" if is_end else "right"
+            region = max(0, np.searchsorted(concatenated_starts, time, side=side) - 1)
+            return float(region_starts[region] + time - concatenated_starts[region])
+
+        for segment in segments:
+            segment["start"] = to_original_time(segment.get("start"), False)
+            segment["end"] = to_original_time(segment.get("end"), True)
+        return segments
+
+    def _detect_voiced_regions(self, samples: np.ndarray) -> List[Tuple[int, int]]:
+        """Returns the start and end sample of every voiced region of mono audio scaled to [-1, 1]."""
+        if len(samples) == 0:
+            return []
+        with np.errstate(divide="ignore"):
+            average_loudness = 10 * np.log10(np.mean(np.square(samples, dtype=np.float64)))
+        if np.isinf(average_loudness):
+            return []
+        loudness = get_loudness(samples, self.SAMPLE_RATE)
+        silences = find_runs(
+            loudness < average_loudness - self.vad_threshold_db, self.vad_min_silence_ms
+        )
+
+        samples_per_ms = self.SAMPLE_RATE // 1000
+        padding = self.vad_padding_ms * samples_per_ms
+        # Voiced regions lie between the silences, if any, at either end of the audio
+        boundaries = [0] + [
+            offset * samples_per_ms for silence in silences for offset in silence
+        ] + [len(samples)]
+        regions = []
+        for start, end in zip(boundaries[::2], boundaries[1::2]):
+            # Skips what is left of the last window after a trailing silence
+            if end - start < WINDOW_MS * samples_per_ms:
+                continue
+            previous_end = regions[-1][1] if regions else 0
+            regions.append(
+                (max(previous_end, start - padding), min(len(samples), end + padding))
+            )
+        return regions
+
+    def _load_audio(self, data: Any) -> np.ndarray:
+        if isinstance(data, np.ndarray):
+            return data
+        import whisper
+
+        return whisper.load_audio(data)
+
+    def _get_model_key(self):
+        return (
+            "whisper-{}".format(self.model_name),
+            self.device if self.device else "auto",
+            "int8" if self.quantize else "float32",
+        )
+
+    def _create_model(self):
+        try:
+            import whisper
+
+            # Load the Whisper Model
+            model = whisper.load_model(self.model_name, device=self.device)
+        except ModuleNotFoundError:
+            raise ModuleNotFoundError(
+                "The required dependencies for audio/video are not installed."
+                ' Please install with `pip install --upgrade "deepsearchai[audio]"` '
+                'or `pip install --upgrade "deepsearchai[video]"`'
+            )
+        return quantize_dynamic_int8(model) if self.quantize else model
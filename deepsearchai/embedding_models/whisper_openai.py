@@ -1,13 +1,15 @@
-import io
-import os
+import threading
+import time
 import uuid
-from typing import Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Optional, Tuple
 
 import openai
 from pydub import AudioSegment
 
 from deepsearchai.enums import MEDIA_TYPE
 from deepsearchai.sources.data_source import DataSource
+from .audio_chunking import AudioChunkPlanner
 from .base import BaseEmbeddingModel
 
 
@@ -15,24 +17,65 @@ from .base import BaseEmbeddingModel
 # set to be able to use it
 class WhisperOpenAi(BaseEmbeddingModel):
     MODEL_NAME = "whisper-1"
+    # Version 1 stored chunk start offsets in milliseconds
+    MODEL_VERSION = "2"
+    LOCAL_WEIGHTS = False
     SUPPORTED_MEDIA_TYPES = [MEDIA_TYPE.AUDIO, MEDIA_TYPE.VIDEO]
+    # Transient errors after which a chunk is sent again
+    RETRYABLE_ERRORS = (
+        openai.error.APIConnectionError,
+        openai.error.APIError,
+        openai.error.RateLimitError,
+        openai.error.ServiceUnavailableError,
+        openai.error.Timeout,
+        openai.error.TryAgain,
+    )
 
-    def __init__(self):
-        pass
+    def __init__(
+        self,
+        max_workers: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0,
+        api_base: Optional[str] = None,
+        chunk_planner: Optional[AudioChunkPlanner] = None,
+    ):
+        """
+        :param max_workers: Number of chunks transcribed at the same time, shared by all the files
+            transcribed by this instance, defaults to 4
+        :param max_retries: Number of times a chunk is sent again after a transient error, e.g. a rate
+            limit, before the file fails, defaults to 3
+        :param retry_backoff: Seconds to wait before the first retry of a chunk, doubled on every
+            subsequent one, defaults to 1.0
+        :param api_base: Base URL of the OpenAI API, e.g. to use a proxy or a local stand-in. Defaults
+            to None, which uses `openai.api_base`
+        :param chunk_planner: Splits files into the chunks sent to the API, defaults to an
+            `AudioChunkPlanner` cutting 1 to 5 minute chunks at pauses, exported as 32kbps mono mp3
+        """
+        if max_workers < 1:
+            raise ValueError("max_workers should be a positive integer")
+        self.max_workers = max_workers
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.api_base = api_base
+        self.chunk_planner = chunk_planner if chunk_planner else AudioChunkPlanner()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
 
     def get_media_encoding(
         self, file: str, data_type: MEDIA_TYPE, datasource: DataSource
     ):
         """Get the media encoding using OpenAI's Whisper model.
 
+        The audio is split into chunks which are transcribed concurrently, up to `max_workers` at a
+        time, and reassembled in order.
+
         Args:
-            data: The media data.
-            dataType: The media type, either "audio" or "video".
+            file: The path of the audio or video file.
+            data_type: The media type, either "audio" or "video".
+            datasource: The datasource the file originates from.
 
         Returns:
-            The media encoding, or None if the encoding could not be determined.
-            :param data:
-            :param data_type:
+            The transcript of every chunk, along with its start and end offsets in seconds.
         """
         if data_type not in self.SUPPORTED_MEDIA_TYPES:
             raise ValueError(
@@ -40,33 +83,27 @@ class WhisperOpenAi(BaseEmbeddingModel):
                     self.SUPPORTED_MEDIA_TYPES
                 )
             )
-        audio = AudioSegment.from_file(file)
-        chunk_size = self._get_chunk_size(audio.duration_seconds)
-        # Split the AudioSegment file into chunks
-        chunks = audio[::chunk_size]
+        audio = self.chunk_planner.load(file)
+        # Planned once per file, and shared by the threads transcribing its chunks
+        chunks = self.chunk_planner.plan(audio)
+        # Results are yielded in the order of the chunks, whichever finishes first
+        transcripts = self._get_executor().map(
+            lambda chunk: self._transcribe_chunk(audio, chunk), chunks
+        )
         documents = []
         metadata = []
         ids = []
-        for i, chunk in enumerate(chunks):
-            # Transcribe the audio chunk
-            buffer = io.BytesIO()
-            buffer.name = ".tmp/deepsearch/youtube/tmp.wav"
-            chunk.export(buffer, format="wav")
-
-            transcript = openai.Audio.transcribe(self.MODEL_NAME, buffer)
-            start = i * chunk_size
-            end = start + chunk.duration_seconds
+        for (start, end), transcript in zip(chunks, transcripts):
             documents.append(transcript.get("text"))
             metadata.append(
                 {
-                    "start": start,
-                    "end": end,
+                    "start": start / 1000,
+                    "end": end / 1000,
                 }
             )
             ids.append(str(uuid.uuid4()))
 
-        if datasource != DataSource.LOCAL:
-            self._delete_file(file)
+        # Downloaded files belong to the sources' media caches, which bound their disk use
         result = {"documents": documents, "metadata": metadata, "ids": ids}
         return result
 
@@ -76,9 +113,30 @@ class WhisperOpenAi(BaseEmbeddingModel):
     def get_collection_name(self, media_type: MEDIA_TYPE):
         return "deepsearch-{}".format(media_type.name.lower())
 
-    def _get_chunk_size(self, total_duration: float):
-        # Hardcoded chunk size of 5 minutes, but can have a smarter approach based on the total length of the audio
-        return 300000
+    def _transcribe_chunk(self, audio: AudioSegment, chunk: Tuple[int, int]) -> Any:
+        """Transcribes a single chunk, retrying it on its own after a transient error."""
+        buffer = self.chunk_planner.export(audio, chunk)
+        attempt = 0
+        while True:
+            buffer.seek(0)
+            try:
+                return openai.Audio.transcribe(
+                    self.MODEL_NAME, buffer, api_base=self.api_base
+                )
+            except self.RETRYABLE_ERRORS as e:
+                if attempt >= self.max_retries:
+                    raise
+                delay = self.retry_backoff * 2**attempt
+                print(
+                    "Transcription of an audio chunk failed, retrying in {}s: {}".format(
+                        delay, e
+                    )
+                )
+                time.sleep(delay)
+                attempt += 1
 
-    def _delete_file(self, filename):
-        os.remove(filename)
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
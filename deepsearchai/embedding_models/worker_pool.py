@@ -0,0 +1,230 @@
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import resource_tracker, shared_memory
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.data_source import DataSource
+from .base import BaseEmbeddingModel
+
+# Image modes whose pixels are sent as is, other images are converted to RGB first
+_SHARED_MODES = ["RGB", "RGBA", "L"]
+
+
+class EmbeddingWorkerPool:
+    """
+    Pool of processes running embedding models, so that ingestion encodes several batches at the same time
+    on multi-core machines instead of being bound to the parallelism of a single model.
+
+    Every process loads each model it is handed once, through its own `model_registry`, and keeps it for
+    the lifetime of the pool. Images are copied into a shared memory block per batch rather than pickled
+    through a pipe, other media, e.g. file paths, are pickled. Encodings are returned to the caller of
+    `encode` in the order of its batch.
+
+    Processes are started with the "spawn" method, which is safe with the threads torch and the ingestion
+    pipeline run, so scripts using the pool need an `if __name__ == "__main__":` guard.
+    """
+
+    def __init__(
+        self,
+        num_workers: int,
+        threads_per_worker: Optional[int] = None,
+        max_retries: int = 1,
+    ):
+        """
+        :param num_workers: Number of processes
+        :param threads_per_worker: Number of threads torch runs in each process, defaults to None which
+            splits the cores of the machine evenly between the processes
+        :param max_retries: Number of times a batch is retried after its process died, e.g. because it ran
+            out of memory, defaults to 1. Exceptions raised by the models are never retried
+        """
+        if num_workers < 1:
+            raise ValueError("num_workers should be a positive integer")
+        self.num_workers = num_workers
+        self.threads_per_worker = (
+            threads_per_worker
+            if threads_per_worker
+            else max(1, (os.cpu_count() or 1) // num_workers)
+        )
+        self.max_retries = max_retries
+        self._lock = threading.Lock()
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def encode(
+        self,
+        embedding_model: BaseEmbeddingModel,
+        data: List[Any],
+        media_type: MEDIA_TYPE,
+        datasource: DataSource,
+    ) -> List[Dict[str, Any]]:
+        """
+        Runs `embedding_model.get_media_encodings` over `data` in one of the pool's processes. Blocks until
+        done, and can be called from several threads at once to keep every process busy.
+        """
+        with _SharedBatch(data) as batch:
+            attempt = 0
+            while True:
+                executor = self._get_executor()
+                try:
+                    return executor.submit(
+                        _encode_batch,
+                        embedding_model,
+                        batch.items,
+                        batch.name,
+                        media_type,
+                        datasource,
+                    ).result()
+                except BrokenProcessPool:
+                    self._reset(executor)
+                    if attempt >= self.max_retries:
+                        raise
+                    attempt += 1
+                    print(
+                        "An embedding worker died, retrying a batch of {} items".format(
+                            len(data)
+                        )
+                    )
+
+    def wrap(self, embedding_model: BaseEmbeddingModel) -> "PooledEmbeddingModel":
+        """Returns a stand-in for `embedding_model` which encodes media in the pool."""
+        return PooledEmbeddingModel(embedding_model, self)
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.num_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                    initializer=_initialize_worker,
+                    initargs=(self.threads_per_worker,),
+                )
+            return self._executor
+
+    def _reset(self, executor: ProcessPoolExecutor):
+        # Other threads may have hit the same broken executor, and only the first one replaces it
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+class PooledEmbeddingModel:
+    """Embedding model whose media encodings are computed by an `EmbeddingWorkerPool`."""
+
+    def __init__(self, embedding_model: BaseEmbeddingModel, pool: EmbeddingWorkerPool):
+        self.embedding_model = embedding_model
+        self.pool = pool
+
+    def get_media_encoding(
+        self, data: Any, data_type: MEDIA_TYPE, datasource: DataSource
+    ) -> Dict[str, Any]:
+        return self.get_media_encodings([data], data_type, datasource)[0]
+
+    def get_media_encodings(
+        self, data: List[Any], data_type: MEDIA_TYPE, datasource: DataSource
+    ) -> List[Dict[str, Any]]:
+        return self.pool.encode(self.embedding_model, data, data_type, datasource)
+
+    def __getattr__(self, name: str) -> Any:
+        # Names, versions and collections are the wrapped model's
+        return getattr(self.embedding_model, name)
+
+
+_worker_pools: Dict[int, EmbeddingWorkerPool] = {}
+_worker_pools_lock = threading.Lock()
+
+
+def get_worker_pool(num_workers: int) -> EmbeddingWorkerPool:
+    """
+    Returns the process-wide pool of `num_workers` processes, started on first use, so that models stay
+    loaded across ingestion runs.
+    """
+    with _worker_pools_lock:
+        if num_workers not in _worker_pools:
+            _worker_pools[num_workers] = EmbeddingWorkerPool(num_workers)
+        return _worker_pools[num_workers]
+
+
+class _SharedBatch:
+    """Copies the images of a batch into a single shared memory block, which is freed on exit."""
+
+    def __init__(self, data: List[Any]):
+        self.items: List[Tuple[str, Any]] = []
+        images = []
+        size = 0
+        for item in data:
+            if isinstance(item, Image.Image):
+                if item.mode not in _SHARED_MODES:
+                    item = item.convert("RGB")
+                pixels = np.asarray(item)
+                self.items.append(("image", (size, pixels.shape)))
+                images.append((size, pixels))
+                size += pixels.nbytes
+            else:
+                self.items.append(("object", item))
+        self.memory = (
+            shared_memory.SharedMemory(create=True, size=size) if size else None
+        )
+        self.name = self.memory.name if self.memory else None
+        for offset, pixels in images:
+            _get_view(self.memory, offset, pixels.shape)[...] = pixels
+
+    def __enter__(self) -> "_SharedBatch":
+        return self
+
+    def __exit__(self, *args):
+        if self.memory is not None:
+            self.memory.close()
+            self.memory.unlink()
+
+
+def _get_view(
+    memory: shared_memory.SharedMemory, offset: int, shape: Tuple[int, ...]
+) -> np.ndarray:
+    # Views have to be released before the block is closed, so they never outlive the caller
+    return np.ndarray(shape, np.uint8, buffer=memory.buf, offset=offset)
+
+
+def _initialize_worker(num_threads: int):
+    import torch
+
+    torch.set_num_threads(num_threads)
+
+
+def _encode_batch(
+    embedding_model: BaseEmbeddingModel,
+    items: List[Tuple[str, Any]],
+    name: Optional[str],
+    media_type: MEDIA_TYPE,
+    datasource: DataSource,
+) -> List[Dict[str, Any]]:
+    """Runs in the pool's processes, rebuilding the batch from shared memory before encoding it."""
+    data = []
+    if name:
+        memory = shared_memory.SharedMemory(name=name)
+        # The parent owns the block and unlinks it, the worker must not track it as well
+        resource_tracker.unregister(memory._name, "shared_memory")
+        try:
+            for kind, value in items:
+                if kind == "image":
+                    # Copied out, so that the block can be closed while the image is in use
+                    data.append(Image.fromarray(_get_view(memory, *value).copy()))
+                else:
+                    data.append(value)
+        finally:
+            memory.close()
+    else:
+        data = [value for _, value in items]
+    return embedding_model.get_media_encodings(data, media_type, datasource)
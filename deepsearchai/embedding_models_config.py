@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 
 from deepsearchai.embedding_models.base import BaseEmbeddingModel
 from deepsearchai.embedding_models.blip_image_captioning import BlipImageCaptioning
@@ -6,6 +6,9 @@ from deepsearchai.embedding_models.clip import Clip
 from deepsearchai.embedding_models.whisper_openai import WhisperOpenAi
 from deepsearchai.enums import MEDIA_TYPE
 
+# Default of `image_captioning_model`, None disabling captioning
+_DEFAULT_IMAGE_CAPTIONING_MODEL = object()
+
 
 class EmbeddingModelsConfig:
     def __init__(
@@ -13,7 +16,8 @@ class EmbeddingModelsConfig:
         image_embedding_model: Optional[BaseEmbeddingModel] = None,
         audio_embedding_model: Optional[BaseEmbeddingModel] = None,
         video_embedding_model: Optional[BaseEmbeddingModel] = None,
-        image_captioning_model: Optional[BaseEmbeddingModel] = BlipImageCaptioning(),
+        image_captioning_model: Optional[BaseEmbeddingModel] = _DEFAULT_IMAGE_CAPTIONING_MODEL,
+        video_keyframes_model: Optional[BaseEmbeddingModel] = None,
     ):
         if not image_embedding_model:
             image_embedding_model = Clip()
@@ -21,11 +25,15 @@ class EmbeddingModelsConfig:
             audio_embedding_model = WhisperOpenAi()
         if not video_embedding_model:
             video_embedding_model = WhisperOpenAi()
+        if image_captioning_model is _DEFAULT_IMAGE_CAPTIONING_MODEL:
+            image_captioning_model = BlipImageCaptioning()
         image_embedding_models = [image_embedding_model]
         audio_embedding_models = [audio_embedding_model]
         video_embedding_models = [video_embedding_model]
         if image_captioning_model:
             image_embedding_models.append(image_captioning_model)
+        if video_keyframes_model:
+            video_embedding_models.append(video_keyframes_model)
 
         self.llm_models = {
             MEDIA_TYPE.AUDIO: audio_embedding_models,
@@ -35,3 +43,12 @@ class EmbeddingModelsConfig:
 
     def get_embedding_model(self, media_type: MEDIA_TYPE):
         return self.llm_models.get(media_type, [])
+
+    def get_all_embedding_models(self) -> List[BaseEmbeddingModel]:
+        """Returns every configured model once, even when it serves several media types."""
+        models = []
+        for embedding_models in self.llm_models.values():
+            for embedding_model in embedding_models:
+                if embedding_model not in models:
+                    models.append(embedding_model)
+        return models
@@ -0,0 +1,55 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, TypeVar
+
+T = TypeVar("T")
+
+# Encoding queries and searching vector databases
+QUERY_EXECUTOR = "query"
+# Ingesting sources, which run their own pipeline of threads
+INGESTION_EXECUTOR = "ingestion"
+# LLMs without a native asyncio client
+LLM_EXECUTOR = "llm"
+
+_max_workers = {QUERY_EXECUTOR: 8, INGESTION_EXECUTOR: 2, LLM_EXECUTOR: 8}
+
+_executors: Dict[str, ThreadPoolExecutor] = {}
+_executors_lock = threading.Lock()
+
+
+def get_executor(name: str) -> ThreadPoolExecutor:
+    """
+    Returns the process-wide pool of threads the asyncio API offloads blocking calls of a kind to,
+    started on first use. Pools are bounded, so that a burst of coroutines queues up rather than starting
+    a thread, and loading a model, per call.
+    """
+    with _executors_lock:
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(
+                max_workers=_max_workers.get(name, 4),
+                thread_name_prefix="deepsearch-{}".format(name),
+            )
+        return _executors[name]
+
+
+def set_max_workers(name: str, max_workers: int):
+    """Sets the size of a pool, replacing it if it was started already. Calls in flight are not affected."""
+    if max_workers < 1:
+        raise ValueError("max_workers should be a positive integer")
+    with _executors_lock:
+        _max_workers[name] = max_workers
+        executor = _executors.pop(name, None)
+    if executor is not None:
+        executor.shutdown(wait=False)
+
+
+async def run_in_executor(
+    name: str, func: Callable[..., T], *args: Any, **kwargs: Any
+) -> T:
+    """Runs a blocking call in the pool `name`, without blocking the event loop."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        get_executor(name), functools.partial(func, *args, **kwargs)
+    )
@@ -2,6 +2,7 @@ from string import Template
 from typing import Dict, List
 
 from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.executors import LLM_EXECUTOR, run_in_executor
 from deepsearchai.types import MediaData, QueryResult
 
 DEFAULT_PROMPT = """
@@ -29,3 +30,14 @@ class BaseLLM:
         contexts: Dict[MEDIA_TYPE, List[MediaData]],
     ) -> QueryResult:
         raise NotImplementedError
+
+    async def aquery(
+        self,
+        query: str,
+        contexts: Dict[MEDIA_TYPE, List[MediaData]],
+    ) -> QueryResult:
+        """
+        Asyncio variant of `query`. LLMs with an asyncio client should override it, by default `query` runs
+        in a bounded pool of threads.
+        """
+        return await run_in_executor(LLM_EXECUTOR, self.query, query, contexts)
@@ -38,27 +38,53 @@ class OpenAi(BaseLLM):
         query: str,
         contexts: Dict[MEDIA_TYPE, List[MediaData]],
     ) -> QueryResult:
-        results = []
-        for item in contexts.items():
-            media_data = item[1]
-            for each_response in media_data:
-                results.append(each_response.get("document", ""))
-        prompt = self.generate_prompt(query, results)
+        prompt = self._get_prompt(query, contexts)
         llm_response = self.get_llm_model_answer(prompt)
         query_result = {"llm_response": llm_response, "documents": contexts}
         return query_result
 
+    async def aquery(
+        self,
+        query: str,
+        contexts: Dict[MEDIA_TYPE, List[MediaData]],
+    ) -> QueryResult:
+        """Asyncio variant of `query`, awaiting OpenAI's answer without holding a thread."""
+        prompt = self._get_prompt(query, contexts)
+        llm_response = await self.aget_llm_model_answer(prompt)
+        query_result = {"llm_response": llm_response, "documents": contexts}
+        return query_result
+
     def get_llm_model_answer(self, prompt) -> str:
         response = self._get_answer(prompt, self.config)
         return response
 
+    async def aget_llm_model_answer(self, prompt) -> str:
+        response = await self._aget_answer(prompt, self.config)
+        return response
+
+    def _get_prompt(
+        self, query: str, contexts: Dict[MEDIA_TYPE, List[MediaData]]
+    ) -> str:
+        results = []
+        for item in contexts.items():
+            media_data = item[1]
+            for each_response in media_data:
+                results.append(each_response.get("document", ""))
+        return self.generate_prompt(query, results)
+
     def _get_answer(self, prompt: str, config: OpenAiConfig) -> str:
-        messages = []
-        messages.append(HumanMessage(content=prompt))
+        chat = self._get_chat_model(config)
+        return chat([HumanMessage(content=prompt)]).content
+
+    async def _aget_answer(self, prompt: str, config: OpenAiConfig) -> str:
+        chat = self._get_chat_model(config)
+        response = await chat.ainvoke([HumanMessage(content=prompt)])
+        return response.content
+
+    def _get_chat_model(self, config: OpenAiConfig) -> ChatOpenAI:
         kwargs = {
             "model": "gpt-3.5-turbo",
             "max_tokens": 1000,
             "model_kwargs": {},
         }
-        chat = ChatOpenAI(**kwargs)
-        return chat(messages).content
+        return ChatOpenAI(**kwargs)
@@ -1,5 +1,10 @@
+from typing import Dict, List, Optional, Set
+
 from deepsearchai.embedding_models.base import BaseEmbeddingModel
+from deepsearchai.enums import MEDIA_TYPE
 from deepsearchai.vector_databases.base import BaseVectorDatabase
+from .manifest import Fingerprint, ManifestEntry
+from .pipeline import IngestionTask
 
 
 class BaseSource:
@@ -11,5 +16,95 @@ class BaseSource:
         source: str,
         llm_model: BaseEmbeddingModel,
         vector_database: BaseVectorDatabase,
-    ) -> None:
+    ) -> Optional[List[str]]:
         raise NotImplementedError
+
+    def _get_existing_documents(
+        self,
+        document_ids: List[str],
+        collection_name: str,
+        vector_database: BaseVectorDatabase,
+        existing_document_identifiers: Dict[str, Set[str]],
+    ) -> Set[str]:
+        """Returns the supplied documents already stored in a collection, fetched once per collection."""
+        if collection_name not in existing_document_identifiers:
+            existing_document_identifiers[collection_name] = set(
+                vector_database.get_existing_document_ids(
+                    {"document_id": document_ids}, collection_name
+                )
+            )
+        return existing_document_identifiers[collection_name]
+
+    def _get_unindexed_models(
+        self,
+        document_id: str,
+        media_type: MEDIA_TYPE,
+        embedding_models: List[BaseEmbeddingModel],
+        fingerprint: Fingerprint,
+        entry: Optional[ManifestEntry],
+        document_ids: List[str],
+        vector_database: BaseVectorDatabase,
+        existing_document_identifiers: Optional[Dict[str, Set[str]]],
+    ) -> List[BaseEmbeddingModel]:
+        """
+        Returns the models which have not indexed the current content of a document yet, according to
+        its manifest entry.
+
+        `existing_document_identifiers` is set when syncing a prefix the manifest knows nothing about,
+        which may have been ingested before the manifest was enabled. The vector database is then
+        checked instead, and what is found there is recorded in the manifest.
+        """
+        if existing_document_identifiers is None:
+            indexed_collections = entry["collections"] if entry else set()
+        else:
+            indexed_collections = set()
+            for embedding_model in embedding_models:
+                collection_name = embedding_model.get_collection_name(media_type)
+                existing_documents = self._get_existing_documents(
+                    document_ids,
+                    collection_name,
+                    vector_database,
+                    existing_document_identifiers,
+                )
+                if document_id in existing_documents:
+                    self.manifest.mark_indexed({document_id: fingerprint}, collection_name)
+                    indexed_collections.add(collection_name)
+        return [
+            embedding_model
+            for embedding_model in embedding_models
+            if embedding_model.get_collection_name(media_type) not in indexed_collections
+        ]
+
+    def _reindex(
+        self,
+        document_id: str,
+        media_type: MEDIA_TYPE,
+        vector_database: BaseVectorDatabase,
+    ):
+        """Drops the vectors of a document whose content changed, so that it gets indexed again."""
+        print("{} has changed, re-indexing...".format(document_id))
+        vector_database.delete({"document_id": document_id}, media_type)
+        self.manifest.reset([document_id])
+
+    def _remove_deleted(
+        self, document_ids: List[str], vector_database: BaseVectorDatabase
+    ):
+        """
+        Drops the vectors of documents which no longer exist at the source, along with their manifest
+        entries, so that they are reported as deleted only once.
+        """
+        for document_id in document_ids:
+            vector_database.delete({"document_id": document_id})
+        self.manifest.remove(document_ids)
+
+    def _mark_indexed(
+        self,
+        tasks: List[IngestionTask],
+        embedding_model: BaseEmbeddingModel,
+        media_type: MEDIA_TYPE,
+    ):
+        """Records a stored batch in `self.manifest`, called from the ingestion pipeline's writer thread."""
+        self.manifest.mark_indexed(
+            {task["document_id"]: task["fingerprint"] for task in tasks},
+            embedding_model.get_collection_name(media_type),
+        )
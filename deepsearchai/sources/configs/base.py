@@ -0,0 +1,50 @@
+class BaseSourceConfig:
+    def __init__(
+        self,
+        batch_size: int = 32,
+        decode_workers: int = 4,
+        decode_queue_size: int = 64,
+        write_queue_size: int = 2,
+        preserve_order: bool = True,
+        embedding_workers: int = 0,
+    ):
+        """
+        Initializes the configuration shared by all data sources.
+
+        :param batch_size: Number of decoded media items, collected across files, that are encoded
+            and written to the vector database together, defaults to 32
+        :type batch_size: int
+        :param decode_workers: Number of threads reading and decoding media ahead of the embedding
+            models, defaults to 4
+        :type decode_workers: int
+        :param decode_queue_size: Maximum number of decoded media items waiting for the embedding
+            models. Readers block once it is full, which bounds memory use, defaults to 64
+        :type decode_queue_size: int
+        :param write_queue_size: Maximum number of encoded batches waiting to be written to the
+            vector database, defaults to 2
+        :type write_queue_size: int
+        :param preserve_order: Whether media is encoded in the order it is listed, rather than in the
+            order it finishes loading. Turning it off avoids waiting on a single slow read, defaults to True
+        :type preserve_order: bool
+        :param embedding_workers: Number of processes encoding batches at the same time, each loading the
+            embedding models once. Speeds up ingestion on multi-core machines, at the cost of a copy of the
+            models per process. Scripts ingesting with workers need an `if __name__ == "__main__":`
+            guard. Defaults to 0, which encodes batches one at a time in the calling thread
+        :type embedding_workers: int
+        """
+        for name, value in (
+            ("batch_size", batch_size),
+            ("decode_workers", decode_workers),
+            ("decode_queue_size", decode_queue_size),
+            ("write_queue_size", write_queue_size),
+        ):
+            if value < 1:
+                raise ValueError("{} should be a positive integer".format(name))
+        self.batch_size = batch_size
+        self.decode_workers = decode_workers
+        self.decode_queue_size = decode_queue_size
+        self.write_queue_size = write_queue_size
+        if embedding_workers < 0:
+            raise ValueError("embedding_workers should not be negative")
+        self.preserve_order = preserve_order
+        self.embedding_workers = embedding_workers
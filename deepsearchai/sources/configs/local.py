@@ -0,0 +1,47 @@
+from typing import Optional
+
+from .base import BaseSourceConfig
+
+
+class LocalSourceConfig(BaseSourceConfig):
+    def __init__(
+        self,
+        batch_size: int = 32,
+        decode_workers: int = 4,
+        decode_queue_size: int = 64,
+        write_queue_size: int = 2,
+        manifest_path: Optional[str] = None,
+        image_min_side: Optional[int] = 384,
+        image_cache_path: Optional[str] = None,
+        image_cache_max_bytes: int = 1024 * 1024 * 1024,
+        embedding_workers: int = 0,
+    ):
+        """
+        Initializes a configuration class instance for the local data source.
+
+        See `BaseSourceConfig` for the meaning of the other parameters.
+
+        :param manifest_path: Path of the SQLite ingestion manifest, e.g. next to the ChromaDB
+            persist directory. When set, re-syncing a folder only ingests new or changed files, and
+            deletes and reports the files which disappeared. Defaults to None, which disables the manifest
+        :type manifest_path: Optional[str]
+        :param image_min_side: Length the shorter side of images is reduced to while decoding, before
+            they reach the embedding models, defaults to 384. None decodes them at full resolution
+        :type image_min_side: Optional[int]
+        :param image_cache_path: Directory where decoded thumbnails are cached, so that re-indexing
+            does not decode the originals again, defaults to None which disables the cache
+        :type image_cache_path: Optional[str]
+        :param image_cache_max_bytes: Disk budget of the thumbnail cache, defaults to 1GB
+        :type image_cache_max_bytes: int
+        """
+        super().__init__(
+            batch_size=batch_size,
+            decode_workers=decode_workers,
+            decode_queue_size=decode_queue_size,
+            write_queue_size=write_queue_size,
+            embedding_workers=embedding_workers,
+        )
+        self.manifest_path = manifest_path
+        self.image_min_side = image_min_side
+        self.image_cache_path = image_cache_path
+        self.image_cache_max_bytes = image_cache_max_bytes
@@ -0,0 +1,84 @@
+import os
+import tempfile
+from typing import Optional
+
+from .base import BaseSourceConfig
+
+
+class S3SourceConfig(BaseSourceConfig):
+    def __init__(
+        self,
+        batch_size: int = 32,
+        max_concurrency: int = 16,
+        decode_queue_size: int = 64,
+        write_queue_size: int = 2,
+        preserve_order: bool = False,
+        max_pool_connections: Optional[int] = None,
+        max_inflight_bytes: int = 256 * 1024 * 1024,
+        manifest_path: Optional[str] = None,
+        media_cache_path: str = os.path.join(
+            tempfile.gettempdir(), "deepsearch", "cache", "s3"
+        ),
+        media_cache_max_bytes: int = 2 * 1024 * 1024 * 1024,
+        image_min_side: Optional[int] = 384,
+        image_cache_path: Optional[str] = None,
+        image_cache_max_bytes: int = 1024 * 1024 * 1024,
+        embedding_workers: int = 0,
+    ):
+        """
+        Initializes a configuration class instance for the S3 data source.
+
+        See `BaseSourceConfig` for the meaning of the other parameters. Objects are handed to the
+        embedding models as soon as they are fetched, unless `preserve_order` is set.
+
+        :param max_concurrency: Maximum number of objects fetched at the same time, defaults to 16
+        :type max_concurrency: int
+        :param max_pool_connections: Size of the S3 client's connection pool, defaults to None which
+            sizes it to `max_concurrency`
+        :type max_pool_connections: Optional[int]
+        :param max_inflight_bytes: Maximum number of bytes of images and audio files being downloaded at
+            the same time. An object larger than this is still fetched, but on its own, defaults to 256MB
+        :type max_inflight_bytes: int
+        :param manifest_path: Path of the SQLite ingestion manifest. When set, syncs run in delta mode:
+            the ETag and LastModified of every object under the synced bucket and prefix are recorded,
+            only new or changed objects are fetched and embedded, and the keys which disappeared are
+            deleted from the vector database and reported. Defaults to None, which disables delta syncs
+        :type manifest_path: Optional[str]
+        :param media_cache_path: Directory where audio objects are downloaded to. Downloads are keyed
+            by S3 URL and ETag, and reused across retries and re-indexing, defaults to
+            `<tmp>/deepsearch/cache/s3`
+        :type media_cache_path: str
+        :param media_cache_max_bytes: Disk budget of the media cache, the least recently used downloads
+            are deleted beyond it, defaults to 2GB
+        :type media_cache_max_bytes: int
+        :param image_min_side: Length the shorter side of images is reduced to while decoding, before
+            they reach the embedding models, defaults to 384. None decodes them at full resolution
+        :type image_min_side: Optional[int]
+        :param image_cache_path: Directory where decoded thumbnails are cached by S3 URL and ETag, so
+            that re-indexing neither downloads nor decodes the originals again, defaults to None which
+            disables the cache
+        :type image_cache_path: Optional[str]
+        :param image_cache_max_bytes: Disk budget of the thumbnail cache, defaults to 1GB
+        :type image_cache_max_bytes: int
+        """
+        super().__init__(
+            batch_size=batch_size,
+            decode_workers=max_concurrency,
+            decode_queue_size=decode_queue_size,
+            write_queue_size=write_queue_size,
+            embedding_workers=embedding_workers,
+            preserve_order=preserve_order,
+        )
+        if max_inflight_bytes < 1:
+            raise ValueError("max_inflight_bytes should be a positive integer")
+        self.max_concurrency = max_concurrency
+        self.max_pool_connections = (
+            max_pool_connections if max_pool_connections else max_concurrency
+        )
+        self.max_inflight_bytes = max_inflight_bytes
+        self.manifest_path = manifest_path
+        self.media_cache_path = media_cache_path
+        self.media_cache_max_bytes = media_cache_max_bytes
+        self.image_min_side = image_min_side
+        self.image_cache_path = image_cache_path
+        self.image_cache_max_bytes = image_cache_max_bytes
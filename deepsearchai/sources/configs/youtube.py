@@ -0,0 +1,50 @@
+import os
+import tempfile
+
+from .base import BaseSourceConfig
+
+
+class YoutubeSourceConfig(BaseSourceConfig):
+    def __init__(
+        self,
+        batch_size: int = 1,
+        download_workers: int = 4,
+        download_queue_size: int = 8,
+        write_queue_size: int = 2,
+        media_cache_path: str = os.path.join(
+            tempfile.gettempdir(), "deepsearch", "cache", "youtube"
+        ),
+        media_cache_max_bytes: int = 2 * 1024 * 1024 * 1024,
+        embedding_workers: int = 0,
+    ):
+        """
+        Initializes a configuration class instance for the YouTube data source.
+
+        See `BaseSourceConfig` for the meaning of the other parameters. Videos are transcribed in the
+        order they finish downloading. Each video is stored as soon as it is transcribed with the
+        default `batch_size` of 1, which is what lets an interrupted run resume where it stopped.
+
+        :param download_workers: Number of audio streams downloaded at the same time, defaults to 4
+        :type download_workers: int
+        :param download_queue_size: Maximum number of downloaded videos waiting to be transcribed,
+            defaults to 8
+        :type download_queue_size: int
+        :param media_cache_path: Directory where the audio of videos is downloaded to. Downloads are
+            keyed by video id, and reused across retries and re-indexing, defaults to
+            `<tmp>/deepsearch/cache/youtube`
+        :type media_cache_path: str
+        :param media_cache_max_bytes: Disk budget of the media cache, the least recently used downloads
+            are deleted beyond it, defaults to 2GB
+        :type media_cache_max_bytes: int
+        """
+        super().__init__(
+            batch_size=batch_size,
+            decode_workers=download_workers,
+            decode_queue_size=download_queue_size,
+            write_queue_size=write_queue_size,
+            embedding_workers=embedding_workers,
+            preserve_order=False,
+        )
+        self.download_workers = download_workers
+        self.media_cache_path = media_cache_path
+        self.media_cache_max_bytes = media_cache_max_bytes
@@ -0,0 +1,122 @@
+import math
+from typing import IO, Optional, Union
+
+import numpy as np
+from PIL import Image
+
+from deepsearchai.caches.media_cache import MediaCache
+from deepsearchai.utils import get_file_hash
+
+
+class ImagePreprocessor:
+    """
+    Decodes images straight to the resolution the embedding models use, ahead of them.
+
+    The embedding models downsample every image anyway: CLIP resizes its shorter side to 224 pixels and
+    BLIP resizes to 384x384. Decoding a 24 megapixel photo in full only to throw most of it away
+    dominates ingestion, so images are decoded to a thumbnail whose shorter side is at least
+    `min_side`, and converted to RGB once. JPEGs are decoded at a reduced scale directly through PIL's
+    draft mode. The same thumbnail is then handed to every embedding model.
+
+    Thumbnails can be cached on disk, keyed by the location and version of the image and by `min_side`,
+    so that re-indexing with a new model neither downloads nor decodes the originals again.
+    """
+
+    _CACHE_SUFFIX = ".npz"
+
+    def __init__(self, min_side: Optional[int] = 384, cache: Optional[MediaCache] = None):
+        """
+        :param min_side: Length the shorter side of images is reduced to, defaults to 384. None keeps
+            the full resolution
+        :param cache: Cache of the decoded thumbnails, defaults to None which disables it
+        """
+        if min_side is not None and min_side < 1:
+            raise ValueError("min_side should be a positive integer")
+        self.min_side = min_side
+        self.cache = cache
+
+    def get_cached(self, uri: str, version: Optional[str]) -> Optional[Image.Image]:
+        """Returns the cached thumbnail of an image, or None if it has not been preprocessed yet."""
+        if not self.cache or not version:
+            return None
+        path = self.cache.get(
+            uri, self._get_cache_version(version), suffix=self._CACHE_SUFFIX
+        )
+        if not path:
+            return None
+        try:
+            with np.load(path) as cached:
+                image = Image.fromarray(cached["pixels"])
+                content_hash = str(cached["content_hash"])
+            if content_hash:
+                image.info["content_hash"] = content_hash
+            return image
+        except (OSError, ValueError, KeyError):
+            # Truncated or written by an incompatible version, preprocessed again
+            return None
+
+    def preprocess(
+        self,
+        fp: Union[str, IO[bytes]],
+        content_hash: Optional[str] = None,
+        uri: Optional[str] = None,
+        version: Optional[str] = None,
+    ) -> Image.Image:
+        """
+        Decodes an image to an RGB thumbnail, caching it under `uri` and `version` when both are known.
+
+        :param fp: Path or file object of the encoded image
+        :param content_hash: Digest of the encoded image, which identifies the thumbnail in the artifact
+            store since its pixels no longer match the original's. When `fp` is a path and the digest is
+            not supplied, it is only computed from the file if the artifact store asks for it
+        :param uri: Location of the image, e.g. a local path or an S3 URL
+        :param version: Version of the image at `uri`, e.g. its content hash or ETag
+        """
+        image = Image.open(fp)
+        if self.min_side:
+            size = self._get_thumbnail_size(image.size)
+            if size != image.size:
+                # Only affects JPEGs, decoded at the largest of 1/2, 1/4 or 1/8 scale still above `size`
+                image.draft("RGB", size)
+        image.load()
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        if self.min_side:
+            size = self._get_thumbnail_size(image.size)
+            if size != image.size:
+                image = image.resize(size, Image.BICUBIC, reducing_gap=3.0)
+        if content_hash:
+            image.info["content_hash"] = content_hash
+        elif isinstance(fp, str):
+            # Hashed through the original file by `get_media_hash`, only when needed
+            image.filename = fp
+
+        if self.cache and uri and version:
+            if not content_hash and isinstance(fp, str):
+                content_hash = get_file_hash(fp)
+            pixels = np.asarray(image)
+            self.cache.get_or_download(
+                uri,
+                self._get_cache_version(version),
+                lambda path: self._write(path, pixels, content_hash),
+                suffix=self._CACHE_SUFFIX,
+            )
+        return image
+
+    def _get_cache_version(self, version: str) -> str:
+        # Thumbnails of another size are never reused
+        return "{}\0{}".format(version, self.min_side)
+
+    def _get_thumbnail_size(self, size):
+        width, height = size
+        scale = self.min_side / min(width, height)
+        if scale >= 1:
+            # Never upscales
+            return size
+        return max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))
+
+    @staticmethod
+    def _write(path: str, pixels: np.ndarray, content_hash: Optional[str]):
+        # Written through a file object, np.savez appends its extension to paths
+        with open(path, "wb") as f:
+            np.savez(f, pixels=pixels, content_hash=np.array(content_hash or ""))
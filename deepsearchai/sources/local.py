@@ -1,17 +1,39 @@
 import os
+from typing import Dict, Iterator, List, Optional
 
-from PIL import Image, UnidentifiedImageError
+from PIL import UnidentifiedImageError
 
+from deepsearchai.caches.media_cache import MediaCache
 from deepsearchai.embedding_models_config import EmbeddingModelsConfig
 from deepsearchai.enums import MEDIA_TYPE
-from deepsearchai.utils import get_mime_type
+from deepsearchai.utils import get_file_hash, get_mime_type
 from deepsearchai.vector_databases.base import BaseVectorDatabase
 from .base import BaseSource
+from .configs.local import LocalSourceConfig
 from .data_source import DataSource
+from .image_preprocessing import ImagePreprocessor
+from .manifest import Fingerprint, IngestionManifest, ManifestEntry
+from .pipeline import IngestionPipeline, IngestionTask
 
 
 class LocalDataSource(BaseSource):
-    def __init__(self):
+    SUPPORTED_MEDIA_TYPES = [MEDIA_TYPE.IMAGE, MEDIA_TYPE.AUDIO, MEDIA_TYPE.VIDEO]
+
+    def __init__(self, config: Optional[LocalSourceConfig] = None):
+        self.config = config if config else LocalSourceConfig()
+        self.manifest = (
+            IngestionManifest(self.config.manifest_path)
+            if self.config.manifest_path
+            else None
+        )
+        self.image_preprocessor = ImagePreprocessor(
+            self.config.image_min_side,
+            MediaCache(
+                self.config.image_cache_path, self.config.image_cache_max_bytes
+            )
+            if self.config.image_cache_path
+            else None,
+        )
         super().__init__()
 
     def add_data(
@@ -19,47 +41,185 @@ class LocalDataSource(BaseSource):
         source: str,
         embedding_models_config: EmbeddingModelsConfig,
         vector_database: BaseVectorDatabase,
-    ) -> None:
-        # Recursively iterate over all the files and subdirectories in the current directory
-        existing_document_identifiers = {}
+    ) -> List[str]:
+        """Ingests all the supported files under `source`.
+
+        Args:
+          source: A local file or directory.
+          embedding_models_config: The embedding models to index the files with.
+          vector_database: The vector database to store the encodings in.
+
+        Returns:
+          The previously ingested files which no longer exist under `source`, and whose vectors have
+          therefore been deleted. Only tracked when the manifest is enabled, empty otherwise.
+        """
         file_paths = self._get_all_file_path(source)
+        if not self.manifest:
+            tasks = self._get_ingestion_tasks(
+                file_paths, embedding_models_config, vector_database
+            )
+            IngestionPipeline(self.config).run(
+                tasks, self._load, vector_database, DataSource.LOCAL, source
+            )
+            return []
+
+        if os.path.isfile(source):
+            entries = {
+                document_id: entry
+                for document_id, entry in self.manifest.get_entries(source).items()
+                if document_id == source
+            }
+        else:
+            entries = self.manifest.get_entries(os.path.join(source, ""))
+        tasks = self._get_changed_ingestion_tasks(
+            file_paths, entries, embedding_models_config, vector_database
+        )
+        IngestionPipeline(self.config).run(
+            tasks,
+            self._load,
+            vector_database,
+            DataSource.LOCAL,
+            source,
+            on_written=self._mark_indexed,
+        )
+
+        existing_files = set(file_paths)
+        deleted_files = [
+            document_id for document_id in entries if document_id not in existing_files
+        ]
+        if deleted_files:
+            print(
+                "{} previously ingested files no longer exist under {}, deleting them...".format(
+                    len(deleted_files), source
+                )
+            )
+            self._remove_deleted(deleted_files, vector_database)
+        return deleted_files
+
+    def _get_ingestion_tasks(
+        self,
+        file_paths: List[str],
+        embedding_models_config: EmbeddingModelsConfig,
+        vector_database: BaseVectorDatabase,
+    ) -> Iterator[IngestionTask]:
+        existing_document_identifiers = {}
         for file in file_paths:
             media_type = get_mime_type(file)
-            embedding_models = embedding_models_config.get_embedding_model(media_type)
-            for embedding_model in embedding_models:
-                if media_type not in existing_document_identifiers:
-                    existing_document_identifiers[
-                        media_type
-                    ] = vector_database.get_existing_document_ids(
-                        {"document_id": file_paths},
-                        embedding_model.get_collection_name(media_type),
-                    )
-
-                if file in existing_document_identifiers[media_type]:
-                    "{} already exists, skipping...".format(file)
+            embedding_models = []
+            for embedding_model in embedding_models_config.get_embedding_model(
+                media_type
+            ):
+                existing_files = self._get_existing_documents(
+                    file_paths,
+                    embedding_model.get_collection_name(media_type),
+                    vector_database,
+                    existing_document_identifiers,
+                )
+                if file in existing_files:
                     continue
-                if media_type == MEDIA_TYPE.IMAGE:
-                    try:
-                        data = Image.open(file)
-                    except FileNotFoundError:
-                        print("The supplied file does not exist {}".format(file))
-                        continue
-                    except UnidentifiedImageError:
-                        print("The supplied file is not an image {}".format(file))
-                        continue
-                    except Exception as e:
-                        print("Error while reading file {}".format(file))
-                        print(e)
-                        continue
-
-                elif media_type == MEDIA_TYPE.AUDIO:
-                    data = file
+                embedding_models.append(embedding_model)
+
+            if not embedding_models:
+                continue
+            if media_type not in self.SUPPORTED_MEDIA_TYPES:
+                print("Unsupported media type {}".format(file))
+                continue
+            yield {
+                "document_id": file,
+                "media_type": media_type,
+                "embedding_models": embedding_models,
+                "location": file,
+                "fingerprint": None,
+            }
+
+    def _get_changed_ingestion_tasks(
+        self,
+        file_paths: List[str],
+        entries: Dict[str, ManifestEntry],
+        embedding_models_config: EmbeddingModelsConfig,
+        vector_database: BaseVectorDatabase,
+    ) -> Iterator[IngestionTask]:
+        # A folder synced for the first time may have been ingested before the manifest was enabled
+        existing_document_identifiers = {} if not entries else None
+        for file in file_paths:
+            media_type = get_mime_type(file)
+            embedding_models = embedding_models_config.get_embedding_model(media_type)
+            if not embedding_models:
+                continue
+            if media_type not in self.SUPPORTED_MEDIA_TYPES:
+                print("Unsupported media type {}".format(file))
+                continue
+            try:
+                stat = os.stat(file)
+            except FileNotFoundError:
+                print("The supplied file does not exist {}".format(file))
+                continue
+
+            fingerprint: Fingerprint = {
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "content_hash": None,
+            }
+            entry = entries.get(file)
+            if entry and (entry["size"], entry["mtime"]) != (stat.st_size, stat.st_mtime):
+                fingerprint["content_hash"] = get_file_hash(file)
+                if fingerprint["content_hash"] == entry["content_hash"]:
+                    # Only touched, the content is still indexed
+                    self.manifest.update({file: fingerprint})
                 else:
-                    print("Unsupported media type {}".format(file))
-                    continue
-                vector_database.add(
-                    data, DataSource.LOCAL, file, source, media_type, embedding_model
+                    self._reindex(file, media_type, vector_database)
+                    entry = None
+            elif entry:
+                fingerprint["content_hash"] = entry["content_hash"]
+
+            embedding_models = self._get_unindexed_models(
+                file,
+                media_type,
+                embedding_models,
+                fingerprint,
+                entry,
+                file_paths,
+                vector_database,
+                existing_document_identifiers,
+            )
+            if not embedding_models:
+                continue
+            yield {
+                "document_id": file,
+                "media_type": media_type,
+                "embedding_models": embedding_models,
+                "location": file,
+                "fingerprint": fingerprint,
+            }
+
+    def _load(self, task: IngestionTask):
+        """Reads and decodes the media of a task, runs on the pipeline's reader threads."""
+        file = task["location"]
+        try:
+            fingerprint = task.get("fingerprint")
+            if fingerprint and not fingerprint["content_hash"]:
+                fingerprint["content_hash"] = get_file_hash(file)
+            if task["media_type"] != MEDIA_TYPE.IMAGE:
+                return file
+            content_hash = fingerprint["content_hash"] if fingerprint else None
+            if not content_hash and self.image_preprocessor.cache:
+                # Cached thumbnails are looked up by the content of the file
+                content_hash = get_file_hash(file)
+            image = self.image_preprocessor.get_cached(file, content_hash)
+            if image is None:
+                # Decoded here rather than in the embedding stage
+                image = self.image_preprocessor.preprocess(
+                    file, content_hash, uri=file, version=content_hash
                 )
+            return image
+        except FileNotFoundError:
+            print("The supplied file does not exist {}".format(file))
+        except UnidentifiedImageError:
+            print("The supplied file is not an image {}".format(file))
+        except Exception as e:
+            print("Error while reading file {}".format(file))
+            print(e)
+        return None
 
     def _get_all_file_path(self, directory):
         if os.path.isfile(directory):
@@ -0,0 +1,128 @@
+import os
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Set
+
+from typing_extensions import TypedDict
+
+
+class Fingerprint(TypedDict):
+    size: Optional[int]
+    # Modification time as a unix timestamp
+    mtime: Optional[float]
+    # Content hash, e.g. a sha256 digest of a local file or the ETag of an S3 object
+    content_hash: Optional[str]
+
+
+class ManifestEntry(Fingerprint):
+    # Collections which have indexed the document
+    collections: Set[str]
+
+
+class IngestionManifest:
+    """
+    Persistent record of ingested documents, stored in SQLite.
+
+    For every document it keeps the size, modification time and content hash seen when it was indexed,
+    along with the collections that have indexed it. Sources load the entries under the ingested prefix
+    once, so that deciding whether a document is new, changed or gone is a dictionary lookup rather
+    than a vector database query.
+    """
+
+    # Sorts after any other character, used to turn a prefix into a range over the primary key
+    _MAX_CHAR = "\U0010ffff"
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        # Entries are written from the ingestion pipeline's writer thread
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS documents ("
+                "document_id TEXT PRIMARY KEY, size INTEGER, mtime REAL, content_hash TEXT)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS indexed ("
+                "document_id TEXT, collection_name TEXT, PRIMARY KEY (document_id, collection_name))"
+            )
+
+    def get_entries(self, prefix: str = "") -> Dict[str, ManifestEntry]:
+        """Returns the entries of all documents whose id starts with `prefix`, keyed by document id."""
+        bounds = (prefix, prefix + self._MAX_CHAR)
+        entries: Dict[str, ManifestEntry] = {}
+        with self._lock:
+            for document_id, size, mtime, content_hash in self._connection.execute(
+                "SELECT document_id, size, mtime, content_hash FROM documents "
+                "WHERE document_id >= ? AND document_id < ?",
+                bounds,
+            ):
+                entries[document_id] = {
+                    "size": size,
+                    "mtime": mtime,
+                    "content_hash": content_hash,
+                    "collections": set(),
+                }
+            for document_id, collection_name in self._connection.execute(
+                "SELECT document_id, collection_name FROM indexed "
+                "WHERE document_id >= ? AND document_id < ?",
+                bounds,
+            ):
+                if document_id in entries:
+                    entries[document_id]["collections"].add(collection_name)
+        return entries
+
+    def update(self, documents: Dict[str, Fingerprint]):
+        """Stores the current fingerprint of the supplied documents, keyed by document id."""
+        with self._lock, self._connection:
+            self._upsert(documents)
+
+    def mark_indexed(self, documents: Dict[str, Fingerprint], collection_name: str):
+        """Stores the fingerprint of the supplied documents, and marks them as indexed by a collection."""
+        with self._lock, self._connection:
+            self._upsert(documents)
+            self._connection.executemany(
+                "INSERT OR IGNORE INTO indexed (document_id, collection_name) VALUES (?, ?)",
+                [(document_id, collection_name) for document_id in documents],
+            )
+
+    def reset(self, document_ids: List[str]):
+        """Forgets which collections have indexed the supplied documents, e.g. after their content changed."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM indexed WHERE document_id = ?",
+                [(document_id,) for document_id in document_ids],
+            )
+
+    def remove(self, document_ids: List[str]):
+        """Removes the supplied documents, once they have been deleted from the vector database."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "DELETE FROM indexed WHERE document_id = ?",
+                [(document_id,) for document_id in document_ids],
+            )
+            self._connection.executemany(
+                "DELETE FROM documents WHERE document_id = ?",
+                [(document_id,) for document_id in document_ids],
+            )
+
+    def _upsert(self, documents: Dict[str, Fingerprint]):
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO documents (document_id, size, mtime, content_hash) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                (
+                    document_id,
+                    fingerprint["size"],
+                    fingerprint["mtime"],
+                    fingerprint["content_hash"],
+                )
+                for document_id, fingerprint in documents.items()
+            ],
+        )
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
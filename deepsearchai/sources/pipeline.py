@@ -0,0 +1,267 @@
+import queue
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from typing_extensions import TypedDict
+
+from deepsearchai.embedding_models.base import BaseEmbeddingModel
+from deepsearchai.embedding_models.worker_pool import EmbeddingWorkerPool, get_worker_pool
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.vector_databases.base import BaseVectorDatabase
+from .configs.base import BaseSourceConfig
+from .data_source import DataSource
+from .manifest import Fingerprint
+
+
+class IngestionTask(TypedDict):
+    # Identifier stored as `document_id` in the vector database, e.g. a file path or an S3 URL
+    document_id: str
+    media_type: MEDIA_TYPE
+    # Models which still need to index this document
+    embedding_models: List[BaseEmbeddingModel]
+    # Whatever the source specific loader needs to fetch the media, e.g. a file path or an S3 key
+    location: Any
+    # State of the document at the source, recorded in the ingestion manifest once it is indexed
+    fingerprint: Optional[Fingerprint]
+
+
+# Called with the tasks of a batch once it is stored, along with the model and media type it was encoded for
+OnWritten = Callable[[List[IngestionTask], BaseEmbeddingModel, MEDIA_TYPE], None]
+# Called with a task and its loaded media once no embedding model needs the media anymore
+Release = Callable[[IngestionTask, Any], None]
+
+_DONE = object()
+
+
+class _BatchWriter(threading.Thread):
+    """Writes encoded batches to the vector database in the background."""
+
+    def __init__(
+        self,
+        vector_database: BaseVectorDatabase,
+        max_pending: int,
+        on_written: Optional[OnWritten] = None,
+    ):
+        super().__init__(daemon=True)
+        self.vector_database = vector_database
+        self.on_written = on_written
+        self.batches = queue.Queue(maxsize=max_pending)
+        self.error: Optional[BaseException] = None
+
+    def run(self):
+        while True:
+            item = self.batches.get()
+            if item is _DONE:
+                return
+            # Keep draining after a failure so that the producer never blocks on a full queue
+            if self.error is None:
+                prepared_batch, tasks, embedding_model, media_type = item
+                try:
+                    if isinstance(prepared_batch, Future):
+                        # Encoded by the worker pool, batches are still written in the order submitted
+                        prepared_batch = prepared_batch.result()
+                    self.vector_database.write_batch(prepared_batch)
+                    if self.on_written:
+                        self.on_written(tasks, embedding_model, media_type)
+                except BaseException as e:
+                    self.error = e
+
+    def submit(
+        self,
+        prepared_batch: Any,
+        tasks: List[IngestionTask],
+        embedding_model: BaseEmbeddingModel,
+        media_type: MEDIA_TYPE,
+    ):
+        if self.error is not None:
+            raise self.error
+        self.batches.put((prepared_batch, tasks, embedding_model, media_type))
+
+    def close(self):
+        self.batches.put(_DONE)
+        self.join()
+
+
+class IngestionPipeline:
+    """
+    Ingests media in three overlapping stages:
+
+    #. Reader threads load and decode media ahead of the embedding models. Loaded media is handed over
+       in the order it was listed, or as soon as it is ready when `preserve_order` is off.
+    #. The calling thread groups decoded media into batches per embedding model, and encodes them. With
+       `embedding_workers`, up to that many batches are encoded at the same time by a pool of processes,
+       or by threads of their own for models calling an API.
+    #. A writer thread stores the encoded batches in the vector database.
+
+    At most `decode_queue_size` decoded items and `write_queue_size` encoded batches, plus the batches
+    being encoded by the workers, are held at any time, so a slow stage applies backpressure to the ones
+    before it instead of growing memory use.
+    """
+
+    def __init__(self, config: BaseSourceConfig):
+        self.config = config
+
+    def run(
+        self,
+        tasks: Iterable[IngestionTask],
+        load: Callable[[IngestionTask], Any],
+        vector_database: BaseVectorDatabase,
+        datasource: DataSource,
+        source: str,
+        on_written: Optional[OnWritten] = None,
+        release: Optional[Release] = None,
+    ) -> None:
+        """
+        Loads, encodes and stores every task.
+
+        :param tasks: Media to ingest, consumed lazily
+        :param load: Returns the decoded media of a task, or None to skip it. Called from reader threads
+        :param vector_database: Database the encodings are written to
+        :param datasource: Datasource the media originates from
+        :param source: Source supplied by the user, stored as `source_id`
+        :param on_written: Called from the writer thread after every stored batch
+        :param release: Called once every embedding model of a task has encoded its media, or ingestion
+            stopped, e.g. to let a cache evict a downloaded file. Only called for loaded media
+        """
+        tasks = iter(tasks)
+        embedding_workers = self.config.embedding_workers
+        # Loaded media which embedding models still have to encode, with the number of those models
+        loaded: Dict[int, Tuple[IngestionTask, Any, int]] = {}
+        loaded_lock = threading.Lock()
+
+        def release_encoded(batch_tasks: List[IngestionTask]):
+            for task in batch_tasks:
+                with loaded_lock:
+                    task, data, remaining = loaded.pop(id(task))
+                    if remaining > 1:
+                        loaded[id(task)] = (task, data, remaining - 1)
+                        continue
+                release(task, data)
+
+        def written(
+            batch_tasks: List[IngestionTask],
+            embedding_model: BaseEmbeddingModel,
+            media_type: MEDIA_TYPE,
+        ):
+            if on_written:
+                on_written(batch_tasks, embedding_model, media_type)
+            if release:
+                release_encoded(batch_tasks)
+
+        writer = _BatchWriter(
+            vector_database, self.config.write_queue_size + embedding_workers, written
+        )
+        writer.start()
+        executor = ThreadPoolExecutor(max_workers=self.config.decode_workers)
+        # Threads waiting on the worker processes, one per batch being encoded
+        encoder = (
+            ThreadPoolExecutor(max_workers=embedding_workers)
+            if embedding_workers
+            else None
+        )
+        pool = get_worker_pool(embedding_workers) if embedding_workers else None
+        in_flight: Dict[Future, IngestionTask] = {}
+        # Submission order, used to hand loaded media over in the order the source listed it
+        submitted = deque()
+        pending: Dict[Tuple[BaseEmbeddingModel, MEDIA_TYPE], List[Tuple[IngestionTask, Any]]] = {}
+
+        def submit_next():
+            task = next(tasks, None)
+            if task is not None:
+                future = executor.submit(load, task)
+                in_flight[future] = task
+                if self.config.preserve_order:
+                    submitted.append(future)
+
+        def next_loaded() -> List[Future]:
+            if self.config.preserve_order:
+                return [submitted.popleft()]
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            return list(done)
+
+        completed = False
+        try:
+            for _ in range(self.config.decode_queue_size):
+                submit_next()
+            while in_flight:
+                for future in next_loaded():
+                    task = in_flight.pop(future)
+                    data = future.result()
+                    submit_next()
+                    if data is None:
+                        continue
+                    if release:
+                        with loaded_lock:
+                            loaded[id(task)] = (task, data, len(task["embedding_models"]))
+                    for embedding_model in task["embedding_models"]:
+                        key = (embedding_model, task["media_type"])
+                        batch = pending.setdefault(key, [])
+                        batch.append((task, data))
+                        if len(batch) >= self.config.batch_size:
+                            self._encode(
+                                pending.pop(key),
+                                key,
+                                vector_database,
+                                datasource,
+                                source,
+                                writer,
+                                encoder,
+                                pool,
+                            )
+            for key, batch in pending.items():
+                self._encode(
+                    batch, key, vector_database, datasource, source, writer, encoder, pool
+                )
+            completed = True
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if encoder is not None:
+                # Batches waiting for a worker are dropped only when ingestion failed
+                encoder.shutdown(wait=True, cancel_futures=not completed)
+            writer.close()
+            if release:
+                # Media which was loaded but never stored, after a failure
+                for task, data, _ in loaded.values():
+                    release(task, data)
+                for future, task in in_flight.items():
+                    if future.cancelled() or future.exception() is not None:
+                        continue
+                    if future.result() is not None:
+                        release(task, future.result())
+        if writer.error is not None:
+            raise writer.error
+
+    def _encode(
+        self,
+        batch: List[Tuple[IngestionTask, Any]],
+        key: Tuple[BaseEmbeddingModel, MEDIA_TYPE],
+        vector_database: BaseVectorDatabase,
+        datasource: DataSource,
+        source: str,
+        writer: _BatchWriter,
+        encoder: Optional[ThreadPoolExecutor] = None,
+        pool: Optional[EmbeddingWorkerPool] = None,
+    ):
+        embedding_model, media_type = key
+        args = (
+            [item[1] for item in batch],
+            datasource,
+            [item[0]["document_id"] for item in batch],
+            source,
+            media_type,
+        )
+        if encoder is not None:
+            # Models calling an API are encoded by the waiting thread itself, they gain nothing from a
+            # process and hold state, e.g. locks, which cannot be sent to one
+            if getattr(embedding_model, "LOCAL_WEIGHTS", True):
+                embedding_model = pool.wrap(embedding_model)
+            prepared_batch = encoder.submit(
+                vector_database.prepare_batch, *args, embedding_model
+            )
+        else:
+            prepared_batch = vector_database.prepare_batch(*args, embedding_model)
+        writer.submit(
+            prepared_batch, [item[0] for item in batch], embedding_model, media_type
+        )
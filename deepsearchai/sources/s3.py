@@ -1,27 +1,82 @@
 import io
 import os
+import threading
 import urllib.parse
+from typing import Any, Dict, Iterator, List, Optional
 
 import boto3
-from PIL import Image, UnidentifiedImageError
+from botocore.config import Config
+from PIL import UnidentifiedImageError
 
+from deepsearchai.caches.media_cache import MediaCache
 from deepsearchai.embedding_models_config import EmbeddingModelsConfig
 from deepsearchai.enums import MEDIA_TYPE
 from deepsearchai.sources.base import BaseSource
+from deepsearchai.sources.configs.s3 import S3SourceConfig
 from deepsearchai.sources.data_source import DataSource
-from deepsearchai.utils import get_mime_type
+from deepsearchai.sources.image_preprocessing import ImagePreprocessor
+from deepsearchai.sources.manifest import Fingerprint, IngestionManifest, ManifestEntry
+from deepsearchai.sources.pipeline import IngestionPipeline, IngestionTask
+from deepsearchai.utils import get_media_hash, get_mime_type
 from deepsearchai.vector_databases.base import BaseVectorDatabase
 
 
+class _InflightBytesLimiter:
+    """Blocks readers while the bytes being downloaded would exceed a budget."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.inflight_bytes = 0
+        self._condition = threading.Condition()
+
+    def acquire(self, size: int):
+        with self._condition:
+            # An object larger than the whole budget is let through once nothing else is in flight
+            self._condition.wait_for(
+                lambda: self.inflight_bytes == 0
+                or self.inflight_bytes + size <= self.max_bytes
+            )
+            self.inflight_bytes += size
+
+    def release(self, size: int):
+        with self._condition:
+            self.inflight_bytes -= size
+            self._condition.notify_all()
+
+
 class S3DataSource(BaseSource):
-    def __init__(self):
+    SUPPORTED_MEDIA_TYPES = [MEDIA_TYPE.IMAGE, MEDIA_TYPE.AUDIO]
+
+    def __init__(self, config: Optional[S3SourceConfig] = None):
+        self.config = config if config else S3SourceConfig()
         self.access_key = os.environ.get("AWS_ACCESS_KEY")
         self.secret_key = os.environ.get("AWS_SECRET_KEY")
+        # boto3 clients are thread safe, a single one is shared by all the pipeline's readers
         self.client = boto3.client(
             "s3",
             aws_access_key_id=self.access_key,
             aws_secret_access_key=self.secret_key,
             region_name="us-east-1",
+            config=Config(max_pool_connections=self.config.max_pool_connections),
+        )
+        self.inflight_bytes_limiter = _InflightBytesLimiter(
+            self.config.max_inflight_bytes
+        )
+        self.manifest = (
+            IngestionManifest(self.config.manifest_path)
+            if self.config.manifest_path
+            else None
+        )
+        self.media_cache = MediaCache(
+            self.config.media_cache_path, self.config.media_cache_max_bytes
+        )
+        self.image_preprocessor = ImagePreprocessor(
+            self.config.image_min_side,
+            MediaCache(
+                self.config.image_cache_path, self.config.image_cache_max_bytes
+            )
+            if self.config.image_cache_path
+            else None,
         )
         super().__init__()
 
@@ -30,70 +85,259 @@ class S3DataSource(BaseSource):
         source: str,
         embedding_models_config: EmbeddingModelsConfig,
         vector_database: BaseVectorDatabase,
-    ) -> None:
+    ) -> List[str]:
+        """Ingests all the supported objects under an S3 bucket or prefix.
+
+        Args:
+          source: The S3 URL of a bucket, folder or object.
+          embedding_models_config: The embedding models to index the objects with.
+          vector_database: The vector database to store the encodings in.
+
+        Returns:
+          The S3 URLs of previously ingested objects which no longer exist under `source`, and whose
+          vectors have therefore been deleted. Only tracked in delta sync mode, empty otherwise.
+        """
         bucket_name = self._get_s3_bucket_name(source)
         key = self._get_s3_object_key_name(source)
-        objects, s3_paths = self._get_all_objects_inside_an_object(bucket_name, key)
+        # Images are only hashed for the artifact store
+        hash_content = getattr(vector_database, "artifact_store", None) is not None
+        if not self.manifest:
+            objects, s3_paths = self._get_all_objects_inside_an_object(
+                bucket_name, key
+            )
+            tasks = self._get_ingestion_tasks(
+                objects, s3_paths, embedding_models_config, vector_database
+            )
+            IngestionPipeline(self.config).run(
+                tasks,
+                lambda task: self._load(bucket_name, task, hash_content),
+                vector_database,
+                DataSource.LOCAL,
+                source,
+                release=self._release,
+            )
+            return []
+
+        objects = self._list_objects(bucket_name, key)
+        # The checkpoint of a bucket and prefix is made of the manifest entries under it
+        entries = self.manifest.get_entries("s3://{}/{}".format(bucket_name, key))
+        tasks = self._get_changed_ingestion_tasks(
+            bucket_name, objects, entries, embedding_models_config, vector_database
+        )
+        IngestionPipeline(self.config).run(
+            tasks,
+            lambda task: self._load(bucket_name, task, hash_content),
+            vector_database,
+            DataSource.LOCAL,
+            source,
+            on_written=self._mark_indexed,
+            release=self._release,
+        )
+
+        listed_s3_paths = {
+            self._get_s3_path(bucket_name, s3_object["Key"]) for s3_object in objects
+        }
+        deleted_s3_paths = [
+            document_id for document_id in entries if document_id not in listed_s3_paths
+        ]
+        if deleted_s3_paths:
+            print(
+                "{} previously ingested objects no longer exist under {}, deleting them...".format(
+                    len(deleted_s3_paths), source
+                )
+            )
+            self._remove_deleted(deleted_s3_paths, vector_database)
+        return deleted_s3_paths
+
+    def _get_ingestion_tasks(
+        self,
+        objects: List[str],
+        s3_paths: List[str],
+        embedding_models_config: EmbeddingModelsConfig,
+        vector_database: BaseVectorDatabase,
+    ) -> Iterator[IngestionTask]:
         existing_document_identifiers = {}
         for s3_object, object_s3_path in zip(objects, s3_paths):
             media_type = get_mime_type(s3_object)
-            embedding_models = embedding_models_config.get_embedding_model(media_type)
-            for embedding_model in embedding_models:
-                if media_type not in existing_document_identifiers:
-                    existing_document_identifiers[
-                        media_type
-                    ] = vector_database.get_existing_document_ids(
-                        {"document_id": s3_paths},
-                        embedding_model.get_collection_name(media_type),
-                    )
-
-                if object_s3_path in existing_document_identifiers[media_type]:
-                    "{} already exists, skipping...".format(object_s3_path)
-                    continue
-                if media_type == MEDIA_TYPE.IMAGE:
-                    data = self._load_image_from_s3(bucket_name, s3_object)
-                    if data is None:
-                        continue
-                elif media_type == MEDIA_TYPE.AUDIO:
-                    data = self._load_audio_from_s3(bucket_name, s3_object)
-                else:
-                    print("Unsupported media type {}".format(s3_object))
-                    continue
-                vector_database.add(
-                    data,
-                    DataSource.LOCAL,
-                    object_s3_path,
-                    source,
-                    media_type,
-                    embedding_model,
+            embedding_models = []
+            for embedding_model in embedding_models_config.get_embedding_model(
+                media_type
+            ):
+                existing_s3_paths = self._get_existing_documents(
+                    s3_paths,
+                    embedding_model.get_collection_name(media_type),
+                    vector_database,
+                    existing_document_identifiers,
                 )
+                if object_s3_path in existing_s3_paths:
+                    continue
+                embedding_models.append(embedding_model)
 
-    def _load_audio_from_s3(self, bucket_name, object_key):
-        """Loads an audio file from S3 and returns the audio data."""
-        # Create the directory if it doesn't exist
-        if not os.path.exists("/tmp/deepsearch"):
-            os.makedirs("/tmp/deepsearch")
-        local_file_path = "/tmp/deepsearch/{}".format(object_key)
-        self.client.download_file(bucket_name, object_key, local_file_path)
-        return local_file_path
+            if not embedding_models:
+                continue
+            if media_type not in self.SUPPORTED_MEDIA_TYPES:
+                print("Unsupported media type {}".format(s3_object))
+                continue
+            yield {
+                "document_id": object_s3_path,
+                "media_type": media_type,
+                "embedding_models": embedding_models,
+                "location": s3_object,
+                "fingerprint": None,
+            }
 
-    def _load_image_from_s3(self, bucket_name, object_key):
-        """Loads an image from S3 and opens it using PIL.
+    def _get_changed_ingestion_tasks(
+        self,
+        bucket_name: str,
+        objects: List[Dict[str, Any]],
+        entries: Dict[str, ManifestEntry],
+        embedding_models_config: EmbeddingModelsConfig,
+        vector_database: BaseVectorDatabase,
+    ) -> Iterator[IngestionTask]:
+        s3_paths = [
+            self._get_s3_path(bucket_name, s3_object["Key"]) for s3_object in objects
+        ]
+        # A prefix synced for the first time may have been ingested before delta syncs were enabled
+        existing_document_identifiers = {} if not entries else None
+        for s3_object, object_s3_path in zip(objects, s3_paths):
+            media_type = get_mime_type(s3_object["Key"])
+            embedding_models = embedding_models_config.get_embedding_model(media_type)
+            if not embedding_models:
+                continue
+            if media_type not in self.SUPPORTED_MEDIA_TYPES:
+                print("Unsupported media type {}".format(s3_object["Key"]))
+                continue
+
+            last_modified = s3_object.get("LastModified")
+            fingerprint: Fingerprint = {
+                "size": s3_object.get("Size"),
+                "mtime": last_modified.timestamp() if last_modified else None,
+                "content_hash": s3_object.get("ETag"),
+            }
+            entry = entries.get(object_s3_path)
+            if entry and entry["content_hash"] != fingerprint["content_hash"]:
+                self._reindex(object_s3_path, media_type, vector_database)
+                entry = None
+
+            embedding_models = self._get_unindexed_models(
+                object_s3_path,
+                media_type,
+                embedding_models,
+                fingerprint,
+                entry,
+                s3_paths,
+                vector_database,
+                existing_document_identifiers,
+            )
+            if not embedding_models:
+                continue
+            yield {
+                "document_id": object_s3_path,
+                "media_type": media_type,
+                "embedding_models": embedding_models,
+                "location": s3_object["Key"],
+                "fingerprint": fingerprint,
+            }
+
+    def _load(self, bucket_name: str, task: IngestionTask, hash_content: bool = False):
+        """Fetches the media of a task, runs on the pipeline's reader threads, up to `max_concurrency` at a time."""
+        fingerprint = task.get("fingerprint")
+        etag = fingerprint["content_hash"] if fingerprint else None
+        if task["media_type"] == MEDIA_TYPE.IMAGE:
+            return self._load_image_from_s3(
+                bucket_name, task["location"], etag, hash_content
+            )
+        size = fingerprint["size"] if fingerprint else None
+        return self._load_audio_from_s3(bucket_name, task["location"], etag, size)
+
+    def _release(self, task: IngestionTask, data: Any):
+        if task["media_type"] != MEDIA_TYPE.IMAGE:
+            self.media_cache.release(data)
+
+    def _load_audio_from_s3(self, bucket_name, object_key, etag=None, size=None):
+        """Downloads an audio file from S3 into the media cache, unless the same version is already there.
+
+        The file is pinned in the cache, so that it is not evicted before it is transcribed, until it is
+        released with `media_cache.release`.
+
+        Args:
+          bucket_name: The name of the S3 bucket.
+          object_key: The key of the audio object.
+          etag: The ETag of the object if it is already known, otherwise it is looked up.
+          size: The size of the object in bytes if it is already known, otherwise it is looked up.
+
+        Returns:
+          The path of the downloaded file.
+        """
+        if not etag or size is None:
+            response = self.client.head_object(Bucket=bucket_name, Key=object_key)
+            etag = etag or response.get("ETag", "").strip('"') or None
+            size = response.get("ContentLength") or 0
+
+        def download(path: str):
+            # The file counts against the in-flight budget until it is fully downloaded
+            self.inflight_bytes_limiter.acquire(size)
+            try:
+                self.client.download_file(bucket_name, object_key, path)
+            finally:
+                self.inflight_bytes_limiter.release(size)
+
+        return self.media_cache.get_or_download(
+            self._get_s3_path(bucket_name, object_key),
+            etag,
+            download,
+            suffix=os.path.splitext(object_key)[1],
+            pin=True,
+        )
+
+    def _load_image_from_s3(self, bucket_name, object_key, etag=None, hash_content=False):
+        """Loads an image from S3 and decodes it to a thumbnail, unless it is already cached.
 
         Args:
           bucket_name: The name of the S3 bucket.
           object_key: The key of the image object.
+          etag: The ETag of the object if it is already known, which allows the thumbnail cache to be
+            checked before downloading it.
+          hash_content: Whether the digest of the downloaded bytes is stored in the image, for the
+            artifact store to identify it by.
 
         Returns:
           A PIL Image object.
         """
+        s3_path = self._get_s3_path(bucket_name, object_key)
+        image = self.image_preprocessor.get_cached(s3_path, etag)
+        if image is not None:
+            return image
 
         response = self.client.get_object(Bucket=bucket_name, Key=object_key)
-        image_data = response["Body"].read()
+        if not etag:
+            etag = response.get("ETag", "").strip('"') or None
+        # The raw bytes count against the in-flight budget until they have been decoded
+        size = response.get("ContentLength") or 0
+        self.inflight_bytes_limiter.acquire(size)
+        try:
+            return self._decode_image(
+                response["Body"].read(), bucket_name, object_key, etag, hash_content
+            )
+        finally:
+            self.inflight_bytes_limiter.release(size)
 
-        image_stream = io.BytesIO(image_data)
+    def _decode_image(
+        self,
+        image_data: bytes,
+        bucket_name: str,
+        object_key: str,
+        etag: Optional[str] = None,
+        hash_content: bool = False,
+    ):
         try:
-            return Image.open(image_stream)
+            # Lets the artifact store identify the image without hashing its decoded pixels
+            return self.image_preprocessor.preprocess(
+                io.BytesIO(image_data),
+                get_media_hash(image_data) if hash_content else None,
+                uri=self._get_s3_path(bucket_name, object_key),
+                version=etag,
+            )
         except UnidentifiedImageError:
             print(
                 "The supplied file is not an image {}".format(
@@ -149,26 +393,45 @@ class S3DataSource(BaseSource):
 
         files = []
         s3_paths = []
-        if not object_key:
-            response = self.client.list_objects_v2(Bucket=bucket_name)
-        else:
-            response = self.client.list_objects_v2(
-                Bucket=bucket_name, Prefix=object_key
-            )
+        for s3_object in self._list_objects(bucket_name, object_key):
+            files.append(s3_object["Key"])
+            s3_paths.append(self._get_s3_path(bucket_name, s3_object["Key"]))
+        return files, s3_paths
+
+    def _list_objects(self, bucket_name, object_key) -> List[Dict[str, Any]]:
+        """Lists all the objects under a prefix of an S3 bucket, skipping folder markers.
+
+        Args:
+          bucket_name: The name of the S3 bucket.
+          object_key: The prefix to list the objects under, or an empty string for the whole bucket.
+
+        Returns:
+          The listed objects, with their `Key`, `Size`, `ETag` and `LastModified`.
+        """
 
+        objects = []
+        list_args = {"Bucket": bucket_name}
+        if object_key:
+            list_args["Prefix"] = object_key
         while True:
-            for object in response["Contents"]:
-                if object["Key"].endswith("/"):
+            response = self.client.list_objects_v2(**list_args)
+            for s3_object in response.get("Contents", []):
+                if s3_object["Key"].endswith("/"):
                     continue
-                files.append(object["Key"])
-                s3_paths.append("s3://{}/{}".format(bucket_name, object["Key"]))
+                objects.append(
+                    {
+                        "Key": s3_object["Key"],
+                        "Size": s3_object.get("Size"),
+                        "ETag": s3_object.get("ETag", "").strip('"') or None,
+                        "LastModified": s3_object.get("LastModified"),
+                    }
+                )
 
             if "NextContinuationToken" in response:
-                response = self.client.list_objects_v2(
-                    Bucket=bucket_name,
-                    Prefix=object_key + "/",
-                    ContinuationToken=response["NextContinuationToken"],
-                )
+                list_args["ContinuationToken"] = response["NextContinuationToken"]
             else:
                 break
-        return files, s3_paths
+        return objects
+
+    def _get_s3_path(self, bucket_name: str, object_key: str) -> str:
+        return "s3://{}/{}".format(bucket_name, object_key)
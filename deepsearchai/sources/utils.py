@@ -1,12 +1,22 @@
+import asyncio
 import mimetypes
 import os
 import re
-from typing import Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
 
 from deepsearchai.embedding_models_config import EmbeddingModelsConfig
 from deepsearchai.enums import MEDIA_TYPE
-from deepsearchai.types import MediaData
+from deepsearchai.executors import INGESTION_EXECUTOR, run_in_executor
+from deepsearchai.embedding_models.base import BaseEmbeddingModel
+from deepsearchai.types import MediaData, QueryBranchTiming, QueryTimings
 from deepsearchai.vector_databases.base import BaseVectorDatabase
+from deepsearchai.vector_databases.postprocessing import fuse_results
+from .configs.local import LocalSourceConfig
+from .configs.s3 import S3SourceConfig
+from .configs.youtube import YoutubeSourceConfig
 from .data_source import DataSource
 from .local import LocalDataSource
 from .s3 import S3DataSource
@@ -14,53 +24,263 @@ from .youtube import YoutubeDatasource
 
 
 class SourceUtils:
-    def __init__(self):
-        self.local_data_source = LocalDataSource()
-        self.s3_data_source = S3DataSource()
-        self.youtube_data_source = YoutubeDatasource()
+    # Greatest cosine distance of the hits returned by queries, i.e. a similarity of at least 0
+    DISTANCE_THRESHOLD = 1.0
+
+    def __init__(
+        self,
+        local_source_config: Optional[LocalSourceConfig] = None,
+        s3_source_config: Optional[S3SourceConfig] = None,
+        youtube_source_config: Optional[YoutubeSourceConfig] = None,
+        query_workers: int = 8,
+    ):
+        """
+        :param query_workers: Number of collections searched at the same time by `get_data`, shared by
+            all the queries of this instance, defaults to 8
+        """
+        if query_workers < 1:
+            raise ValueError("query_workers should be a positive integer")
+        self.local_data_source = LocalDataSource(local_source_config)
+        self.s3_data_source = S3DataSource(s3_source_config)
+        self.youtube_data_source = YoutubeDatasource(youtube_source_config)
+        self.query_workers = query_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
 
     def add_data(
         self,
         source: str,
         embedding_models_config: EmbeddingModelsConfig,
         vector_database: BaseVectorDatabase,
-    ) -> None:
+    ) -> Optional[List[str]]:
         datasource = self._infer_type(source)
         if datasource == DataSource.S3:
-            self.s3_data_source.add_data(
+            return self.s3_data_source.add_data(
                 source, embedding_models_config, vector_database
             )
         elif datasource == DataSource.LOCAL:
-            self.local_data_source.add_data(
+            return self.local_data_source.add_data(
                 source, embedding_models_config, vector_database
             )
         elif datasource == DataSource.YOUTUBE:
-            self.youtube_data_source.add_data(
+            return self.youtube_data_source.add_data(
                 source, embedding_models_config, vector_database
             )
         else:
             raise ValueError("Invalid data source")
 
+    async def aadd_data(
+        self,
+        source: str,
+        embedding_models_config: EmbeddingModelsConfig,
+        vector_database: BaseVectorDatabase,
+    ) -> Optional[List[str]]:
+        """
+        Asyncio variant of `add_data`. Ingestion runs its own pipeline of threads, which is handed to a
+        bounded pool of threads as a whole.
+        """
+        return await run_in_executor(
+            INGESTION_EXECUTOR,
+            self.add_data,
+            source,
+            embedding_models_config,
+            vector_database,
+        )
+
     def get_data(
         self,
         query: str,
         media_types: List[MEDIA_TYPE],
         embedding_models_config: EmbeddingModelsConfig,
         vector_database: BaseVectorDatabase,
-        n_results: int
+        n_results: int,
+        timings: Optional[QueryTimings] = None,
     ) -> Dict[MEDIA_TYPE, List[MediaData]]:
-        media_data = {}
+        """
+        Searches the collection of every embedding model of every supplied media type.
+
+        Collections are searched concurrently, up to `query_workers` at a time, so that a query takes about
+        as long as its slowest collection. The results of the collections of a media type are fused into
+        its `n_results` best documents, see `fuse_results`.
+
+        :param timings: Filled in with how long the query took, in total and for every collection it
+            searched, when supplied
+        """
+        start = time.perf_counter()
+        branches = self._get_query_branches(media_types, embedding_models_config)
+
+        def search(branch: Tuple[MEDIA_TYPE, BaseEmbeddingModel]):
+            media_type, embedding_model = branch
+            branch_start = time.perf_counter()
+            results = vector_database.query(
+                query,
+                n_results,
+                media_type,
+                self.DISTANCE_THRESHOLD,
+                embedding_model,
+                # Fused by document, so every collection has to supply `n_results` distinct ones
+                collapse=True,
+            )
+            return results, time.perf_counter() - branch_start
+
+        if len(branches) > 1:
+            branch_results = list(self._get_executor().map(search, branches))
+        else:
+            # Not worth a thread hop
+            branch_results = [search(branch) for branch in branches]
+        self._record_timings(timings, branches, branch_results, start)
+        return self._gather_query_results(
+            media_types, branches, branch_results, n_results
+        )
+
+    async def aget_data(
+        self,
+        query: str,
+        media_types: List[MEDIA_TYPE],
+        embedding_models_config: EmbeddingModelsConfig,
+        vector_database: BaseVectorDatabase,
+        n_results: int,
+        timings: Optional[QueryTimings] = None,
+    ) -> Dict[MEDIA_TYPE, List[MediaData]]:
+        """Asyncio variant of `get_data`, searching the collections through `vector_database.aquery`."""
+        start = time.perf_counter()
+        branches = self._get_query_branches(media_types, embedding_models_config)
+
+        async def search(branch: Tuple[MEDIA_TYPE, BaseEmbeddingModel]):
+            media_type, embedding_model = branch
+            branch_start = time.perf_counter()
+            results = await vector_database.aquery(
+                query,
+                n_results,
+                media_type,
+                self.DISTANCE_THRESHOLD,
+                embedding_model,
+                collapse=True,
+            )
+            return results, time.perf_counter() - branch_start
+
+        branch_results = await asyncio.gather(*[search(branch) for branch in branches])
+        self._record_timings(timings, branches, branch_results, start)
+        return self._gather_query_results(
+            media_types, branches, branch_results, n_results
+        )
+
+    def get_data_batch(
+        self,
+        queries: List[str],
+        media_types: List[MEDIA_TYPE],
+        embedding_models_config: EmbeddingModelsConfig,
+        vector_database: BaseVectorDatabase,
+        n_results: int,
+        timings: Optional[QueryTimings] = None,
+    ) -> List[Dict[MEDIA_TYPE, List[MediaData]]]:
+        """
+        Batch variant of `get_data`, returns the results of every query, in order.
+
+        Every collection is searched for all the queries at once with `vector_database.query_batch`, and
+        collections are searched concurrently.
+
+        :param timings: Filled in with how long the whole batch took, in total and for every collection
+            it searched, when supplied
+        """
+        start = time.perf_counter()
+        branches = self._get_query_branches(media_types, embedding_models_config)
+
+        def search(branch: Tuple[MEDIA_TYPE, BaseEmbeddingModel]):
+            media_type, embedding_model = branch
+            branch_start = time.perf_counter()
+            results = vector_database.query_batch(
+                queries,
+                n_results,
+                media_type,
+                self.DISTANCE_THRESHOLD,
+                embedding_model,
+                collapse=True,
+            )
+            return results, time.perf_counter() - branch_start
+
+        if len(branches) > 1:
+            branch_results = list(self._get_executor().map(search, branches))
+        else:
+            branch_results = [search(branch) for branch in branches]
+        self._record_timings(timings, branches, branch_results, start)
+        return [
+            self._gather_query_results(
+                media_types,
+                branches,
+                [(results[i], seconds) for results, seconds in branch_results],
+                n_results,
+            )
+            for i in range(len(queries))
+        ]
+
+    def _get_query_branches(
+        self,
+        media_types: List[MEDIA_TYPE],
+        embedding_models_config: EmbeddingModelsConfig,
+    ) -> List[Tuple[MEDIA_TYPE, BaseEmbeddingModel]]:
+        branches = []
         for media_type in media_types:
             if media_type == MEDIA_TYPE.UNKNOWN:
                 continue
-            media_data[media_type] = []
             for embedding_model in embedding_models_config.get_embedding_model(
                 media_type
             ):
-                media_data[media_type].extend(
-                    vector_database.query(query, n_results, media_type, 0.5, embedding_model)
+                branches.append((media_type, embedding_model))
+        return branches
+
+    def _gather_query_results(
+        self,
+        media_types: List[MEDIA_TYPE],
+        branches: List[Tuple[MEDIA_TYPE, BaseEmbeddingModel]],
+        branch_results: List[Tuple[List[MediaData], float]],
+        n_results: int,
+    ) -> Dict[MEDIA_TYPE, List[MediaData]]:
+        """Fuses the results of the branches of every media type into its `n_results` best documents."""
+        results_by_media_type: Dict[MEDIA_TYPE, List[List[MediaData]]] = {
+            media_type: []
+            for media_type in media_types
+            if media_type != MEDIA_TYPE.UNKNOWN
+        }
+        for (media_type, _), (results, _) in zip(branches, branch_results):
+            results_by_media_type[media_type].append(results)
+        # e.g. an image found both by CLIP and by its caption is returned once
+        return {
+            media_type: fuse_results(result_lists, n_results)
+            for media_type, result_lists in results_by_media_type.items()
+        }
+
+    @staticmethod
+    def _record_timings(
+        timings: Optional[QueryTimings],
+        branches: List[Tuple[MEDIA_TYPE, BaseEmbeddingModel]],
+        branch_results: List[Tuple[object, float]],
+        start: float,
+    ):
+        # Written to the caller's dict, so that concurrent queries never see each other's timings
+        if timings is None:
+            return
+        branch_timings: List[QueryBranchTiming] = [
+            {
+                "media_type": media_type,
+                "model": embedding_model.MODEL_NAME,
+                "seconds": seconds,
+            }
+            for (media_type, embedding_model), (_, seconds) in zip(
+                branches, branch_results
+            )
+        ]
+        timings["total_seconds"] = time.perf_counter() - start
+        timings["branches"] = branch_timings
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.query_workers,
+                    thread_name_prefix="deepsearch-query",
                 )
-        return media_data
+            return self._executor
 
     def _infer_type(self, source: str) -> DataSource:
         if self._is_s3_path(source):
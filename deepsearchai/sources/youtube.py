@@ -1,17 +1,33 @@
 import os
+from typing import Iterator, List, Optional
 
+from deepsearchai.caches.media_cache import MediaCache
 from deepsearchai.embedding_models_config import EmbeddingModelsConfig
 from deepsearchai.enums import MEDIA_TYPE
 from deepsearchai.vector_databases.base import BaseVectorDatabase
 from .base import BaseSource
+from .configs.youtube import YoutubeSourceConfig
 from .data_source import DataSource
+from .pipeline import IngestionPipeline, IngestionTask
 
 
 class YoutubeDatasource(BaseSource):
-    OUTPUT_PATH = "tmp/deepsearch/youtube/"
+    # Maximum page size of the YouTube Data API
+    PLAYLIST_PAGE_SIZE = 50
 
-    def __init__(self):
-        self.youtube_client = None
+    def __init__(
+        self, config: Optional[YoutubeSourceConfig] = None, youtube_client=None
+    ):
+        """
+        :param config: Configuration of the data source
+        :param youtube_client: YouTube Data API client, e.g. a stand-in for tests. Defaults to a
+            `googleapiclient` client authenticated with the `GOOGLE_CLIENT_API_KEY` env variable
+        """
+        self.config = config if config else YoutubeSourceConfig()
+        self.youtube_client = youtube_client
+        self.media_cache = MediaCache(
+            self.config.media_cache_path, self.config.media_cache_max_bytes
+        )
         super().__init__()
 
     def add_data(
@@ -19,41 +35,106 @@ class YoutubeDatasource(BaseSource):
             source: str,
             embedding_models_config: EmbeddingModelsConfig,
             vector_database: BaseVectorDatabase,
-    ) -> None:
+    ) -> List[str]:
+        """
+        Ingests all the videos uploaded by a YouTube channel, e.g. `youtube:<channel name>`.
+
+        Audio streams are downloaded by `download_workers` threads while the embedding models transcribe
+        the videos downloaded before them. Every video is stored as soon as it is transcribed, and videos
+        already in the vector database are skipped, so an interrupted run resumes where it stopped.
+        """
         self._set_youtube_client()
         channel_name = source.split(":")[1]
         channel_id = self._get_channel_id(channel_name)
         video_ids = self._get_channel_video_ids(channel_id)
+        print("Found {} videos for {}".format(len(video_ids), source))
+        tasks = self._get_ingestion_tasks(
+            video_ids, embedding_models_config, vector_database
+        )
+        IngestionPipeline(self.config).run(
+            tasks,
+            self._load,
+            vector_database,
+            DataSource.LOCAL,
+            source,
+            # Downloads are pinned in the media cache until they are transcribed
+            release=lambda task, path: self.media_cache.release(path),
+        )
+        return []
+
+    def _get_ingestion_tasks(
+        self,
+        video_ids: List[str],
+        embedding_models_config: EmbeddingModelsConfig,
+        vector_database: BaseVectorDatabase,
+    ) -> Iterator[IngestionTask]:
+        existing_document_identifiers = {}
         for video_id in video_ids:
-            data = self._chunk_and_load_video(video_id)
-            embedding_models = embedding_models_config.get_embedding_model(
+            embedding_models = []
+            for embedding_model in embedding_models_config.get_embedding_model(
                 MEDIA_TYPE.VIDEO
-            )
-            for embedding_model in embedding_models:
-                vector_database.add(
-                    data,
-                    DataSource.LOCAL,
-                    video_id,
-                    source,
-                    MEDIA_TYPE.VIDEO,
-                    embedding_model,
+            ):
+                if embedding_model.REQUIRES_VIDEO_STREAM:
+                    # Only the audio of videos is downloaded
+                    continue
+                existing_video_ids = self._get_existing_documents(
+                    video_ids,
+                    embedding_model.get_collection_name(MEDIA_TYPE.VIDEO),
+                    vector_database,
+                    existing_document_identifiers,
                 )
+                if video_id in existing_video_ids:
+                    continue
+                embedding_models.append(embedding_model)
+
+            if not embedding_models:
+                continue
+            yield {
+                "document_id": video_id,
+                "media_type": MEDIA_TYPE.VIDEO,
+                "embedding_models": embedding_models,
+                "location": video_id,
+                "fingerprint": None,
+            }
+
+    def _load(self, task: IngestionTask):
+        """Downloads the audio of a video, runs on the pipeline's download threads."""
+        try:
+            return self._chunk_and_load_video(task["location"])
+        except ModuleNotFoundError:
+            raise
+        except Exception as e:
+            # A single unavailable video, e.g. a private or age restricted one, should not stop the others
+            print("Error while downloading video {}".format(task["location"]))
+            print(e)
+            return None
 
     def _chunk_and_load_video(self, video_id):
+        url = f"https://www.youtube.com/watch?v={video_id}"
+        # Videos cannot be replaced in place on YouTube, so the id alone identifies the download
+        path = self.media_cache.get(url, suffix=".mp4", pin=True)
+        if path:
+            return path
         try:
             # Download the audio of the video
             import pytube
 
-            yt = pytube.YouTube(f"https://www.youtube.com/watch?v={video_id}")
+            yt = pytube.YouTube(url)
         except ModuleNotFoundError:
             raise ModuleNotFoundError(
                 "The required dependencies for audio/video are not installed."
                 ' Please install with `pip install --upgrade "deepsearchai[video]"`'
             )
         audio = yt.streams.filter(only_audio=True).first()
-        filename = "{}/{}".format(self.OUTPUT_PATH, audio.default_filename)
-        audio.download(output_path=self.OUTPUT_PATH)
-        return filename
+        return self.media_cache.get_or_download(
+            url,
+            None,
+            lambda path: audio.download(
+                output_path=os.path.dirname(path), filename=os.path.basename(path)
+            ),
+            suffix=".mp4",
+            pin=True,
+        )
 
     def _get_channel_video_ids(self, channel_id):
         """Gets the video IDs for a YouTube channel.
@@ -75,31 +156,43 @@ class YoutubeDatasource(BaseSource):
             "relatedPlaylists"
         ]["uploads"]
 
-        # Retrieve the playlist's video list
-        playlist_items = (
-            self.youtube_client.playlistItems()
-            .list(part="snippet", playlistId=upload_playlist_id)
-            .execute()
-        )
-
-        # Get the video IDs from the playlist's video items
+        # Page through the playlist's video list
         video_ids = []
-        for item in playlist_items["items"]:
-            video_ids.append(item["snippet"]["resourceId"]["videoId"])
+        page_token = None
+        while True:
+            playlist_items = (
+                self.youtube_client.playlistItems()
+                .list(
+                    part="snippet",
+                    playlistId=upload_playlist_id,
+                    maxResults=self.PLAYLIST_PAGE_SIZE,
+                    pageToken=page_token,
+                )
+                .execute()
+            )
+
+            # Get the video IDs from the playlist's video items
+            for item in playlist_items["items"]:
+                video_ids.append(item["snippet"]["resourceId"]["videoId"])
+
+            page_token = playlist_items.get("nextPageToken")
+            if not page_token:
+                break
 
         return video_ids
 
     def _set_youtube_client(self):
+        if self.youtube_client:
+            return
         # Create a YouTube API service object
         try:
             import googleapiclient.discovery
 
-            if not self.youtube_client:
-                self.youtube_client = googleapiclient.discovery.build(
-                    "youtube",
-                    "v3",
-                    developerKey=os.environ.get("GOOGLE_CLIENT_API_KEY"),
-                )
+            self.youtube_client = googleapiclient.discovery.build(
+                "youtube",
+                "v3",
+                developerKey=os.environ.get("GOOGLE_CLIENT_API_KEY"),
+            )
         except ModuleNotFoundError:
             raise ModuleNotFoundError(
                 "The required dependencies for audio/video are not installed."
@@ -0,0 +1,64 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from deepsearchai.caches.artifact_store import ArtifactStore
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.data_source import DataSource
+from deepsearchai.vector_databases.base import BaseVectorDatabase
+
+
+class ArtifactStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.store = ArtifactStore(os.path.join(self.directory.name, "artifacts.sqlite"))
+
+    def tearDown(self):
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_get_returns_stored_encodings_with_new_ids(self):
+        encodings = {
+            "documents": ["first segment", "second segment"],
+            "metadata": [{"start": 0, "end": 1}, {"start": 1, "end": 2}],
+            "ids": ["id1", "id2"],
+        }
+        self.store.put("hash", "whisper-1", "1", encodings)
+
+        cached = self.store.get("hash", "whisper-1", "1")
+
+        self.assertEqual(cached["documents"], encodings["documents"])
+        self.assertEqual(cached["metadata"], encodings["metadata"])
+        self.assertEqual(len(cached["ids"]), 2)
+        self.assertNotEqual(cached["ids"], encodings["ids"])
+        self.assertIsNone(self.store.get("hash", "whisper-1", "2"))
+        self.assertIsNone(self.store.get("other-hash", "whisper-1", "1"))
+
+    def test_vector_database_only_encodes_new_content(self):
+        vector_database = BaseVectorDatabase(config=None, artifact_store=self.store)
+        embedding_model = mock.Mock()
+        embedding_model.MODEL_NAME = "clip-ViT-B-32"
+        embedding_model.get_model_version.return_value = "1"
+        embedding_model.get_media_encodings.side_effect = lambda data, *args: [
+            {"embedding": [[float(len(item))]], "ids": ["id"]} for item in data
+        ]
+
+        first = vector_database._get_media_encodings(
+            [b"image", b"image", b"other image"],
+            DataSource.LOCAL,
+            MEDIA_TYPE.IMAGE,
+            embedding_model,
+        )
+        second = vector_database._get_media_encodings(
+            [b"other image"], DataSource.S3, MEDIA_TYPE.IMAGE, embedding_model
+        )
+
+        embedding_model.get_media_encodings.assert_called_once_with(
+            [b"image", b"other image"], MEDIA_TYPE.IMAGE, DataSource.LOCAL
+        )
+        self.assertEqual(
+            [encoding["embedding"] for encoding in first],
+            [[[5.0]], [[5.0]], [[11.0]]],
+        )
+        self.assertEqual(second[0]["embedding"], [[11.0]])
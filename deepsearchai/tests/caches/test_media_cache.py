@@ -0,0 +1,114 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from deepsearchai.caches.media_cache import MediaCache
+
+
+def write(content: bytes):
+    def download(path):
+        with open(path, "wb") as f:
+            f.write(content)
+
+    return mock.Mock(side_effect=download)
+
+
+class MediaCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_downloads_are_reused_per_uri_and_version(self):
+        cache = MediaCache(self.directory.name, max_bytes=100)
+        download = write(b"audio")
+
+        path = cache.get_or_download("s3://bucket/a.mp3", "etag1", download, ".mp3")
+        same_path = cache.get_or_download("s3://bucket/a.mp3", "etag1", download, ".mp3")
+        new_version_path = cache.get_or_download(
+            "s3://bucket/a.mp3", "etag2", download, ".mp3"
+        )
+
+        self.assertEqual(path, same_path)
+        self.assertNotEqual(path, new_version_path)
+        self.assertTrue(path.endswith(".mp3"))
+        self.assertEqual(download.call_count, 2)
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"audio")
+
+    def test_least_recently_used_files_are_evicted_beyond_the_budget(self):
+        cache = MediaCache(self.directory.name, max_bytes=10)
+        first = cache.get_or_download("a", None, write(b"1234"))
+        second = cache.get_or_download("b", None, write(b"1234"))
+        # Using the first file makes the second one the least recently used
+        self.assertEqual(cache.get("a"), first)
+
+        third = cache.get_or_download("c", None, write(b"1234"))
+
+        self.assertTrue(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+        self.assertTrue(os.path.exists(third))
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.size, 8)
+
+    def test_pinned_files_are_only_evicted_once_released(self):
+        cache = MediaCache(self.directory.name, max_bytes=10)
+        # Handed to a consumer which has not read it yet
+        first = cache.get_or_download("a", None, write(b"1234"), pin=True)
+        second = cache.get_or_download("b", None, write(b"1234"))
+
+        third = cache.get_or_download("c", None, write(b"1234"), pin=True)
+
+        self.assertTrue(os.path.exists(first))
+        self.assertFalse(os.path.exists(second))
+        # Pinned files may exceed the budget until they are released
+        fourth = cache.get_or_download("d", None, write(b"1234"))
+        self.assertEqual(cache.size, 12)
+        self.assertTrue(os.path.exists(first))
+
+        cache.release(first)
+
+        self.assertFalse(os.path.exists(first))
+        self.assertTrue(os.path.exists(third))
+        self.assertTrue(os.path.exists(fourth))
+        self.assertEqual(cache.size, 8)
+
+    def test_files_pinned_twice_need_two_releases(self):
+        cache = MediaCache(self.directory.name, max_bytes=4)
+        path = cache.get_or_download("a", None, write(b"1234"), pin=True)
+        self.assertEqual(cache.get("a", pin=True), path)
+
+        cache.release(path)
+        cache.get_or_download("b", None, write(b"1234"))
+        self.assertTrue(os.path.exists(path))
+
+        cache.release(path)
+        self.assertFalse(os.path.exists(path))
+
+    def test_failed_downloads_leave_nothing_behind(self):
+        cache = MediaCache(self.directory.name, max_bytes=10)
+
+        def download(path):
+            with open(path, "wb") as f:
+                f.write(b"partial")
+            raise ConnectionError()
+
+        with self.assertRaises(ConnectionError):
+            cache.get_or_download("a", None, download)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(os.listdir(self.directory.name), [])
+
+    def test_cached_files_are_picked_up_after_a_restart(self):
+        path = MediaCache(self.directory.name, max_bytes=10).get_or_download(
+            "a", "1", write(b"1234")
+        )
+        open(os.path.join(self.directory.name, "interrupted.part"), "wb").close()
+
+        cache = MediaCache(self.directory.name, max_bytes=10)
+
+        self.assertEqual(cache.get("a", "1"), path)
+        self.assertEqual(cache.size, 4)
+        self.assertEqual(os.listdir(self.directory.name), [os.path.basename(path)])
@@ -0,0 +1,49 @@
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from deepsearchai.caches.query_cache import QueryEmbeddingCache
+
+
+class QueryEmbeddingCacheTest(unittest.TestCase):
+    def test_normalized_queries_share_an_entry_per_model(self):
+        cache = QueryEmbeddingCache()
+        compute = mock.Mock(return_value=[1.0, 2.0])
+
+        cache.get_or_compute("clip", "A  red Car", compute)
+        cached = cache.get_or_compute("clip", " a red car", compute)
+        cache.get_or_compute("minilm", "a red car", compute)
+
+        self.assertEqual(cached.tolist(), [1.0, 2.0])
+        self.assertEqual(compute.call_count, 2)
+        self.assertEqual(
+            cache.get_stats(), {"memory_hits": 1, "disk_hits": 0, "misses": 2}
+        )
+
+    def test_least_recently_used_queries_are_evicted_from_memory(self):
+        cache = QueryEmbeddingCache(max_entries=2)
+        cache.put("clip", "first", [1.0])
+        cache.put("clip", "second", [2.0])
+        cache.get("clip", "first")
+        cache.put("clip", "third", [3.0])
+
+        self.assertIsNone(cache.get("clip", "second"))
+        self.assertEqual(cache.get("clip", "first").tolist(), [1.0])
+        self.assertEqual(cache.get("clip", "third").tolist(), [3.0])
+
+    def test_disk_tier_survives_restarts(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "queries.sqlite")
+            cache = QueryEmbeddingCache(path=path)
+            cache.put("clip", "a red car", [0.5, 0.25])
+            cache.close()
+
+            restarted = QueryEmbeddingCache(path=path)
+            self.assertEqual(restarted.get("clip", "A red car").tolist(), [0.5, 0.25])
+            self.assertEqual(restarted.get("clip", "A red car").tolist(), [0.5, 0.25])
+            restarted.close()
+
+        self.assertEqual(
+            restarted.get_stats(), {"memory_hits": 1, "disk_hits": 1, "misses": 0}
+        )
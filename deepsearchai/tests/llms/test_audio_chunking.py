@@ -0,0 +1,63 @@
+import os
+import tempfile
+import unittest
+
+from pydub import AudioSegment
+from pydub.generators import Sine
+
+from deepsearchai.embedding_models.audio_chunking import AudioChunkPlanner
+
+
+def speech(duration):
+    return Sine(440).to_audio_segment(duration=duration).set_frame_rate(16000)
+
+
+def pause(duration):
+    return AudioSegment.silent(duration=duration, frame_rate=16000)
+
+
+class AudioChunkPlannerTests(unittest.TestCase):
+    def test_chunks_are_cut_in_the_middle_of_the_longest_pause(self):
+        audio = (
+            speech(1000)
+            + pause(400)  # 1000 - 1400, before the minimum chunk duration
+            + speech(800)
+            + pause(400)  # 2200 - 2600
+            + speech(300)
+            + pause(600)  # 2900 - 3500, the longest pause within range
+            + speech(1500)
+        )
+        planner = AudioChunkPlanner(min_chunk_ms=1500, max_chunk_ms=4000)
+
+        self.assertEqual(planner.plan(audio), [(0, 3200), (3200, 5000)])
+
+    def test_chunks_without_a_pause_are_cut_at_the_maximum_duration(self):
+        planner = AudioChunkPlanner(min_chunk_ms=500, max_chunk_ms=1000)
+
+        self.assertEqual(
+            planner.plan(speech(2500)), [(0, 1000), (1000, 2000), (2000, 2500)]
+        )
+
+    def test_maximum_duration_is_bounded_by_the_upload_size(self):
+        # 32kbps is 4000 bytes per second
+        planner = AudioChunkPlanner(
+            min_chunk_ms=1000, max_chunk_ms=60_000, max_upload_bytes=40_000
+        )
+
+        self.assertEqual(planner.max_chunk_ms, 9000)
+
+    def test_chunks_are_exported_as_mono_audio_at_the_planned_frame_rate(self):
+        planner = AudioChunkPlanner(export_format="wav")
+        with tempfile.TemporaryDirectory() as directory:
+            file = os.path.join(directory, "audio.wav")
+            Sine(440, sample_rate=44100).to_audio_segment(duration=1000).set_channels(
+                2
+            ).export(file, format="wav")
+
+            buffer = planner.export(planner.load(file), (250, 750))
+        chunk = AudioSegment.from_file(buffer, format="wav")
+
+        self.assertEqual(buffer.name, "chunk.wav")
+        self.assertEqual(len(chunk), 500)
+        self.assertEqual(chunk.channels, 1)
+        self.assertEqual(chunk.frame_rate, 16000)
@@ -0,0 +1,58 @@
+import contextlib
+import unittest
+from unittest import mock
+
+from deepsearchai.embedding_models.blip_image_captioning import BlipImageCaptioning
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.data_source import DataSource
+
+
+class BlipImageCaptioningTests(unittest.TestCase):
+    def setUp(self):
+        self.blip = BlipImageCaptioning(batch_size=2, max_new_tokens=12, num_beams=3)
+        self.processor = mock.Mock()
+        self.processor.return_value.to.return_value = {"pixel_values": "pixels"}
+        self.processor.batch_decode.side_effect = lambda out, **kwargs: [
+            "caption {}".format(image) for image in out
+        ]
+        self.model = mock.Mock()
+        self.model.generate.side_effect = lambda **kwargs: list(
+            self.processor.call_args.kwargs["images"]
+        )
+        self.blip._use_model = lambda: contextlib.nullcontext(
+            (self.processor, self.model)
+        )
+
+    def test_get_media_encodings_captions_images_in_batches(self):
+        encodings = self.blip.get_media_encodings(
+            ["a", "b", "c"], MEDIA_TYPE.IMAGE, DataSource.LOCAL
+        )
+
+        self.assertEqual(
+            [call.kwargs["images"] for call in self.processor.call_args_list],
+            [["a", "b"], ["c"]],
+        )
+        self.model.generate.assert_called_with(
+            pixel_values="pixels", max_new_tokens=12, num_beams=3
+        )
+        self.assertEqual(
+            [encoding["documents"] for encoding in encodings],
+            [["caption a"], ["caption b"], ["caption c"]],
+        )
+        self.assertEqual(len({encoding["ids"][0] for encoding in encodings}), 3)
+
+    def test_get_media_encoding_captions_a_single_image(self):
+        encoding = self.blip.get_media_encoding(
+            "a", MEDIA_TYPE.IMAGE, DataSource.LOCAL
+        )
+
+        self.assertEqual(encoding["documents"], ["caption a"])
+        self.assertEqual(encoding["metadata"], [{"type": "caption"}])
+
+    def test_model_version_depends_on_the_generation_settings(self):
+        self.assertEqual(self.blip.get_model_version(), "1-t12-b3")
+        self.assertEqual(
+            BlipImageCaptioning(quantize=True).get_model_version(), "1-t30-b1-int8"
+        )
+        with self.assertRaises(ValueError):
+            BlipImageCaptioning(quantize=True, device="cuda")
@@ -0,0 +1,143 @@
+import contextlib
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import torch
+from transformers import CLIPConfig, CLIPModel
+
+from deepsearchai.embedding_models.clip import Clip
+from deepsearchai.embedding_models.clip_backends import (
+    ExportedClip,
+    export_clip,
+    load_encoders,
+)
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.data_source import DataSource
+
+
+class FakeProcessor:
+    """Passes images through as pixel values, and tokenizes texts into one id per character."""
+
+    def __call__(self, images=None, text=None, **kwargs):
+        if images is not None:
+            return {"pixel_values": np.stack(images)}
+        length = max(len(item) for item in text)
+        input_ids = np.zeros((len(text), length), dtype=np.int64)
+        attention_mask = np.zeros((len(text), length), dtype=np.int64)
+        for row, item in enumerate(text):
+            input_ids[row, : len(item)] = [ord(char) % 90 + 1 for char in item]
+            attention_mask[row, : len(item)] = 1
+        return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+
+class ClipBackendParityTests(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        torch.manual_seed(0)
+        layer = dict(
+            hidden_size=32,
+            intermediate_size=37,
+            num_attention_heads=4,
+            num_hidden_layers=2,
+        )
+        config = CLIPConfig(
+            text_config=dict(layer, vocab_size=99, max_position_embeddings=32),
+            vision_config=dict(layer, image_size=30, patch_size=6),
+            projection_dim=16,
+        )
+        cls.model = CLIPModel(config).eval()
+        cls.images = list(
+            np.random.RandomState(0).randn(3, 3, 30, 30).astype(np.float32)
+        )
+        cls.texts = ["a red car", "a dog", "the quick brown fox"]
+
+    def test_exported_encoders_match_eager_mode(self):
+        processor = FakeProcessor()
+        with torch.inference_mode():
+            pixel_values = torch.from_numpy(np.stack(self.images))
+            expected_images = self.model.get_image_features(pixel_values=pixel_values)
+            tokens = {
+                name: torch.from_numpy(value)
+                for name, value in processor(text=self.texts).items()
+            }
+            expected_texts = self.model.get_text_features(**tokens)
+        expected_images = getattr(expected_images, "pooler_output", expected_images)
+        expected_texts = getattr(expected_texts, "pooler_output", expected_texts)
+
+        num_threads = torch.get_num_threads()
+        for backend in ["onnx", "torchscript"]:
+            with self.subTest(backend=backend), tempfile.TemporaryDirectory() as tmp:
+                directory = os.path.join(tmp, "clip")
+                export_clip(self.model, backend, directory)
+                clip = ExportedClip(
+                    processor, *load_encoders(backend, directory, num_threads=2)
+                )
+
+                texts, images = self.texts, self.images
+                embeddings = clip.encode(
+                    [texts[0], images[0], images[1], texts[1], texts[2], images[2]],
+                    batch_size=2,
+                )
+
+                np.testing.assert_allclose(
+                    embeddings[[1, 2, 5]], expected_images.numpy(), atol=1e-4
+                )
+                np.testing.assert_allclose(
+                    embeddings[[0, 3, 4]], expected_texts.numpy(), atol=1e-4
+                )
+                np.testing.assert_allclose(
+                    clip.encode(self.texts[1]), expected_texts[1].numpy(), atol=1e-4
+                )
+                # The thread count only applies to the encoders' forward passes
+                self.assertEqual(torch.get_num_threads(), num_threads)
+
+    def test_exported_backends_are_shared_separately_from_eager_mode(self):
+        self.assertEqual(
+            Clip()._get_model_key(), ("clip-ViT-B-32", "auto", "float32")
+        )
+        self.assertEqual(
+            Clip(backend="onnx")._get_model_key(),
+            ("clip-ViT-B-32-onnx", "cpu", "float32"),
+        )
+        with self.assertRaises(ValueError):
+            Clip(backend="tensorrt")
+
+
+class ClipEncodingTests(unittest.TestCase):
+    def test_image_encodings_are_rows_of_the_batch_matrix(self):
+        model = mock.Mock()
+        model.encode.return_value = np.arange(6, dtype=np.float32).reshape(3, 2)
+        clip = Clip(dtype="float16")
+        clip._use_model = lambda: contextlib.nullcontext(model)
+
+        encodings = clip.get_media_encodings(
+            ["a", "b", "c"], MEDIA_TYPE.IMAGE, DataSource.LOCAL
+        )
+
+        self.assertEqual(
+            [encoding["embedding"].tolist() for encoding in encodings],
+            [[[0.0, 1.0]], [[2.0, 3.0]], [[4.0, 5.0]]],
+        )
+        self.assertTrue(
+            all(encoding["embedding"].dtype == np.float16 for encoding in encodings)
+        )
+        batch_matrix = encodings[0]["embedding"].base
+        self.assertTrue(np.shares_memory(encodings[2]["embedding"], batch_matrix))
+        self.assertEqual(clip.get_model_version(), "1-float16")
+
+    def test_text_encodings_are_computed_in_batches(self):
+        model = mock.Mock()
+        model.encode.return_value = np.arange(4, dtype=np.float32).reshape(2, 2)
+        clip = Clip(batch_size=16)
+        clip._use_model = lambda: contextlib.nullcontext(model)
+
+        encodings = clip.get_text_encodings(["a cat", "a dog"])
+
+        model.encode.assert_called_once_with(["a cat", "a dog"], batch_size=16)
+        self.assertEqual(
+            [encoding["embedding"].tolist() for encoding in encodings],
+            [[0.0, 1.0], [2.0, 3.0]],
+        )
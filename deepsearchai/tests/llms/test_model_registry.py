@@ -0,0 +1,88 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+import torch
+
+from deepsearchai.embedding_models.base import BaseEmbeddingModel
+from deepsearchai.embedding_models.registry import ModelRegistry, model_registry
+from deepsearchai.embedding_models_config import EmbeddingModelsConfig
+from deepsearchai.enums import MEDIA_TYPE
+
+
+class ModelRegistryTests(unittest.TestCase):
+    def test_concurrent_users_share_a_single_instance(self):
+        registry = ModelRegistry()
+        loader = mock.Mock(side_effect=lambda: time.sleep(0.1) or object())
+        models = []
+
+        def use():
+            with registry.use(("model", "cpu", "float32"), loader) as model:
+                models.append(model)
+
+        threads = [threading.Thread(target=use) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with registry.use(("model", "cpu", "int8"), loader):
+            pass
+
+        self.assertEqual(len({id(model) for model in models}), 1)
+        self.assertEqual(loader.call_count, 2)
+        self.assertEqual(len(registry.get_loaded_models()), 2)
+
+    def test_idle_models_are_unloaded_unless_in_use(self):
+        registry = ModelRegistry(idle_timeout=0.05)
+        with registry.use(("idle", "cpu", "float32"), object):
+            pass
+        with registry.use(("busy", "cpu", "float32"), object):
+            time.sleep(0.1)
+            registry.unload_idle()
+            self.assertEqual(
+                list(registry.get_loaded_models()), [("busy", "cpu", "float32")]
+            )
+
+    def test_memory_usage_counts_the_tensors_of_the_model(self):
+        registry = ModelRegistry()
+        with registry.use(("linear", "cpu", "float32"), lambda: torch.nn.Linear(4, 2)):
+            pass
+
+        info = registry.get_loaded_models()[("linear", "cpu", "float32")]
+
+        # 4 x 2 weights and 2 biases, in float32
+        self.assertEqual(info["memory_bytes"], 40)
+        self.assertEqual(registry.get_memory_usage(), 40)
+        self.assertEqual(info["users"], 0)
+
+    def test_warmup_loads_models_in_the_background(self):
+        class Model(BaseEmbeddingModel):
+            MODEL_NAME = "warmup-test"
+
+            def _get_model_key(self):
+                return self.MODEL_NAME, "cpu", "float32"
+
+            def _create_model(self):
+                return torch.nn.Linear(1, 1)
+
+        model_registry.warmup([Model(), BaseEmbeddingModel()]).join()
+
+        self.assertIn(("warmup-test", "cpu", "float32"), model_registry.get_loaded_models())
+        model_registry.unload(("warmup-test", "cpu", "float32"))
+        self.assertNotIn(
+            ("warmup-test", "cpu", "float32"), model_registry.get_loaded_models()
+        )
+
+    def test_embedding_models_config_builds_its_own_default_models(self):
+        first = EmbeddingModelsConfig()
+        second = EmbeddingModelsConfig()
+
+        self.assertIsNot(
+            first.get_embedding_model(MEDIA_TYPE.IMAGE)[1],
+            second.get_embedding_model(MEDIA_TYPE.IMAGE)[1],
+        )
+        self.assertEqual(
+            len(EmbeddingModelsConfig(image_captioning_model=None).get_all_embedding_models()),
+            3,
+        )
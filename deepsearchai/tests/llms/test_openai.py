@@ -0,0 +1,37 @@
+import unittest
+from unittest import mock
+
+from langchain.schema import AIMessage
+
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.llms.base import BaseLLM
+from deepsearchai.llms.openai import OpenAi
+
+
+class OpenAiAsyncTest(unittest.IsolatedAsyncioTestCase):
+    async def test_aquery_awaits_the_chat_model(self):
+        contexts = {
+            MEDIA_TYPE.IMAGE: [{"document": "beach.jpg", "metadata": {}}],
+            MEDIA_TYPE.AUDIO: [{"document": "waves crashing", "metadata": {}}],
+        }
+        chat_model = mock.Mock()
+        chat_model.ainvoke = mock.AsyncMock(return_value=AIMessage(content="A beach"))
+        llm = OpenAi()
+
+        with mock.patch.object(llm, "_get_chat_model", return_value=chat_model):
+            result = await llm.aquery("Where was this?", contexts)
+
+        self.assertEqual(result, {"llm_response": "A beach", "documents": contexts})
+        prompt = chat_model.ainvoke.call_args[0][0][0].content
+        self.assertIn("beach.jpg | waves crashing", prompt)
+        self.assertIn("Query: Where was this?", prompt)
+        chat_model.assert_not_called()
+
+    async def test_llms_without_asyncio_client_run_query_in_a_thread(self):
+        class EchoLLM(BaseLLM):
+            def query(self, query, contexts):
+                return {"llm_response": query, "documents": contexts}
+
+        result = await EchoLLM().aquery("hello", {})
+
+        self.assertEqual(result, {"llm_response": "hello", "documents": {}})
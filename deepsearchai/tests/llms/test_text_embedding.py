@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from deepsearchai.embedding_models.registry import model_registry
+from deepsearchai.embedding_models.text_embedding import TextEmbeddingModel
+
+
+class FakeSentenceTransformer:
+    """Embeds texts as their length and number of words, and records every call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, batch_size, convert_to_numpy):
+        self.calls.append((list(texts), batch_size))
+        return np.array(
+            [[len(text), len(text.split())] for text in texts], dtype=np.float32
+        )
+
+
+class TextEmbeddingModelTest(unittest.TestCase):
+    def setUp(self):
+        self.model = FakeSentenceTransformer()
+        # A name of its own, so that the fake is not shared through the registry with other tests
+        self.text_embedding_model = TextEmbeddingModel(
+            "fake-text-model", batch_size=8, dtype="float16", cache_size=2
+        )
+        patcher = mock.patch.object(
+            self.text_embedding_model, "_create_model", return_value=self.model
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(model_registry.unload, ("fake-text-model", "cpu", "float32"))
+
+    def test_texts_are_embedded_once_across_calls(self):
+        first = self.text_embedding_model.embed(["a cat", "a red car", "a cat"])
+        second = self.text_embedding_model.embed(["a red car", "sunset"])
+
+        np.testing.assert_array_equal(first, [[5, 2], [9, 3], [5, 2]])
+        np.testing.assert_array_equal(second, [[9, 3], [6, 1]])
+        self.assertEqual(first.dtype, np.float16)
+        self.assertEqual(
+            self.model.calls, [(["a cat", "a red car"], 8), (["sunset"], 8)]
+        )
+
+    def test_least_recently_used_texts_are_evicted(self):
+        self.text_embedding_model.embed(["one", "two"])
+        self.text_embedding_model.embed(["one", "three"])
+        self.text_embedding_model.embed(["one", "two"])
+
+        self.assertEqual(
+            [texts for texts, _ in self.model.calls],
+            [["one", "two"], ["three"], ["two"]],
+        )
+
+    def test_usable_as_a_chromadb_embedding_function(self):
+        self.assertEqual(self.text_embedding_model(["a cat"]), [[5.0, 2.0]])
+        self.assertEqual(self.text_embedding_model.get_model_version(), "fake-text-model")
@@ -0,0 +1,160 @@
+import io
+import unittest
+from unittest import mock
+
+import numpy as np
+
+from deepsearchai.embedding_models.base import BaseEmbeddingModel
+from deepsearchai.embedding_models.video_keyframes import (
+    SceneChangeDetector,
+    VideoKeyframes,
+)
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.data_source import DataSource
+
+FRAME_SIZE = 8
+
+
+def get_frame(colour):
+    return np.full((FRAME_SIZE, FRAME_SIZE, 3), colour, dtype=np.uint8)
+
+
+class FakeImageModel(BaseEmbeddingModel):
+    """Encodes images as their mean colour, and records the size of every batch."""
+
+    MODEL_NAME = "fake-image"
+
+    def __init__(self):
+        self.batch_sizes = []
+
+    def get_media_encodings(self, data, data_type, datasource):
+        self.batch_sizes.append(len(data))
+        return [
+            {"embedding": np.asarray(image, dtype=np.float32).mean(axis=(0, 1))[None]}
+            for image in data
+        ]
+
+    def get_text_encoding(self, query):
+        return np.zeros(3, dtype=np.float32)
+
+
+class SceneChangeDetectorTest(unittest.TestCase):
+    def test_first_frame_of_every_scene_is_selected(self):
+        detector = SceneChangeDetector(threshold=0.3, min_scene_seconds=0)
+        colours = [(0, 0, 0), (2, 2, 2), (255, 0, 0), (250, 5, 0), (0, 0, 255)]
+
+        selected = [
+            detector.is_new_scene(get_frame(colour), i)
+            for i, colour in enumerate(colours)
+        ]
+
+        self.assertEqual(selected, [True, False, True, False, True])
+
+    def test_scenes_shorter_than_the_minimum_are_merged(self):
+        detector = SceneChangeDetector(threshold=0.3, min_scene_seconds=1.0)
+
+        selected = [
+            detector.is_new_scene(get_frame(colour), timestamp)
+            for timestamp, colour in [(0, 0), (0.5, 255), (1.0, 0), (1.5, 255)]
+        ]
+
+        self.assertEqual(selected, [True, False, False, True])
+
+    def test_distance_is_the_share_of_changed_pixels(self):
+        detector = SceneChangeDetector()
+        half = get_frame(0)
+        half[:, : FRAME_SIZE // 2] = 255
+
+        distance = detector.get_distance(
+            detector.get_histogram(get_frame(0)), detector.get_histogram(half)
+        )
+
+        self.assertAlmostEqual(distance, 0.5)
+
+
+class VideoKeyframesTest(unittest.TestCase):
+    def setUp(self):
+        self.image_model = FakeImageModel()
+        self.model = VideoKeyframes(
+            self.image_model,
+            sample_fps=2.0,
+            min_scene_seconds=0,
+            frame_size=FRAME_SIZE,
+            batch_size=2,
+        )
+
+    def _mock_ffmpeg(self, colours, returncode=0, stderr=b""):
+        process = mock.Mock()
+        process.stdout = io.BytesIO(
+            b"".join(get_frame(colour).tobytes() for colour in colours)
+        )
+        process.poll.return_value = returncode
+        process.returncode = returncode
+        messages = stderr
+
+        def popen(command, stdout, stderr):
+            # Errors are written to a file, never to a pipe which could fill up
+            stderr.write(messages)
+            return process
+
+        return mock.patch("subprocess.Popen", side_effect=popen)
+
+    def test_only_keyframes_are_encoded_with_their_scene_timestamps(self):
+        colours = [0, 0, 255, 255, 255, 128, 0]
+        with self._mock_ffmpeg(colours) as popen:
+            encoding = self.model.get_media_encoding(
+                "movie.mp4", MEDIA_TYPE.VIDEO, DataSource.LOCAL
+            )
+
+        self.assertIn("movie.mp4", popen.call_args[0][0])
+        self.assertEqual(encoding["embedding"].shape, (4, 3))
+        np.testing.assert_array_equal(
+            encoding["embedding"][:, 0], [0, 255, 128, 0]
+        )
+        self.assertEqual(
+            encoding["metadata"],
+            [
+                {"start": 0.0, "end": 1.0},
+                {"start": 1.0, "end": 2.5},
+                {"start": 2.5, "end": 3.0},
+                {"start": 3.0, "end": 3.5},
+            ],
+        )
+        self.assertEqual(encoding["documents"], ["movie.mp4"] * 4)
+        self.assertEqual(len(set(encoding["ids"])), 4)
+        # Keyframes are encoded in batches as they are selected
+        self.assertEqual(self.image_model.batch_sizes, [2, 2])
+
+    def test_videos_without_frames_have_no_records(self):
+        stderr = b"Output file #0 does not contain any stream"
+        with self._mock_ffmpeg([], returncode=1, stderr=stderr):
+            encoding = self.model.get_media_encoding(
+                "song.mp4", MEDIA_TYPE.VIDEO, DataSource.LOCAL
+            )
+
+        self.assertIsNone(encoding["embedding"])
+        self.assertEqual(encoding["ids"], [])
+        self.assertEqual(encoding["documents"], [])
+
+    def test_decoding_errors_are_raised(self):
+        with self._mock_ffmpeg([], returncode=1, stderr=b"Invalid data"):
+            with self.assertRaises(RuntimeError):
+                self.model.get_media_encoding(
+                    "broken.mp4", MEDIA_TYPE.VIDEO, DataSource.LOCAL
+                )
+
+    def test_missing_ffmpeg(self):
+        with mock.patch("subprocess.Popen", side_effect=FileNotFoundError):
+            with self.assertRaises(FileNotFoundError):
+                self.model.get_media_encoding(
+                    "movie.mp4", MEDIA_TYPE.VIDEO, DataSource.LOCAL
+                )
+
+    def test_keyframes_are_stored_in_their_own_collection(self):
+        self.assertEqual(
+            self.model.get_collection_name(MEDIA_TYPE.VIDEO),
+            "deepsearch-video-keyframes",
+        )
+        np.testing.assert_array_equal(
+            self.model.get_text_encoding("a beach"), np.zeros(3)
+        )
@@ -1,6 +1,14 @@
+import contextlib
 import unittest
+from unittest import mock
 
+import numpy as np
+import torch
+
+from deepsearchai.embedding_models.quantization import quantize_dynamic_int8
 from deepsearchai.embedding_models.whisper_model import Whisper
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.data_source import DataSource
 
 
 class TestGetWhisperMediaEncoding(unittest.TestCase):
@@ -41,3 +49,87 @@ class TestGetWhisperMediaEncoding(unittest.TestCase):
         # Get the media encoding.
         with self.assertRaises(ValueError):
             whisper.get_media_encoding(b"", "invalid_media_type")
+
+
+class TestWhisperCpuMode(unittest.TestCase):
+    def test_vad_only_transcribes_voiced_regions(self):
+        rate = Whisper.SAMPLE_RATE
+        tone = 0.5 * np.sin(2 * np.pi * 440 * np.arange(rate) / rate)
+        # 1s of speech, 3s of silence, 1s of speech
+        samples = np.concatenate([tone, np.zeros(3 * rate), tone]).astype(np.float32)
+        whisper = Whisper(vad=True, vad_padding_ms=0)
+        model = mock.Mock()
+        model.device.type = "cpu"
+        whisper._use_model = mock.Mock(return_value=contextlib.nullcontext(model))
+        model.transcribe.return_value = {
+            "segments": [
+                {"text": "first", "start": 0.0, "end": 1.0},
+                {"text": "second", "start": 1.0, "end": 2.0},
+            ]
+        }
+
+        encoding = whisper.get_media_encoding(samples, MEDIA_TYPE.AUDIO, DataSource.LOCAL)
+
+        transcribed, = model.transcribe.call_args.args
+        self.assertEqual(len(transcribed), 2 * rate)
+        self.assertEqual(encoding["documents"], ["first", "second"])
+        self.assertEqual(
+            encoding["metadata"],
+            [{"start": 0.0, "end": 1.0}, {"start": 4.0, "end": 5.0}],
+        )
+        self.assertEqual(whisper.get_model_version(), "1-vad")
+
+    def test_silent_audio_is_not_transcribed(self):
+        whisper = Whisper(vad=True)
+        model = mock.Mock()
+        whisper._use_model = mock.Mock(return_value=contextlib.nullcontext(model))
+
+        encoding = whisper.get_media_encoding(
+            np.zeros(Whisper.SAMPLE_RATE, dtype=np.float32),
+            MEDIA_TYPE.AUDIO,
+            DataSource.LOCAL,
+        )
+
+        model.transcribe.assert_not_called()
+        self.assertEqual(encoding["documents"], [])
+
+    def test_quantize_model_quantizes_linear_subclasses(self):
+        class Linear(torch.nn.Linear):
+            pass
+
+        model = torch.nn.Sequential(Linear(4, 4), torch.nn.ReLU(), Linear(4, 2))
+
+        quantized = quantize_dynamic_int8(model)
+
+        self.assertIsInstance(quantized[0], torch.ao.nn.quantized.dynamic.Linear)
+        self.assertIsInstance(quantized[2], torch.ao.nn.quantized.dynamic.Linear)
+        self.assertEqual(quantized(torch.ones(1, 4)).shape, (1, 2))
+
+    def test_quantize_is_only_supported_on_the_cpu(self):
+        with self.assertRaises(ValueError):
+            Whisper(quantize=True, device="cuda")
+        self.assertEqual(Whisper(quantize=True).get_model_version(), "1-int8")
+
+    def test_thread_count_is_restored_after_transcribing(self):
+        whisper = Whisper(model_name="tiny", num_threads=1)
+        model = mock.Mock()
+        model.device.type = "cpu"
+        inference_threads = []
+        model.transcribe.side_effect = lambda audio, fp16: (
+            inference_threads.append(torch.get_num_threads()) or {"segments": []}
+        )
+        whisper._use_model = mock.Mock(return_value=contextlib.nullcontext(model))
+        num_threads = torch.get_num_threads()
+
+        whisper.get_media_encoding("song.mp3", MEDIA_TYPE.AUDIO, DataSource.LOCAL)
+
+        self.assertEqual(inference_threads, [1])
+        self.assertEqual(torch.get_num_threads(), num_threads)
+
+    def test_model_size_identifies_the_weights_and_transcripts(self):
+        whisper = Whisper(model_name="tiny")
+
+        self.assertEqual(whisper.MODEL_NAME, Whisper.MODEL_NAME)
+        self.assertEqual(whisper._get_model_key()[0], "whisper-tiny")
+        self.assertEqual(whisper.get_model_version(), "1-tiny")
+        self.assertEqual(Whisper().get_model_version(), "1")
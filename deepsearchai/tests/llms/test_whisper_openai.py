@@ -0,0 +1,128 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+
+import openai
+from pydub import AudioSegment
+
+from deepsearchai.embedding_models.audio_chunking import AudioChunkPlanner
+from deepsearchai.embedding_models.whisper_openai import WhisperOpenAi
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.data_source import DataSource
+
+
+class _TranscriptionHandler(BaseHTTPRequestHandler):
+    """Stands in for the transcription endpoint, answering with the size of the uploaded chunk."""
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with server.lock:
+            server.requests += 1
+            server.in_flight += 1
+            server.max_in_flight = max(server.max_in_flight, server.in_flight)
+            fail = server.requests in server.failing_requests
+        time.sleep(0.2)
+        with server.lock:
+            server.in_flight -= 1
+        if fail:
+            self._respond(503, {"error": {"message": "Overloaded", "type": "server_error"}})
+        else:
+            self._respond(200, {"text": str(len(body))})
+
+    def _respond(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+class WhisperOpenAiTests(unittest.TestCase):
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _TranscriptionHandler)
+        self.server.lock = threading.Lock()
+        self.server.requests = 0
+        self.server.in_flight = 0
+        self.server.max_in_flight = 0
+        self.server.failing_requests = set()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.api_base = "http://127.0.0.1:{}/v1".format(self.server.server_port)
+
+        self.directory = tempfile.TemporaryDirectory()
+        self.file = os.path.join(self.directory.name, "audio.wav")
+        # Chunks of 1s, 1s and 0.5s
+        AudioSegment.silent(duration=2500).export(self.file, format="wav")
+        # Compressed formats need ffmpeg
+        self.chunk_planner = AudioChunkPlanner(
+            min_chunk_ms=1000, max_chunk_ms=1000, export_format="wav"
+        )
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self.directory.cleanup()
+
+    @patch.object(openai, "api_key", "test")
+    def test_chunks_are_transcribed_concurrently_and_reassembled_in_order(self):
+        whisper = WhisperOpenAi(
+            max_workers=3, api_base=self.api_base, chunk_planner=self.chunk_planner
+        )
+
+        encoding = whisper.get_media_encoding(
+            self.file, MEDIA_TYPE.AUDIO, DataSource.LOCAL
+        )
+
+        self.assertGreater(self.server.max_in_flight, 1)
+        sizes = [int(document) for document in encoding["documents"]]
+        self.assertEqual(sizes[0], sizes[1])
+        self.assertGreater(sizes[1], sizes[2])
+        self.assertEqual(
+            encoding["metadata"],
+            [
+                {"start": 0.0, "end": 1.0},
+                {"start": 1.0, "end": 2.0},
+                {"start": 2.0, "end": 2.5},
+            ],
+        )
+        self.assertEqual(len(encoding["ids"]), 3)
+
+    @patch.object(openai, "api_key", "test")
+    def test_failed_chunks_are_retried_on_their_own(self):
+        self.server.failing_requests = {1}
+        whisper = WhisperOpenAi(
+            max_workers=1,
+            retry_backoff=0,
+            api_base=self.api_base,
+            chunk_planner=self.chunk_planner,
+        )
+
+        encoding = whisper.get_media_encoding(
+            self.file, MEDIA_TYPE.AUDIO, DataSource.LOCAL
+        )
+
+        self.assertEqual(self.server.requests, 4)
+        self.assertEqual(len(encoding["documents"]), 3)
+
+    @patch.object(openai, "api_key", "test")
+    def test_chunks_failing_after_every_retry_fail_the_file(self):
+        self.server.failing_requests = {1, 2}
+        whisper = WhisperOpenAi(
+            max_workers=1,
+            max_retries=1,
+            retry_backoff=0,
+            api_base=self.api_base,
+            chunk_planner=self.chunk_planner,
+        )
+
+        with self.assertRaises(openai.error.ServiceUnavailableError):
+            whisper.get_media_encoding(self.file, MEDIA_TYPE.AUDIO, DataSource.LOCAL)
@@ -0,0 +1,84 @@
+import os
+import tempfile
+import unittest
+import uuid
+
+import numpy as np
+from PIL import Image
+
+from deepsearchai.embedding_models.base import BaseEmbeddingModel
+from deepsearchai.embedding_models.worker_pool import EmbeddingWorkerPool
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.data_source import DataSource
+
+
+class MeanPixelModel(BaseEmbeddingModel):
+    """Encodes images as their mean pixel value, and paths as their length, along with the encoding pid."""
+
+    MODEL_NAME = "mean-pixel"
+
+    def __init__(self, crash_marker=None):
+        self.crash_marker = crash_marker
+
+    def get_media_encodings(self, data, data_type, datasource):
+        if self.crash_marker and not os.path.exists(self.crash_marker):
+            open(self.crash_marker, "w").close()
+            os._exit(1)
+        if any(item == "invalid" for item in data if isinstance(item, str)):
+            raise ValueError("invalid media")
+        return [
+            {
+                "embedding": np.array(
+                    [[len(item) if isinstance(item, str) else np.mean(item), os.getpid()]]
+                ),
+                "ids": [str(uuid.uuid4())],
+            }
+            for item in data
+        ]
+
+
+class EmbeddingWorkerPoolTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.pool = EmbeddingWorkerPool(2, threads_per_worker=1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.pool.shutdown()
+
+    def test_batches_are_encoded_in_worker_processes_in_order(self):
+        data = [
+            Image.new("RGB", (30, 20), (10, 10, 10)),
+            "audio.mp3",
+            Image.new("L", (5, 7), 200),
+            Image.new("P", (8, 8)),
+        ]
+
+        encodings = self.pool.wrap(MeanPixelModel()).get_media_encodings(
+            data, MEDIA_TYPE.IMAGE, DataSource.LOCAL
+        )
+
+        embeddings = np.concatenate([encoding["embedding"] for encoding in encodings])
+        self.assertEqual(embeddings[:, 0].tolist(), [10.0, 9.0, 200.0, 0.0])
+        self.assertNotIn(os.getpid(), embeddings[:, 1])
+
+    def test_model_errors_are_raised_to_the_caller(self):
+        with self.assertRaises(ValueError):
+            self.pool.encode(
+                MeanPixelModel(), ["invalid"], MEDIA_TYPE.AUDIO, DataSource.LOCAL
+            )
+
+        encodings = self.pool.encode(
+            MeanPixelModel(), ["valid"], MEDIA_TYPE.AUDIO, DataSource.LOCAL
+        )
+        self.assertEqual(encodings[0]["embedding"][0][0], 5)
+
+    def test_batches_are_retried_when_a_worker_dies(self):
+        with tempfile.TemporaryDirectory() as directory:
+            model = MeanPixelModel(crash_marker=os.path.join(directory, "crashed"))
+
+            encodings = self.pool.encode(
+                model, ["a.mp3"], MEDIA_TYPE.AUDIO, DataSource.LOCAL
+            )
+
+        self.assertEqual(encodings[0]["embedding"][0][0], 5)
@@ -0,0 +1,97 @@
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+from PIL import Image
+
+from deepsearchai.caches.media_cache import MediaCache
+from deepsearchai.sources.image_preprocessing import ImagePreprocessor
+from deepsearchai.utils import get_file_hash, get_media_hash
+
+
+def create_image_file(size, mode="RGB", format="JPEG"):
+    image = Image.new(mode, size)
+    if mode == "RGB":
+        pixels = np.random.RandomState(0).randint(0, 255, size[::-1] + (3,))
+        image = Image.fromarray(pixels.astype(np.uint8))
+    data = io.BytesIO()
+    image.save(data, format=format)
+    data.seek(0)
+    return data
+
+
+class ImagePreprocessorTest(unittest.TestCase):
+    def test_large_images_are_decoded_to_a_thumbnail(self):
+        preprocessor = ImagePreprocessor(min_side=384)
+
+        image = preprocessor.preprocess(create_image_file((2000, 1200)), "hash")
+
+        self.assertEqual(image.size, (640, 384))
+        self.assertEqual(image.mode, "RGB")
+        self.assertEqual(image.info["content_hash"], "hash")
+
+    def test_small_images_are_only_converted_to_rgb(self):
+        preprocessor = ImagePreprocessor(min_side=384)
+
+        image = preprocessor.preprocess(
+            create_image_file((100, 50), mode="P", format="PNG"), "hash"
+        )
+
+        self.assertEqual(image.size, (100, 50))
+        self.assertEqual(image.mode, "RGB")
+
+    def test_thumbnails_are_cached_by_location_and_version(self):
+        with tempfile.TemporaryDirectory() as directory:
+            preprocessor = ImagePreprocessor(
+                min_side=384, cache=MediaCache(directory, 1024 * 1024 * 1024)
+            )
+            image = preprocessor.preprocess(
+                create_image_file((800, 600)),
+                "hash",
+                uri="s3://bucket/a.jpg",
+                version="v1",
+            )
+
+            restarted = ImagePreprocessor(
+                min_side=384, cache=MediaCache(directory, 1024 * 1024 * 1024)
+            )
+            cached = restarted.get_cached("s3://bucket/a.jpg", "v1")
+
+            self.assertIsNone(restarted.get_cached("s3://bucket/a.jpg", "v2"))
+        self.assertEqual(cached.size, image.size)
+        self.assertEqual(cached.info["content_hash"], "hash")
+        np.testing.assert_array_equal(np.asarray(cached), np.asarray(image))
+
+    def test_files_are_only_hashed_when_the_hash_is_needed(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "a.jpg")
+            with open(path, "wb") as f:
+                f.write(create_image_file((800, 600)).read())
+
+            with mock.patch(
+                "deepsearchai.sources.image_preprocessing.get_file_hash"
+            ) as file_hash:
+                image = ImagePreprocessor(min_side=384).preprocess(path)
+            file_hash.assert_not_called()
+
+            # The artifact store identifies the thumbnail by its original file
+            self.assertEqual(get_media_hash(image), get_file_hash(path))
+
+    def test_thumbnails_of_another_size_are_not_reused(self):
+        with tempfile.TemporaryDirectory() as directory:
+            cache = MediaCache(directory, 1024 * 1024 * 1024)
+            ImagePreprocessor(min_side=384, cache=cache).preprocess(
+                create_image_file((800, 600)),
+                "hash",
+                uri="s3://bucket/a.jpg",
+                version="v1",
+            )
+
+            self.assertIsNone(
+                ImagePreprocessor(min_side=224, cache=cache).get_cached(
+                    "s3://bucket/a.jpg", "v1"
+                )
+            )
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 from unittest import mock
 from unittest.mock import patch
@@ -5,7 +7,9 @@ from unittest.mock import patch
 import mock.mock
 
 from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.configs.local import LocalSourceConfig
 from deepsearchai.sources.data_source import DataSource
+from deepsearchai.sources.image_preprocessing import ImagePreprocessor
 from deepsearchai.sources.local import LocalDataSource
 
 
@@ -14,7 +18,7 @@ class LocalDataSourceTest(unittest.TestCase):
         self.local_data_source = LocalDataSource()
 
     @patch("os.walk")
-    @patch("PIL.Image.open")
+    @patch.object(ImagePreprocessor, "preprocess")
     def test_add_data_image_directory_with_no_existing_files(
         self, mock_image_file, mock_listdir
     ):
@@ -39,27 +43,22 @@ class LocalDataSourceTest(unittest.TestCase):
         self.local_data_source.add_data(
             directory, embedding_models_config, vector_database
         )
-        assert vector_database.add.mock_calls == [
+        assert vector_database.prepare_batch.mock_calls == [
             mock.call(
-                image_data,
+                [image_data, image_data],
                 DataSource.LOCAL,
-                "test_directory/image1.jpg",
-                directory,
-                MEDIA_TYPE.IMAGE,
-                embedding_model,
-            ),
-            mock.call(
-                image_data,
-                DataSource.LOCAL,
-                "test_directory/image2.png",
+                ["test_directory/image1.jpg", "test_directory/image2.png"],
                 directory,
                 MEDIA_TYPE.IMAGE,
                 embedding_model,
             ),
         ]
+        assert vector_database.write_batch.mock_calls == [
+            mock.call(vector_database.prepare_batch.return_value)
+        ]
 
     @patch("os.walk")
-    @patch("PIL.Image.open")
+    @patch.object(ImagePreprocessor, "preprocess")
     def test_add_data_image_directory_with_no_existing_files(
         self, mock_image_file, mock_listdir
     ):
@@ -84,27 +83,22 @@ class LocalDataSourceTest(unittest.TestCase):
         self.local_data_source.add_data(
             directory, embedding_models_config, vector_database
         )
-        assert vector_database.add.mock_calls == [
+        assert vector_database.prepare_batch.mock_calls == [
             mock.call(
-                image_data,
+                [image_data, image_data],
                 DataSource.LOCAL,
-                "test_directory/image1.jpg",
-                directory,
-                MEDIA_TYPE.IMAGE,
-                embedding_model,
-            ),
-            mock.call(
-                image_data,
-                DataSource.LOCAL,
-                "test_directory/image2.png",
+                ["test_directory/image1.jpg", "test_directory/image2.png"],
                 directory,
                 MEDIA_TYPE.IMAGE,
                 embedding_model,
             ),
         ]
+        assert vector_database.write_batch.mock_calls == [
+            mock.call(vector_database.prepare_batch.return_value)
+        ]
 
     @patch("os.walk")
-    @patch("PIL.Image.open")
+    @patch.object(ImagePreprocessor, "preprocess")
     def test_add_data_image_directory_with_existing_files(
         self, mock_image_file, mock_listdir
     ):
@@ -131,11 +125,11 @@ class LocalDataSourceTest(unittest.TestCase):
         self.local_data_source.add_data(
             directory, embedding_models_config, vector_database
         )
-        assert vector_database.add.mock_calls == [
+        assert vector_database.prepare_batch.mock_calls == [
             mock.call(
-                image_data,
+                [image_data],
                 DataSource.LOCAL,
-                "test_directory/image1.jpg",
+                ["test_directory/image1.jpg"],
                 directory,
                 MEDIA_TYPE.IMAGE,
                 embedding_model,
@@ -143,7 +137,7 @@ class LocalDataSourceTest(unittest.TestCase):
         ]
 
     @patch("os.path.isfile")
-    @patch("PIL.Image.open")
+    @patch.object(ImagePreprocessor, "preprocess")
     @patch("mimetypes.guess_type")
     def test_add_data_image(self, mock_mimetype, mock_image_file, mock_isfile):
         embedding_models_config = mock.Mock()
@@ -165,11 +159,11 @@ class LocalDataSourceTest(unittest.TestCase):
         self.local_data_source.add_data(
             directory, embedding_models_config, vector_database
         )
-        assert vector_database.add.mock_calls == [
+        assert vector_database.prepare_batch.mock_calls == [
             mock.call(
-                image_data,
+                [image_data],
                 DataSource.LOCAL,
-                directory,
+                [directory],
                 directory,
                 MEDIA_TYPE.IMAGE,
                 embedding_model,
@@ -196,16 +190,19 @@ class LocalDataSourceTest(unittest.TestCase):
         self.local_data_source.add_data(
             filename, embedding_models_config, vector_database
         )
-        assert vector_database.add.mock_calls == [
+        assert vector_database.prepare_batch.mock_calls == [
             mock.call(
-                filename,
+                [filename],
                 DataSource.LOCAL,
-                filename,
+                [filename],
                 filename,
                 MEDIA_TYPE.AUDIO,
                 embedding_model,
             )
         ]
+        assert vector_database.write_batch.mock_calls == [
+            mock.call(vector_database.prepare_batch.return_value)
+        ]
 
     @patch("os.path.isfile")
     @patch("mimetypes.guess_type")
@@ -229,4 +226,121 @@ class LocalDataSourceTest(unittest.TestCase):
         self.local_data_source.add_data(
             filename, embedding_models_config, vector_database
         )
-        vector_database.add.assert_not_called()
+        vector_database.prepare_batch.assert_not_called()
+        vector_database.write_batch.assert_not_called()
+
+    @patch("os.walk")
+    @patch.object(ImagePreprocessor, "preprocess")
+    def test_add_data_image_directory_in_batches(self, mock_image_file, mock_listdir):
+        local_data_source = LocalDataSource(LocalSourceConfig(batch_size=2))
+        embedding_models_config = mock.Mock()
+        embedding_model = mock.Mock()
+
+        embedding_models_config.get_embedding_model.return_value = [embedding_model]
+
+        image_data = mock.Mock()
+        mock_listdir.return_value = [
+            ("test_directory", "", ["image1.jpg", "image2.png", "image3.png"])
+        ]
+        mock_image_file.return_value = image_data
+
+        vector_database = mock.Mock()
+        vector_database.get_existing_document_ids.return_value = []
+
+        directory = "test_directory"
+        local_data_source.add_data(directory, embedding_models_config, vector_database)
+        assert vector_database.prepare_batch.mock_calls == [
+            mock.call(
+                [image_data, image_data],
+                DataSource.LOCAL,
+                ["test_directory/image1.jpg", "test_directory/image2.png"],
+                directory,
+                MEDIA_TYPE.IMAGE,
+                embedding_model,
+            ),
+            mock.call(
+                [image_data],
+                DataSource.LOCAL,
+                ["test_directory/image3.png"],
+                directory,
+                MEDIA_TYPE.IMAGE,
+                embedding_model,
+            ),
+        ]
+        assert vector_database.write_batch.mock_calls == [
+            mock.call(vector_database.prepare_batch.return_value),
+            mock.call(vector_database.prepare_batch.return_value),
+        ]
+
+    def test_add_data_with_manifest_only_ingests_new_or_changed_files(self):
+        with tempfile.TemporaryDirectory() as directory:
+            manifest_path = os.path.join(directory, "manifest.sqlite")
+            media_directory = os.path.join(directory, "media")
+            os.makedirs(media_directory)
+            for name in ["audio1.mp3", "audio2.mp3"]:
+                with open(os.path.join(media_directory, name), "wb") as f:
+                    f.write(name.encode())
+
+            embedding_models_config = mock.Mock()
+            embedding_model = mock.Mock()
+            embedding_model.get_collection_name.return_value = "deepsearch-audio"
+            embedding_models_config.get_embedding_model.return_value = [embedding_model]
+            vector_database = mock.Mock()
+            vector_database.get_existing_document_ids.return_value = []
+
+            local_data_source = LocalDataSource(
+                LocalSourceConfig(manifest_path=manifest_path)
+            )
+            deleted_files = local_data_source.add_data(
+                media_directory, embedding_models_config, vector_database
+            )
+            self.assertEqual(deleted_files, [])
+            args, _ = vector_database.prepare_batch.call_args
+            self.assertEqual(
+                sorted(args[2]),
+                [
+                    os.path.join(media_directory, "audio1.mp3"),
+                    os.path.join(media_directory, "audio2.mp3"),
+                ],
+            )
+
+            # Change one file, delete the other one and add a new one
+            vector_database.reset_mock()
+            audio1 = os.path.join(media_directory, "audio1.mp3")
+            with open(audio1, "wb") as f:
+                f.write(b"changed content")
+            os.remove(os.path.join(media_directory, "audio2.mp3"))
+            with open(os.path.join(media_directory, "audio3.mp3"), "wb") as f:
+                f.write(b"audio3")
+
+            deleted_files = LocalDataSource(
+                LocalSourceConfig(manifest_path=manifest_path)
+            ).add_data(media_directory, embedding_models_config, vector_database)
+
+            self.assertEqual(
+                deleted_files, [os.path.join(media_directory, "audio2.mp3")]
+            )
+            vector_database.get_existing_document_ids.assert_not_called()
+            self.assertEqual(
+                vector_database.delete.mock_calls,
+                [
+                    mock.call({"document_id": audio1}, MEDIA_TYPE.AUDIO),
+                    mock.call(
+                        {"document_id": os.path.join(media_directory, "audio2.mp3")}
+                    ),
+                ],
+            )
+            args, _ = vector_database.prepare_batch.call_args
+            self.assertEqual(
+                sorted(args[2]),
+                [audio1, os.path.join(media_directory, "audio3.mp3")],
+            )
+
+            # Nothing changed since the last sync, and the deletion is not reported again
+            vector_database.reset_mock()
+            deleted_files = LocalDataSource(
+                LocalSourceConfig(manifest_path=manifest_path)
+            ).add_data(media_directory, embedding_models_config, vector_database)
+            self.assertEqual(deleted_files, [])
+            vector_database.delete.assert_not_called()
+            vector_database.prepare_batch.assert_not_called()
@@ -0,0 +1,246 @@
+import pickle
+import time
+import unittest
+from unittest import mock
+
+from deepsearchai.embedding_models.base import BaseEmbeddingModel
+from deepsearchai.embedding_models.whisper_openai import WhisperOpenAi
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.configs.base import BaseSourceConfig
+from deepsearchai.sources.data_source import DataSource
+from deepsearchai.sources.pipeline import IngestionPipeline
+
+
+class LocalModel(BaseEmbeddingModel):
+    MODEL_NAME = "local"
+
+
+class IngestionPipelineTest(unittest.TestCase):
+    def create_tasks(self, embedding_models, count):
+        return [
+            {
+                "document_id": "file{}".format(i),
+                "media_type": MEDIA_TYPE.IMAGE,
+                "embedding_models": embedding_models,
+                "location": "file{}".format(i),
+            }
+            for i in range(count)
+        ]
+
+    def test_run_batches_per_embedding_model_in_order(self):
+        clip, blip = mock.Mock(), mock.Mock()
+        vector_database = mock.Mock()
+        vector_database.prepare_batch.side_effect = lambda *args: args[2]
+        pipeline = IngestionPipeline(
+            BaseSourceConfig(batch_size=2, decode_workers=3, decode_queue_size=2)
+        )
+
+        pipeline.run(
+            self.create_tasks([clip, blip], 3),
+            lambda task: "data-" + task["location"],
+            vector_database,
+            DataSource.LOCAL,
+            "source",
+        )
+
+        self.assertEqual(
+            vector_database.prepare_batch.mock_calls,
+            [
+                mock.call(
+                    ["data-file0", "data-file1"],
+                    DataSource.LOCAL,
+                    ["file0", "file1"],
+                    "source",
+                    MEDIA_TYPE.IMAGE,
+                    clip,
+                ),
+                mock.call(
+                    ["data-file0", "data-file1"],
+                    DataSource.LOCAL,
+                    ["file0", "file1"],
+                    "source",
+                    MEDIA_TYPE.IMAGE,
+                    blip,
+                ),
+                mock.call(
+                    ["data-file2"],
+                    DataSource.LOCAL,
+                    ["file2"],
+                    "source",
+                    MEDIA_TYPE.IMAGE,
+                    clip,
+                ),
+                mock.call(
+                    ["data-file2"],
+                    DataSource.LOCAL,
+                    ["file2"],
+                    "source",
+                    MEDIA_TYPE.IMAGE,
+                    blip,
+                ),
+            ],
+        )
+        self.assertEqual(
+            vector_database.write_batch.mock_calls,
+            [
+                mock.call(["file0", "file1"]),
+                mock.call(["file0", "file1"]),
+                mock.call(["file2"]),
+                mock.call(["file2"]),
+            ],
+        )
+
+    def test_run_skips_media_that_could_not_be_loaded(self):
+        vector_database = mock.Mock()
+        pipeline = IngestionPipeline(BaseSourceConfig(batch_size=10))
+
+        pipeline.run(
+            self.create_tasks([mock.Mock()], 3),
+            lambda task: None if task["location"] == "file1" else task["location"],
+            vector_database,
+            DataSource.LOCAL,
+            "source",
+        )
+
+        args, _ = vector_database.prepare_batch.call_args
+        self.assertEqual(args[2], ["file0", "file2"])
+
+    def test_run_releases_media_once_every_model_encoded_it(self):
+        clip, blip = mock.Mock(), mock.Mock()
+        vector_database = mock.Mock()
+        released = []
+
+        def write_batch(prepared_batch):
+            # Media is still held while it is being stored
+            self.assertEqual(released, [])
+
+        vector_database.write_batch.side_effect = write_batch
+        pipeline = IngestionPipeline(BaseSourceConfig(batch_size=10))
+
+        pipeline.run(
+            self.create_tasks([clip, blip], 2),
+            lambda task: None if task["location"] == "file1" else task["location"],
+            vector_database,
+            DataSource.LOCAL,
+            "source",
+            release=lambda task, data: released.append(data),
+        )
+
+        self.assertEqual(vector_database.write_batch.call_count, 2)
+        self.assertEqual(released, ["file0"])
+
+    def test_run_releases_media_after_a_failure(self):
+        vector_database = mock.Mock()
+        vector_database.write_batch.side_effect = ValueError("write failed")
+        released = []
+        pipeline = IngestionPipeline(BaseSourceConfig(batch_size=1))
+
+        with self.assertRaises(ValueError):
+            pipeline.run(
+                self.create_tasks([mock.Mock()], 5),
+                lambda task: task["location"],
+                vector_database,
+                DataSource.LOCAL,
+                "source",
+                release=lambda task, data: released.append(data),
+            )
+
+        self.assertEqual(sorted(released), ["file{}".format(i) for i in range(5)])
+
+    def test_run_raises_write_errors(self):
+        vector_database = mock.Mock()
+        vector_database.write_batch.side_effect = ValueError("write failed")
+        pipeline = IngestionPipeline(BaseSourceConfig(batch_size=1))
+
+        with self.assertRaises(ValueError):
+            pipeline.run(
+                self.create_tasks([mock.Mock()], 5),
+                lambda task: task["location"],
+                vector_database,
+                DataSource.LOCAL,
+                "source",
+            )
+
+    def test_run_writes_batches_encoded_by_workers_in_order(self):
+        clip = mock.Mock()
+        pool = mock.Mock()
+        pool.wrap.side_effect = lambda model: ("pooled", model)
+        vector_database = mock.Mock()
+
+        def prepare_batch(data, datasource, files, source, media_type, model):
+            # Earlier batches finish last
+            time.sleep(0.05 * (3 - len(vector_database.prepare_batch.mock_calls)))
+            return files, model
+
+        vector_database.prepare_batch.side_effect = prepare_batch
+        pipeline = IngestionPipeline(
+            BaseSourceConfig(batch_size=1, decode_workers=1, embedding_workers=3)
+        )
+
+        with mock.patch(
+            "deepsearchai.sources.pipeline.get_worker_pool", return_value=pool
+        ) as get_worker_pool:
+            pipeline.run(
+                self.create_tasks([clip], 3),
+                lambda task: "data-" + task["location"],
+                vector_database,
+                DataSource.LOCAL,
+                "source",
+            )
+
+        get_worker_pool.assert_called_once_with(3)
+        self.assertEqual(
+            vector_database.write_batch.mock_calls,
+            [
+                mock.call((["file0"], ("pooled", clip))),
+                mock.call((["file1"], ("pooled", clip))),
+                mock.call((["file2"], ("pooled", clip))),
+            ],
+        )
+
+    def test_run_encodes_api_models_outside_of_the_workers(self):
+        whisper = WhisperOpenAi()
+        clip = LocalModel()
+        pool = mock.Mock()
+
+        def wrap(model):
+            # Models are pickled when sent to the worker processes
+            pickle.dumps(model)
+            return "pooled", model
+
+        pool.wrap.side_effect = wrap
+        vector_database = mock.Mock()
+        vector_database.prepare_batch.side_effect = lambda *args: (args[2], args[5])
+        tasks = [
+            {
+                "document_id": "song{}".format(i),
+                "media_type": MEDIA_TYPE.AUDIO,
+                "embedding_models": [whisper],
+                "location": "song{}".format(i),
+            }
+            for i in range(2)
+        ]
+        pipeline = IngestionPipeline(
+            BaseSourceConfig(batch_size=1, embedding_workers=2)
+        )
+
+        with mock.patch(
+            "deepsearchai.sources.pipeline.get_worker_pool", return_value=pool
+        ):
+            pipeline.run(
+                tasks + self.create_tasks([clip], 1),
+                lambda task: task["location"],
+                vector_database,
+                DataSource.LOCAL,
+                "source",
+            )
+
+        pool.wrap.assert_called_once_with(clip)
+        self.assertEqual(
+            vector_database.write_batch.mock_calls,
+            [
+                mock.call((["song0"], whisper)),
+                mock.call((["song1"], whisper)),
+                mock.call((["file0"], ("pooled", clip))),
+            ],
+        )
@@ -1,4 +1,8 @@
+import datetime
 import io
+import os
+import tempfile
+import threading
 import unittest
 from unittest.mock import patch
 
@@ -8,8 +12,9 @@ from PIL import Image
 
 from deepsearchai.embedding_models_config import EmbeddingModelsConfig
 from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.configs.s3 import S3SourceConfig
 from deepsearchai.sources.data_source import DataSource
-from deepsearchai.sources.s3 import S3DataSource
+from deepsearchai.sources.s3 import S3DataSource, _InflightBytesLimiter
 from deepsearchai.vector_databases.base import BaseVectorDatabase
 
 
@@ -36,6 +41,15 @@ class S3DataSourceTests(unittest.TestCase):
         image = self.s3_data_source._load_image_from_s3(bucket_name, object_key)
         self.assertIsInstance(image, Image.Image)
 
+    def test_load_image_from_s3_only_hashes_for_the_artifact_store(self):
+        self.mock_s3_client.get_object.return_value = {
+            "Body": self.create_fake_image_data()
+        }
+
+        image = self.s3_data_source._load_image_from_s3("my-bucket", "image.jpg")
+
+        self.assertNotIn("content_hash", image.info)
+
     def test_get_all_objects_inside_an_object(self):
         bucket_name = "my-bucket"
         object_key = "my-folder"
@@ -98,14 +112,17 @@ class S3DataSourceTests(unittest.TestCase):
                 self.s3_data_source.add_data(
                     source, embedding_models_config, mock_vector_database
                 )
-                mock_vector_database.add.assert_called_once()
-                args, kwargs = mock_vector_database.add.call_args
-                self.assertEqual(args[0], image_data)
+                mock_vector_database.prepare_batch.assert_called_once()
+                args, kwargs = mock_vector_database.prepare_batch.call_args
+                self.assertEqual(args[0], [image_data])
                 self.assertEqual(args[1], DataSource.LOCAL)
-                self.assertEqual(args[2], source)
+                self.assertEqual(args[2], [source])
                 self.assertEqual(args[3], source)
                 self.assertEqual(args[4], MEDIA_TYPE.IMAGE)
                 self.assertEqual(args[5], embedding_model)
+                mock_vector_database.write_batch.assert_called_once_with(
+                    mock_vector_database.prepare_batch.return_value
+                )
 
     def test_add_data_for_audio(self):
         source = "s3://my-bucket/my-folder/my-audio.mp3"
@@ -150,12 +167,224 @@ class S3DataSourceTests(unittest.TestCase):
 
         # Verify that the vector database add method was called with the correct arguments
 
-        mock_vector_database.add.assert_called_once()
-        args, kwargs = mock_vector_database.add.call_args
+        mock_vector_database.prepare_batch.assert_called_once()
+        args, kwargs = mock_vector_database.prepare_batch.call_args
 
-        self.assertEqual(args[0], "/tmp/deepsearch/my-audio.mp3")
+        self.assertEqual(args[0], ["/tmp/deepsearch/my-audio.mp3"])
         self.assertEqual(args[1], DataSource.LOCAL)
-        self.assertEqual(args[2], source)
+        self.assertEqual(args[2], [source])
         self.assertEqual(args[3], source)
         self.assertEqual(args[4], MEDIA_TYPE.AUDIO)
         self.assertEqual(args[5], embedding_model)
+        mock_vector_database.write_batch.assert_called_once_with(
+            mock_vector_database.prepare_batch.return_value
+        )
+
+    def test_load_image_from_s3_releases_inflight_bytes(self):
+        self.mock_s3_client.get_object.return_value = {
+            "Body": self.create_fake_image_data(),
+            "ContentLength": 1024,
+        }
+        limiter = self.s3_data_source.inflight_bytes_limiter
+        with patch.object(limiter, "acquire", wraps=limiter.acquire) as mock_acquire:
+            image = self.s3_data_source._load_image_from_s3("my-bucket", "image.jpg")
+
+        self.assertIsInstance(image, Image.Image)
+        mock_acquire.assert_called_once_with(1024)
+        self.assertEqual(limiter.inflight_bytes, 0)
+
+    def test_inflight_bytes_limiter_blocks_until_budget_is_released(self):
+        limiter = _InflightBytesLimiter(100)
+        limiter.acquire(80)
+        acquired = threading.Event()
+        thread = threading.Thread(target=lambda: (limiter.acquire(50), acquired.set()))
+        thread.start()
+
+        self.assertFalse(acquired.wait(0.1))
+        limiter.release(80)
+        self.assertTrue(acquired.wait(1))
+        thread.join()
+        self.assertEqual(limiter.inflight_bytes, 50)
+
+    @patch.object(boto3, "client")
+    def test_add_data_with_manifest_only_ingests_new_or_changed_objects(
+        self, mock_boto3_client
+    ):
+        source = "s3://my-bucket/my-folder"
+        last_modified = datetime.datetime(2023, 10, 1, tzinfo=datetime.timezone.utc)
+        mock_vector_database = mock.Mock(BaseVectorDatabase)
+        mock_vector_database.get_existing_document_ids.return_value = []
+        embedding_model = mock.Mock()
+        embedding_model.get_collection_name.return_value = "images"
+        embedding_models_config = mock.Mock()
+        embedding_models_config.get_embedding_model.return_value = [embedding_model]
+
+        def list_objects(*etags):
+            return [
+                {
+                    "Contents": [
+                        {
+                            "Key": "my-folder/a.jpg",
+                            "Size": 10,
+                            "ETag": '"{}"'.format(etags[0]),
+                            "LastModified": last_modified,
+                        }
+                    ],
+                    "NextContinuationToken": "token",
+                },
+                {
+                    "Contents": [
+                        {
+                            "Key": "my-folder/{}.jpg".format(key),
+                            "Size": 10,
+                            "ETag": '"{}"'.format(etag),
+                            "LastModified": last_modified,
+                        }
+                        for key, etag in zip(["b", "c"], etags[1:])
+                    ]
+                },
+            ]
+
+        with tempfile.TemporaryDirectory() as directory:
+            s3_data_source = S3DataSource(
+                S3SourceConfig(manifest_path=os.path.join(directory, "manifest.db"))
+            )
+            s3_client = mock_boto3_client.return_value
+            image_data = Image.new("RGB", (10, 10), (255, 0, 0))
+
+            with patch.object(
+                S3DataSource, "_load_image_from_s3", return_value=image_data
+            ):
+                s3_client.list_objects_v2.side_effect = list_objects("1", "2", "3")
+                deleted = s3_data_source.add_data(
+                    source, embedding_models_config, mock_vector_database
+                )
+                self.assertEqual(deleted, [])
+                # Every page is listed under the same prefix
+                for call in s3_client.list_objects_v2.call_args_list:
+                    self.assertEqual(call.kwargs["Prefix"], "my-folder")
+                self.assertEqual(
+                    s3_client.list_objects_v2.call_args_list[1].kwargs[
+                        "ContinuationToken"
+                    ],
+                    "token",
+                )
+                args, _ = mock_vector_database.prepare_batch.call_args
+                self.assertEqual(
+                    sorted(args[2]),
+                    [
+                        "s3://my-bucket/my-folder/a.jpg",
+                        "s3://my-bucket/my-folder/b.jpg",
+                        "s3://my-bucket/my-folder/c.jpg",
+                    ],
+                )
+
+                # b.jpg changed and c.jpg was deleted
+                mock_vector_database.reset_mock()
+                first_page, second_page = list_objects("1", "4")
+                s3_client.list_objects_v2.side_effect = [
+                    {"Contents": first_page["Contents"] + second_page["Contents"]}
+                ]
+                deleted = s3_data_source.add_data(
+                    source, embedding_models_config, mock_vector_database
+                )
+
+                self.assertEqual(deleted, ["s3://my-bucket/my-folder/c.jpg"])
+                mock_vector_database.get_existing_document_ids.assert_not_called()
+                self.assertEqual(
+                    mock_vector_database.delete.mock_calls,
+                    [
+                        mock.call(
+                            {"document_id": "s3://my-bucket/my-folder/b.jpg"},
+                            MEDIA_TYPE.IMAGE,
+                        ),
+                        mock.call({"document_id": "s3://my-bucket/my-folder/c.jpg"}),
+                    ],
+                )
+                args, _ = mock_vector_database.prepare_batch.call_args
+                self.assertEqual(args[2], ["s3://my-bucket/my-folder/b.jpg"])
+
+                # The deletion was handled by the previous sync
+                mock_vector_database.reset_mock()
+                s3_client.list_objects_v2.side_effect = [
+                    {"Contents": first_page["Contents"] + second_page["Contents"]}
+                ]
+                deleted = s3_data_source.add_data(
+                    source, embedding_models_config, mock_vector_database
+                )
+
+            self.assertEqual(deleted, [])
+            mock_vector_database.delete.assert_not_called()
+            mock_vector_database.prepare_batch.assert_not_called()
+            self.assertEqual(
+                sorted(s3_data_source.manifest.get_entries()),
+                ["s3://my-bucket/my-folder/a.jpg", "s3://my-bucket/my-folder/b.jpg"],
+            )
+            s3_data_source.manifest.close()
+
+    @patch.object(boto3, "client")
+    def test_load_audio_from_s3_reuses_cached_downloads(self, mock_boto3_client):
+        with tempfile.TemporaryDirectory() as directory:
+            s3_data_source = S3DataSource(S3SourceConfig(media_cache_path=directory))
+            s3_client = mock_boto3_client.return_value
+            s3_client.head_object.return_value = {"ETag": '"etag"'}
+            s3_client.download_file.side_effect = (
+                lambda bucket, key, path: open(path, "wb").close()
+            )
+
+            path = s3_data_source._load_audio_from_s3("my-bucket", "my-audio.mp3")
+            cached_path = s3_data_source._load_audio_from_s3(
+                "my-bucket", "my-audio.mp3", "etag"
+            )
+
+            self.assertEqual(path, cached_path)
+            self.assertEqual(os.path.dirname(path), directory)
+            self.assertTrue(path.endswith(".mp3"))
+            s3_client.download_file.assert_called_once()
+
+    @patch.object(boto3, "client")
+    def test_load_audio_from_s3_counts_against_the_inflight_bytes(
+        self, mock_boto3_client
+    ):
+        with tempfile.TemporaryDirectory() as directory:
+            s3_data_source = S3DataSource(
+                S3SourceConfig(media_cache_path=directory, max_inflight_bytes=100)
+            )
+            s3_client = mock_boto3_client.return_value
+            s3_client.head_object.return_value = {"ETag": '"etag"', "ContentLength": 60}
+            limiter = s3_data_source.inflight_bytes_limiter
+            inflight_bytes = []
+
+            def download_file(bucket, key, path):
+                inflight_bytes.append(limiter.inflight_bytes)
+                open(path, "wb").close()
+
+            s3_client.download_file.side_effect = download_file
+
+            s3_data_source._load_audio_from_s3("my-bucket", "my-audio.mp3")
+            # Known from the listing in delta sync mode
+            s3_data_source._load_audio_from_s3("my-bucket", "other.mp3", "etag", 30)
+
+        self.assertEqual(inflight_bytes, [60, 30])
+        self.assertEqual(limiter.inflight_bytes, 0)
+        s3_client.head_object.assert_called_once()
+
+    def test_load_image_from_s3_reuses_cached_thumbnails(self):
+        with tempfile.TemporaryDirectory() as directory, patch.object(
+            boto3, "client"
+        ) as mock_boto3_client:
+            s3_data_source = S3DataSource(S3SourceConfig(image_cache_path=directory))
+            mock_s3_client = mock_boto3_client.return_value
+            mock_s3_client.get_object.return_value = {
+                "Body": self.create_fake_image_data(),
+                "ETag": '"v1"',
+            }
+
+            image = s3_data_source._load_image_from_s3(
+                "my-bucket", "image.jpg", hash_content=True
+            )
+            cached = s3_data_source._load_image_from_s3("my-bucket", "image.jpg", "v1")
+
+        mock_s3_client.get_object.assert_called_once()
+        self.assertEqual(cached.size, image.size)
+        self.assertEqual(cached.info["content_hash"], image.info["content_hash"])
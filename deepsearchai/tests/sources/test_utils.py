@@ -0,0 +1,228 @@
+import asyncio
+import threading
+import time
+import unittest
+from unittest import mock
+
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.utils import SourceUtils
+
+
+class SourceUtilsGetDataTest(unittest.TestCase):
+    def setUp(self):
+        self.models = {
+            MEDIA_TYPE.IMAGE: [
+                mock.Mock(MODEL_NAME="clip"),
+                mock.Mock(MODEL_NAME="blip"),
+            ],
+            MEDIA_TYPE.AUDIO: [mock.Mock(MODEL_NAME="whisper")],
+        }
+        self.embedding_models_config = mock.Mock()
+        self.embedding_models_config.get_embedding_model.side_effect = (
+            lambda media_type: self.models.get(media_type, [])
+        )
+        self.source_utils = SourceUtils(query_workers=4)
+
+    def test_collections_are_searched_concurrently_and_fused_in_order(self):
+        # Every search waits for the others to start, which only completes if they run concurrently
+        barrier = threading.Barrier(3, timeout=5)
+
+        def query(
+            query, n_results, media_type, distance_threshold, embedding_model, collapse
+        ):
+            barrier.wait()
+            time.sleep(0.01)
+            return [{"document": embedding_model.MODEL_NAME, "metadata": {}}]
+
+        vector_database = mock.Mock()
+        vector_database.query.side_effect = query
+        timings = {}
+
+        media_data = self.source_utils.get_data(
+            "a dog",
+            [MEDIA_TYPE.IMAGE, MEDIA_TYPE.UNKNOWN, MEDIA_TYPE.AUDIO],
+            self.embedding_models_config,
+            vector_database,
+            3,
+            timings,
+        )
+
+        # Both image collections ranked their document first, ties keep the order of the models
+        score = 1 / 61
+        self.assertEqual(
+            media_data,
+            {
+                MEDIA_TYPE.IMAGE: [
+                    {"document": "clip", "metadata": {}, "fused_score": score},
+                    {"document": "blip", "metadata": {}, "fused_score": score},
+                ],
+                MEDIA_TYPE.AUDIO: [
+                    {"document": "whisper", "metadata": {}, "fused_score": score}
+                ],
+            },
+        )
+        self.assertEqual(
+            [(branch["media_type"], branch["model"]) for branch in timings["branches"]],
+            [
+                (MEDIA_TYPE.IMAGE, "clip"),
+                (MEDIA_TYPE.IMAGE, "blip"),
+                (MEDIA_TYPE.AUDIO, "whisper"),
+            ],
+        )
+        # Fused by document, so every collection supplies distinct documents
+        self.assertTrue(
+            all(call.kwargs["collapse"] for call in vector_database.query.call_args_list)
+        )
+        for branch in timings["branches"]:
+            self.assertGreaterEqual(branch["seconds"], 0.01)
+        self.assertLess(
+            timings["total_seconds"],
+            sum(branch["seconds"] for branch in timings["branches"]),
+        )
+
+    def test_concurrent_queries_get_their_own_timings(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def query(
+            query, n_results, media_type, distance_threshold, embedding_model, collapse
+        ):
+            # Both queries are searching at the same time
+            barrier.wait()
+            return []
+
+        vector_database = mock.Mock()
+        vector_database.query.side_effect = query
+        timings = {MEDIA_TYPE.IMAGE: {}, MEDIA_TYPE.AUDIO: {}}
+
+        def get_data(media_type):
+            self.source_utils.get_data(
+                "a dog",
+                [media_type],
+                self.embedding_models_config,
+                vector_database,
+                1,
+                timings[media_type],
+            )
+
+        # Single collections, searched by the calling threads
+        self.models[MEDIA_TYPE.IMAGE] = self.models[MEDIA_TYPE.IMAGE][:1]
+        thread = threading.Thread(target=get_data, args=(MEDIA_TYPE.AUDIO,))
+        thread.start()
+        get_data(MEDIA_TYPE.IMAGE)
+        thread.join()
+
+        self.assertEqual(
+            {
+                media_type: [branch["model"] for branch in query_timings["branches"]]
+                for media_type, query_timings in timings.items()
+            },
+            {MEDIA_TYPE.IMAGE: ["clip"], MEDIA_TYPE.AUDIO: ["whisper"]},
+        )
+
+    def test_search_errors_are_raised(self):
+        vector_database = mock.Mock()
+        vector_database.query.side_effect = ValueError("dimension mismatch")
+
+        with self.assertRaises(ValueError):
+            self.source_utils.get_data(
+                "a dog",
+                [MEDIA_TYPE.IMAGE],
+                self.embedding_models_config,
+                vector_database,
+                1,
+            )
+
+
+    def test_get_data_batch_searches_every_collection_once(self):
+        def query_batch(
+            queries, n_results, media_type, threshold, embedding_model, collapse
+        ):
+            return [
+                [{"document": "{}-{}".format(embedding_model.MODEL_NAME, query)}]
+                for query in queries
+            ]
+
+        vector_database = mock.Mock()
+        vector_database.query_batch.side_effect = query_batch
+        timings = {}
+
+        media_data = self.source_utils.get_data_batch(
+            ["cat", "dog"],
+            [MEDIA_TYPE.IMAGE],
+            self.embedding_models_config,
+            vector_database,
+            5,
+            timings,
+        )
+
+        self.assertEqual(vector_database.query_batch.call_count, 2)
+        vector_database.query.assert_not_called()
+        self.assertEqual(
+            [
+                [item["document"] for item in data[MEDIA_TYPE.IMAGE]]
+                for data in media_data
+            ],
+            [["clip-cat", "blip-cat"], ["clip-dog", "blip-dog"]],
+        )
+        # A single search per collection, for the whole batch
+        self.assertEqual(
+            [branch["model"] for branch in timings["branches"]], ["clip", "blip"]
+        )
+
+class SourceUtilsAsyncTest(unittest.IsolatedAsyncioTestCase):
+    async def test_aget_data_awaits_every_collection_concurrently(self):
+        clip, whisper = mock.Mock(MODEL_NAME="clip"), mock.Mock(MODEL_NAME="whisper")
+        embedding_models_config = mock.Mock()
+        embedding_models_config.get_embedding_model.side_effect = lambda media_type: {
+            MEDIA_TYPE.IMAGE: [clip],
+            MEDIA_TYPE.AUDIO: [whisper],
+        }[media_type]
+        started = []
+
+        async def aquery(
+            query, n_results, media_type, distance_threshold, model, collapse
+        ):
+            started.append(model.MODEL_NAME)
+            # Only returns once both searches have started
+            while len(started) < 2:
+                await asyncio.sleep(0)
+            return [{"document": model.MODEL_NAME, "metadata": {}}]
+
+        vector_database = mock.Mock()
+        vector_database.aquery.side_effect = aquery
+        source_utils = SourceUtils()
+        timings = {}
+
+        media_data = await asyncio.wait_for(
+            source_utils.aget_data(
+                "a dog",
+                [MEDIA_TYPE.IMAGE, MEDIA_TYPE.AUDIO],
+                embedding_models_config,
+                vector_database,
+                1,
+                timings,
+            ),
+            timeout=5,
+        )
+
+        self.assertEqual(
+            [
+                [item["document"] for item in media_data[media_type]]
+                for media_type in [MEDIA_TYPE.IMAGE, MEDIA_TYPE.AUDIO]
+            ],
+            [["clip"], ["whisper"]],
+        )
+        vector_database.query.assert_not_called()
+        self.assertEqual(len(timings["branches"]), 2)
+
+    async def test_aadd_data_ingests_off_the_event_loop(self):
+        source_utils = SourceUtils()
+        loop_thread = threading.get_ident()
+
+        def add_data(source, embedding_models_config, vector_database):
+            return [source, threading.get_ident() != loop_thread]
+
+        with mock.patch.object(source_utils, "add_data", side_effect=add_data):
+            result = await source_utils.aadd_data("photos", mock.Mock(), mock.Mock())
+
+        self.assertEqual(result, ["photos", True])
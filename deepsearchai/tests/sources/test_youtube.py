@@ -0,0 +1,125 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import mock
+
+from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.sources.configs.youtube import YoutubeSourceConfig
+from deepsearchai.sources.data_source import DataSource
+from deepsearchai.sources.youtube import YoutubeDatasource
+from deepsearchai.vector_databases.base import BaseVectorDatabase
+
+
+class _Request:
+    def __init__(self, response):
+        self.response = response
+
+    def execute(self):
+        return self.response
+
+
+class FakeYoutubeClient:
+    """Serves a channel whose upload playlist spans several pages."""
+
+    def __init__(self, video_ids, page_size):
+        self.video_ids = video_ids
+        self.page_size = page_size
+        self.page_tokens = []
+
+    def search(self):
+        return self
+
+    def channels(self):
+        return self
+
+    def playlistItems(self):
+        return self
+
+    def list(self, **kwargs):
+        if "q" in kwargs:
+            return _Request({"items": [{"id": {"channelId": "channel"}}]})
+        if "id" in kwargs:
+            return _Request(
+                {
+                    "items": [
+                        {"contentDetails": {"relatedPlaylists": {"uploads": "uploads"}}}
+                    ]
+                }
+            )
+        page_token = kwargs.get("pageToken")
+        self.page_tokens.append(page_token)
+        start = int(page_token) if page_token else 0
+        end = start + self.page_size
+        response = {
+            "items": [
+                {"snippet": {"resourceId": {"videoId": video_id}}}
+                for video_id in self.video_ids[start:end]
+            ]
+        }
+        if end < len(self.video_ids):
+            response["nextPageToken"] = str(end)
+        return _Request(response)
+
+
+class YoutubeDatasourceTests(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.video_ids = ["video{}".format(i) for i in range(5)]
+        self.youtube_client = FakeYoutubeClient(self.video_ids, page_size=2)
+        self.youtube_data_source = YoutubeDatasource(
+            YoutubeSourceConfig(media_cache_path=self.directory.name),
+            youtube_client=self.youtube_client,
+        )
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_get_channel_video_ids_pages_through_the_playlist(self):
+        video_ids = self.youtube_data_source._get_channel_video_ids("channel")
+
+        self.assertEqual(video_ids, self.video_ids)
+        self.assertEqual(self.youtube_client.page_tokens, [None, "2", "4"])
+
+    def test_add_data_skips_stored_videos_and_failed_downloads(self):
+        mock_vector_database = mock.Mock(BaseVectorDatabase)
+        # Left over by an interrupted run
+        mock_vector_database.get_existing_document_ids.return_value = ["video0"]
+        embedding_model = mock.Mock(REQUIRES_VIDEO_STREAM=False)
+        # Only the audio of videos is downloaded, so models reading their frames are skipped
+        keyframes_model = mock.Mock(REQUIRES_VIDEO_STREAM=True)
+        embedding_models_config = mock.Mock()
+        embedding_models_config.get_embedding_model.return_value = [
+            embedding_model,
+            keyframes_model,
+        ]
+
+        def download(video_id):
+            if video_id == "video3":
+                raise ConnectionError()
+            return "/tmp/{}.mp4".format(video_id)
+
+        with patch.object(
+            YoutubeDatasource, "_chunk_and_load_video", side_effect=download
+        ) as mock_download:
+            self.youtube_data_source.add_data(
+                "youtube:channel", embedding_models_config, mock_vector_database
+            )
+
+        self.assertEqual(
+            sorted(call.args[0] for call in mock_download.call_args_list),
+            ["video1", "video2", "video3", "video4"],
+        )
+        # Every video is stored on its own, as soon as it is transcribed
+        stored = []
+        for call in mock_vector_database.prepare_batch.call_args_list:
+            data, datasource, video_ids, source, media_type, model = call.args
+            self.assertEqual(len(video_ids), 1)
+            self.assertEqual(data, ["/tmp/{}.mp4".format(video_ids[0])])
+            self.assertEqual(datasource, DataSource.LOCAL)
+            self.assertEqual(source, "youtube:channel")
+            self.assertEqual(media_type, MEDIA_TYPE.VIDEO)
+            self.assertEqual(model, embedding_model)
+            stored.extend(video_ids)
+        self.assertEqual(sorted(stored), ["video1", "video2", "video4"])
+        self.assertEqual(mock_vector_database.write_batch.call_count, 3)
@@ -2,9 +2,12 @@ import unittest
 from unittest import mock
 from unittest.mock import patch
 
+import numpy as np
+
 from deepsearchai.embedding_models.blip_image_captioning import \
     BlipImageCaptioning
 from deepsearchai.embedding_models.clip import Clip
+from deepsearchai.embedding_models.text_embedding import TextEmbeddingModel
 from deepsearchai.embedding_models.whisper_openai import WhisperOpenAi
 from deepsearchai.enums import MEDIA_TYPE
 from deepsearchai.sources.data_source import DataSource
@@ -112,6 +115,69 @@ class ChromaDBTest(unittest.TestCase):
             ],
         )
 
+    @patch("chromadb.Client")
+    def test_add_batch(self, chromadb_client):
+        clip_model_mock = mock.Mock()
+        clip_model_mock.get_collection_name.return_value = (
+            self.clip.get_collection_name(MEDIA_TYPE.IMAGE)
+        )
+
+        embedding_models_config = mock.Mock()
+        embedding_models_config.llm_models.items.return_value = [
+            (MEDIA_TYPE.IMAGE, [clip_model_mock])
+        ]
+
+        config = ChromaDbConfig()
+        chromadb = ChromaDB(
+            embedding_models_config=embedding_models_config, config=config
+        )
+
+        mock_image_collection = chromadb_client.return_value.get_or_create_collection(
+            name=self.clip.get_collection_name(MEDIA_TYPE.IMAGE),
+            embedding_function=config.embedding_function,
+            metadata={"hnsw:space": "cosine"},
+        )
+
+        clip_model_mock.get_media_encodings.return_value = [
+            {"embedding": [[1.0, 2.0]], "ids": ["id1"]},
+            {"embedding": [[3.0, 4.0]], "ids": ["id2"]},
+        ]
+
+        chromadb.add_batch(
+            ["image1", "image2"],
+            DataSource.LOCAL,
+            ["file1", "file2"],
+            "source",
+            MEDIA_TYPE.IMAGE,
+            clip_model_mock,
+        )
+
+        clip_model_mock.get_media_encodings.assert_called_once_with(
+            ["image1", "image2"], MEDIA_TYPE.IMAGE, DataSource.LOCAL
+        )
+        self.assertEqual(
+            mock_image_collection.add.mock_calls,
+            [
+                mock.call(
+                    embeddings=[[1.0, 2.0], [3.0, 4.0]],
+                    documents=["file1", "file2"],
+                    ids=["id1", "id2"],
+                    metadatas=[
+                        {
+                            "source_type": "LOCAL",
+                            "source_id": "source",
+                            "document_id": "file1",
+                        },
+                        {
+                            "source_type": "LOCAL",
+                            "source_id": "source",
+                            "document_id": "file2",
+                        },
+                    ],
+                )
+            ],
+        )
+
     @patch("chromadb.Client")
     def test_query(self, chromadb_client):
         # Mock clip model to be able to mock the corresponding generated embeddings
@@ -154,23 +220,29 @@ class ChromaDBTest(unittest.TestCase):
         input_embeddings = [1.0, 2.0, 3.0]
         n_results = 10
 
-        clip_model_mock.get_text_encodding.return_value = {
+        clip_model_mock.get_text_encoding.return_value = {
             "embedding": input_embeddings,
         }
 
         results = chromadb.query(
             input_query, n_results, MEDIA_TYPE.IMAGE, 0.5, clip_model_mock
         )
+        # Only the hits within the cosine distance threshold are kept
         self.assertEqual(
             results,
             [
                 {
-                    "document": "This is image document 1",
-                    "metadata": {"source": "imagesource1"},
-                    "distance": 0.721456789
+                    "document": "This is image document 2",
+                    "metadata": {"source": "imagesource2"},
+                    "distance": 0.456789012,
+                    "score": 1 - 0.456789012 / 2,
                 }
             ],
         )
+        self.assertEqual(
+            mock_image_collection.query.call_args.kwargs["n_results"],
+            n_results * chromadb.OVERFETCH_FACTOR,
+        )
 
     @patch("chromadb.Client")
     def test_get_existing_document_ids(self, chromadb_client):
@@ -302,3 +374,237 @@ class ChromaDBTest(unittest.TestCase):
         mock_image_collection.delete.assert_not_called()
         mock_image_caption_collection.delete.assert_not_called()
         mock_audio_collection.delete.assert_not_called()
+
+    @patch("chromadb.Client")
+    def test_query_embeddings_are_cached(self, chromadb_client):
+        clip_model_mock = mock.Mock()
+        clip_model_mock.MODEL_NAME = "clip"
+        clip_model_mock.get_model_version.return_value = "1"
+        clip_model_mock.get_text_encoding.return_value = {"embedding": [1.0, 2.0]}
+        text_model_mock = mock.Mock()
+        text_model_mock.MODEL_NAME = "captioning"
+        text_model_mock.get_model_version.return_value = "1"
+        text_model_mock.get_text_encoding.side_effect = lambda query: {"text": query}
+        embedding_models_config = mock.Mock()
+        embedding_models_config.llm_models.items.return_value = []
+        config = ChromaDbConfig(embedding_function=mock.Mock(return_value=[[3.0]]))
+        chromadb = ChromaDB(
+            embedding_models_config=embedding_models_config, config=config
+        )
+        collection = chromadb_client.return_value.get_or_create_collection.return_value
+        collection.query.return_value = {"ids": [], "distances": []}
+
+        for query in ["a red car", "A red car "]:
+            chromadb.query(query, 1, MEDIA_TYPE.IMAGE, 0.5, clip_model_mock)
+            chromadb.query(query, 1, MEDIA_TYPE.IMAGE, 0.5, text_model_mock)
+
+        clip_model_mock.get_text_encoding.assert_called_once_with("a red car")
+        config.embedding_function.assert_called_once_with(["a red car"])
+        self.assertEqual(
+            [call.kwargs["query_embeddings"] for call in collection.query.call_args_list],
+            [[[1.0, 2.0]], [[3.0]], [[1.0, 2.0]], [[3.0]]],
+        )
+        self.assertEqual(
+            chromadb.query_cache.get_stats(),
+            {"memory_hits": 2, "disk_hits": 0, "misses": 2},
+        )
+
+    @patch("chromadb.Client")
+    def test_prepare_batch_gathers_array_embeddings_into_a_matrix(
+        self, chromadb_client
+    ):
+        embedding_models_config = mock.Mock()
+        embedding_models_config.llm_models.items.return_value = []
+        chromadb = ChromaDB(
+            embedding_models_config=embedding_models_config, config=ChromaDbConfig()
+        )
+        batch_features = np.array([[1.0, 2.0], [3.0, 4.0]], dtype=np.float16)
+        clip_model_mock = mock.Mock()
+        clip_model_mock.get_media_encodings.return_value = [
+            {"embedding": batch_features[0:1], "ids": ["id1"]},
+            {"embedding": batch_features[1:2], "ids": ["id2"]},
+        ]
+
+        prepared_batch = chromadb.prepare_batch(
+            ["image1", "image2"],
+            DataSource.LOCAL,
+            ["file1", "file2"],
+            "source",
+            MEDIA_TYPE.IMAGE,
+            clip_model_mock,
+        )
+        chromadb.write_batch(prepared_batch)
+
+        embeddings = prepared_batch["embeddings"]
+        self.assertEqual((embeddings.shape, embeddings.dtype), ((2, 2), np.float16))
+        collection = chromadb_client.return_value.get_or_create_collection.return_value
+        self.assertEqual(
+            collection.add.call_args.kwargs["embeddings"], [[1.0, 2.0], [3.0, 4.0]]
+        )
+
+    @patch("chromadb.Client")
+    def test_text_documents_are_embedded_before_insert(self, chromadb_client):
+        embedding_models_config = mock.Mock()
+        embedding_models_config.llm_models.items.return_value = []
+        text_embedding_model = TextEmbeddingModel()
+        chromadb = ChromaDB(
+            embedding_models_config=embedding_models_config,
+            config=ChromaDbConfig(embedding_function=text_embedding_model),
+        )
+        whisper_model_mock = mock.Mock()
+        whisper_model_mock.get_media_encodings.return_value = [
+            {
+                "documents": ["hello", "world"],
+                "metadata": [{"start": 0, "end": 1}, {"start": 1, "end": 2}],
+                "ids": ["id1", "id2"],
+            }
+        ]
+
+        with patch.object(
+            text_embedding_model,
+            "embed",
+            return_value=np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32),
+        ) as embed:
+            chromadb.add_batch(
+                ["audio.mp3"],
+                DataSource.LOCAL,
+                ["audio.mp3"],
+                "source",
+                MEDIA_TYPE.AUDIO,
+                whisper_model_mock,
+            )
+
+        embed.assert_called_once_with(["hello", "world"])
+        collection = chromadb_client.return_value.get_or_create_collection.return_value
+        add_kwargs = collection.add.call_args.kwargs
+        self.assertEqual(add_kwargs["embeddings"], [[1.0, 0.0], [0.0, 1.0]])
+        self.assertEqual(
+            [metadata["text_embedding_model"] for metadata in add_kwargs["metadatas"]],
+            ["all-MiniLM-L6-v2", "all-MiniLM-L6-v2"],
+        )
+
+    @patch("chromadb.Client")
+    def test_query_rejects_documents_embedded_by_another_text_model(
+        self, chromadb_client
+    ):
+        embedding_models_config = mock.Mock()
+        embedding_models_config.llm_models.items.return_value = []
+        text_embedding_model = TextEmbeddingModel("paraphrase-MiniLM-L3-v2")
+        chromadb = ChromaDB(
+            embedding_models_config=embedding_models_config,
+            config=ChromaDbConfig(embedding_function=text_embedding_model),
+        )
+        collection = chromadb_client.return_value.get_or_create_collection.return_value
+        collection.query.return_value = {
+            "ids": [["id1"]],
+            "documents": [["a red car"]],
+            "metadatas": [[{"text_embedding_model": "all-MiniLM-L6-v2"}]],
+            "distances": [[0.1]],
+        }
+        text_model_mock = mock.Mock()
+        text_model_mock.MODEL_NAME = "captioning"
+        text_model_mock.get_model_version.return_value = "1"
+        text_model_mock.get_text_encoding.return_value = {"text": "a car"}
+
+        with patch.object(
+            text_embedding_model, "embed", return_value=np.ones((1, 2), np.float32)
+        ):
+            with self.assertRaises(ValueError):
+                chromadb.query("a car", 1, MEDIA_TYPE.IMAGE, 0.5, text_model_mock)
+
+    @patch("chromadb.Client")
+    def test_query_fetches_more_hits_while_too_few_documents_are_found(
+        self, chromadb_client
+    ):
+        embedding_models_config = mock.Mock()
+        embedding_models_config.llm_models.items.return_value = []
+        chromadb = ChromaDB(
+            embedding_models_config=embedding_models_config, config=ChromaDbConfig()
+        )
+        clip_model_mock = mock.Mock()
+        clip_model_mock.get_text_encoding.return_value = {"embedding": [1.0, 0.0]}
+        collection = chromadb_client.return_value.get_or_create_collection.return_value
+
+        def query(query_embeddings, n_results):
+            # Every segment of a.mp4 is closer than those of b.mp4
+            document_ids = ["a.mp4"] * 6 + ["b.mp4"] * 2
+            return {
+                "ids": [[str(i) for i in range(n_results)]],
+                "documents": [["segment {}".format(i) for i in range(n_results)]],
+                "metadatas": [
+                    [{"document_id": document_ids[i]} for i in range(n_results)]
+                ],
+                "distances": [[0.1 * i for i in range(n_results)]],
+            }
+
+        collection.query.side_effect = query
+
+        results = chromadb.query(
+            "waves", 2, MEDIA_TYPE.VIDEO, 1.0, clip_model_mock, collapse=True
+        )
+
+        self.assertEqual(
+            [call.kwargs["n_results"] for call in collection.query.call_args_list],
+            [4, 8],
+        )
+        self.assertEqual(
+            [item["document"] for item in results], ["segment 0", "segment 6"]
+        )
+
+        # Every matching segment is returned unless collapsed
+        collection.query.reset_mock()
+        results = chromadb.query("waves", 2, MEDIA_TYPE.VIDEO, 1.0, clip_model_mock)
+
+        collection.query.assert_called_once()
+        self.assertEqual(
+            [item["document"] for item in results], ["segment 0", "segment 1"]
+        )
+
+    @patch("chromadb.Client")
+    def test_query_batch_encodes_and_searches_every_query_at_once(
+        self, chromadb_client
+    ):
+        embedding_models_config = mock.Mock()
+        embedding_models_config.llm_models.items.return_value = []
+        chromadb = ChromaDB(
+            embedding_models_config=embedding_models_config, config=ChromaDbConfig()
+        )
+        clip_model_mock = mock.Mock()
+        clip_model_mock.MODEL_NAME = "clip"
+        clip_model_mock.get_model_version.return_value = "1"
+        clip_model_mock.get_text_encoding.return_value = {"embedding": [1.0, 0.0]}
+        clip_model_mock.get_text_encodings.side_effect = lambda queries: [
+            {"embedding": [float(len(query)), 1.0]} for query in queries
+        ]
+        collection = chromadb_client.return_value.get_or_create_collection.return_value
+        collection.query.side_effect = lambda query_embeddings, n_results: {
+            "ids": [["id"] for _ in query_embeddings],
+            "documents": [
+                ["{:.0f}.jpg".format(embedding[0])] for embedding in query_embeddings
+            ],
+            "metadatas": [[{}] for _ in query_embeddings],
+            "distances": [[0.2] for _ in query_embeddings],
+        }
+        # Cached by a previous query
+        chromadb.query("a cat", 1, MEDIA_TYPE.IMAGE, 1.0, clip_model_mock)
+        collection.query.reset_mock()
+
+        results = chromadb.query_batch(
+            ["a cat", "a horse", "a cat", "an owl"],
+            1,
+            MEDIA_TYPE.IMAGE,
+            1.0,
+            clip_model_mock,
+        )
+
+        clip_model_mock.get_text_encodings.assert_called_once_with(
+            ["a horse", "an owl"]
+        )
+        collection.query.assert_called_once_with(
+            query_embeddings=[[1.0, 0.0], [7.0, 1.0], [1.0, 0.0], [6.0, 1.0]],
+            n_results=2,
+        )
+        self.assertEqual(
+            [[item["document"] for item in media_data] for media_data in results],
+            [["1.jpg"], ["7.jpg"], ["1.jpg"], ["6.jpg"]],
+        )
@@ -0,0 +1,120 @@
+import unittest
+
+import numpy as np
+
+from deepsearchai.vector_databases.postprocessing import (
+    fuse_results,
+    get_scores,
+    postprocess_query_result,
+    select_results,
+)
+
+
+class PostprocessingTest(unittest.TestCase):
+    def test_closest_hits_within_the_threshold_are_selected(self):
+        positions, scores = select_results(
+            [0.6, 0.2, 1.4, None, 0.4, 0.1], distance_threshold=0.5, n_results=2
+        )
+
+        self.assertEqual(positions.tolist(), [5, 1])
+        np.testing.assert_allclose(scores, [0.95, 0.9])
+
+    def test_every_hit_within_the_threshold_is_kept_when_fewer_than_requested(self):
+        positions, _ = select_results([0.3, 0.9, 0.1], 0.5, 10)
+
+        self.assertEqual(positions.tolist(), [2, 0])
+
+    def test_scores_are_normalized_cosine_similarities(self):
+        np.testing.assert_allclose(get_scores(np.array([0.0, 1.0, 2.0])), [1, 0.5, 0])
+
+    def test_query_result_is_turned_into_media_data(self):
+        query_result = {
+            "ids": [["a", "b", "c"]],
+            "documents": [["a.jpg", "b.jpg", "c.jpg"]],
+            "metadatas": [[{"source": "a"}, {"source": "b"}, {"source": "c"}]],
+            "distances": [[0.2, 0.4, 0.9]],
+        }
+
+        media_data = postprocess_query_result(query_result, 0.5, 5)
+
+        self.assertEqual(
+            media_data,
+            [
+                {
+                    "document": "a.jpg",
+                    "metadata": {"source": "a"},
+                    "distance": 0.2,
+                    "score": 0.9,
+                },
+                {
+                    "document": "b.jpg",
+                    "metadata": {"source": "b"},
+                    "distance": 0.4,
+                    "score": 0.8,
+                },
+            ],
+        )
+
+    def test_hits_are_collapsed_to_the_closest_of_every_document(self):
+        query_result = {
+            "documents": [["one", "two", "three", "four"]],
+            "metadatas": [
+                [
+                    {"document_id": "a.mp3"},
+                    {"document_id": "b.mp3"},
+                    {"document_id": "a.mp3"},
+                    {},
+                ]
+            ],
+            "distances": [[0.4, 0.3, 0.1, 0.2]],
+        }
+
+        media_data = postprocess_query_result(query_result, 0.5, 5, collapse=True)
+
+        self.assertEqual(
+            [item["document"] for item in media_data], ["three", "four", "two"]
+        )
+
+    def test_empty_query_result(self):
+        self.assertEqual(postprocess_query_result({"ids": [], "distances": []}, 1, 5), [])
+        self.assertEqual(
+            postprocess_query_result({"ids": [[]], "distances": [[]]}, 1, 5), []
+        )
+
+
+def hit(document_id, score, segment=None):
+    return {
+        "document": segment if segment else document_id,
+        "metadata": {"document_id": document_id},
+        "score": score,
+    }
+
+
+class FuseResultsTest(unittest.TestCase):
+    def test_documents_found_by_several_collections_rank_first(self):
+        clip = [hit("a.jpg", 0.62), hit("b.jpg", 0.61), hit("c.jpg", 0.6)]
+        captions = [hit("c.jpg", 0.9), hit("d.jpg", 0.8)]
+
+        fused = fuse_results([clip, captions], n_results=3)
+
+        self.assertEqual(
+            [item["metadata"]["document_id"] for item in fused],
+            ["c.jpg", "a.jpg", "b.jpg"],
+        )
+        self.assertAlmostEqual(fused[0]["fused_score"], 1 / 63 + 1 / 61)
+        # The caption ranked c.jpg first, so its hit represents the document
+        self.assertEqual(fused[0]["score"], 0.9)
+
+    def test_hits_are_collapsed_to_the_best_segment_of_every_document(self):
+        transcripts = [
+            hit("a.mp4", 0.9, "best segment"),
+            hit("b.mp4", 0.8),
+            hit("a.mp4", 0.7, "other segment"),
+        ]
+
+        fused = fuse_results([transcripts], n_results=5)
+
+        self.assertEqual(
+            [item["document"] for item in fused], ["best segment", "b.mp4"]
+        )
+        self.assertEqual([item["fused_score"] for item in fused], [1 / 61, 1 / 62])
@@ -5,11 +5,32 @@ from typing_extensions import TypedDict
 from deepsearchai.enums import MEDIA_TYPE
 
 
-class MediaData(TypedDict):
+class MediaData(TypedDict, total=False):
     document: str
     metadata: Optional[Dict[str, str]]
+    # Cosine distance between the query and the record, between 0 and 2
+    distance: float
+    # Similarity of the record to the query, between 0 and 1, 1 being an exact match
+    score: float
+    # Reciprocal rank fusion score of the document across the collections it was found in
+    fused_score: float
 
 
 class QueryResult(TypedDict):
     llm_response: str
     documents: Optional[Dict[MEDIA_TYPE, List[MediaData]]]
+
+
+class QueryBranchTiming(TypedDict):
+    media_type: MEDIA_TYPE
+    # MODEL_NAME of the embedding model whose collection was searched
+    model: str
+    # Seconds spent encoding the query and searching the collection
+    seconds: float
+
+
+# Filled in by the queries it is passed to, starts empty
+class QueryTimings(TypedDict, total=False):
+    # Seconds from the start of the query to the last branch finishing
+    total_seconds: float
+    branches: List[QueryBranchTiming]
@@ -1,10 +1,74 @@
+import hashlib
 import mimetypes
+import os
+from typing import Any
+
+import numpy as np
 
 from deepsearchai.enums import MEDIA_TYPE
 
+# Precisions embeddings are kept in between the models and the vector database
+EMBEDDING_DTYPES = ["float32", "float16"]
+
 
 def get_mime_type(filename: str) -> MEDIA_TYPE:
     mime_type, encoding = mimetypes.guess_type(filename)
     if not mime_type or mime_type.split("/")[0].upper() not in MEDIA_TYPE.__members__:
         return MEDIA_TYPE.UNKNOWN
     return MEDIA_TYPE[mime_type.split("/")[0].upper()]
+
+
+def get_file_hash(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    """Returns the sha256 hex digest of a file's content, read in chunks to bound memory use."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def get_media_hash(data: Any) -> str:
+    """Returns the sha256 hex digest identifying the content of the supplied media.
+
+    Args:
+      data: A file path, raw bytes, or a decoded PIL image. Images loaded from raw bytes can carry the
+        digest of those bytes in `image.info["content_hash"]`, images opened from a path are hashed
+        through their file, and any other image is hashed through its decoded pixels.
+
+    Returns:
+      The hex digest.
+    """
+    if isinstance(data, str):
+        return get_file_hash(data)
+    if isinstance(data, (bytes, bytearray, memoryview)):
+        return hashlib.sha256(data).hexdigest()
+    info = getattr(data, "info", None)
+    if isinstance(info, dict) and info.get("content_hash"):
+        return info["content_hash"]
+    filename = getattr(data, "filename", None)
+    if isinstance(filename, str) and filename and os.path.isfile(filename):
+        return get_file_hash(filename)
+    if hasattr(data, "tobytes"):
+        digest = hashlib.sha256()
+        digest.update("{}:{}:".format(data.mode, data.size).encode())
+        digest.update(data.tobytes())
+        return digest.hexdigest()
+    raise ValueError("Cannot compute a content hash for {}".format(type(data)))
+
+
+def get_embedding_matrix(embeddings: Any) -> np.ndarray:
+    """Returns embeddings as a contiguous 2-D array with one row per vector.
+
+    Args:
+      embeddings: A single vector, or a sequence of vectors, as NumPy arrays or lists of floats.
+        float32 and float16 arrays which are already contiguous are returned without being copied.
+
+    Returns:
+      The float32 or float16 matrix.
+    """
+    matrix = np.asarray(embeddings)
+    if matrix.dtype not in (np.float32, np.float16):
+        matrix = matrix.astype(np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[np.newaxis]
+    return np.ascontiguousarray(matrix)
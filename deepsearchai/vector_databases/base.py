@@ -1,17 +1,27 @@
 import copy
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 
+from deepsearchai.caches.artifact_store import ArtifactStore
+from deepsearchai.caches.query_cache import QueryEmbeddingCache
 from deepsearchai.embedding_models.base import BaseEmbeddingModel
 from deepsearchai.enums import MEDIA_TYPE
+from deepsearchai.executors import QUERY_EXECUTOR, run_in_executor
 from deepsearchai.sources.data_source import DataSource
 from deepsearchai.types import MediaData
+from deepsearchai.utils import get_media_hash
 from .configs.base import BaseVectorDatabaseConfig
 
 
 class BaseVectorDatabase:
-    def __init__(self, config: BaseVectorDatabaseConfig):
+    def __init__(
+        self,
+        config: BaseVectorDatabaseConfig,
+        artifact_store: Optional[ArtifactStore] = None,
+        query_cache: Optional[QueryEmbeddingCache] = None,
+    ):
         self.config = config
-        pass
+        self.artifact_store = artifact_store
+        self.query_cache = query_cache if query_cache else QueryEmbeddingCache()
 
     def add(
         self,
@@ -24,6 +34,42 @@ class BaseVectorDatabase:
     ):
         raise NotImplementedError
 
+    def add_batch(
+        self,
+        data: List[Any],
+        datasource: DataSource,
+        files: List[str],
+        source: str,
+        media_type: MEDIA_TYPE,
+        embedding_model: BaseEmbeddingModel,
+    ):
+        """
+        Batch variant of `add`, `data[i]` holds the decoded media of `files[i]`.
+        """
+        for item, file in zip(data, files):
+            self.add(item, datasource, file, source, media_type, embedding_model)
+
+    def prepare_batch(
+        self,
+        data: List[Any],
+        datasource: DataSource,
+        files: List[str],
+        source: str,
+        media_type: MEDIA_TYPE,
+        embedding_model: BaseEmbeddingModel,
+    ) -> Any:
+        """
+        First half of `add_batch`, runs the embedding model and returns whatever `write_batch` needs
+        to store the result. Splitting the two lets ingestion overlap encoding with database writes.
+        """
+        return data, datasource, files, source, media_type, embedding_model
+
+    def write_batch(self, prepared_batch: Any):
+        """
+        Second half of `add_batch`, stores a batch returned by `prepare_batch`.
+        """
+        self.add_batch(*prepared_batch)
+
     def query(
         self,
         query: str,
@@ -31,14 +77,130 @@ class BaseVectorDatabase:
         media_type: MEDIA_TYPE,
         distance_threshold: float,
         embedding_model: BaseEmbeddingModel,
+        collapse: bool = False,
     ) -> List[MediaData]:
+        """
+        Returns the `n_results` closest records of the collection of `embedding_model`, whose cosine
+        distance to the query is at most `distance_threshold`, from the closest.
+
+        :param collapse: Whether only the closest record of every document is returned, e.g. the best
+            matching segment of a transcript, defaults to False which returns every matching record
+        """
         raise NotImplementedError
 
+    def query_batch(
+        self,
+        queries: List[str],
+        n_results: int,
+        media_type: MEDIA_TYPE,
+        distance_threshold: float,
+        embedding_model: BaseEmbeddingModel,
+        collapse: bool = False,
+    ) -> List[List[MediaData]]:
+        """
+        Batch variant of `query`, returns the results of every query, in order.
+
+        Databases which can search several queries in a single call should override this.
+        """
+        return [
+            self.query(
+                query,
+                n_results,
+                media_type,
+                distance_threshold,
+                embedding_model,
+                collapse=collapse,
+            )
+            for query in queries
+        ]
+
+    async def aquery(
+        self,
+        query: str,
+        n_results: int,
+        media_type: MEDIA_TYPE,
+        distance_threshold: float,
+        embedding_model: BaseEmbeddingModel,
+        collapse: bool = False,
+    ) -> List[MediaData]:
+        """
+        Asyncio variant of `query`. Databases with an asyncio client should override it, by default `query`
+        runs in a bounded pool of threads, which also encodes the query.
+        """
+        return await run_in_executor(
+            QUERY_EXECUTOR,
+            self.query,
+            query,
+            n_results,
+            media_type,
+            distance_threshold,
+            embedding_model,
+            collapse=collapse,
+        )
+
     def get_existing_document_ids(
         self, document_ids: List[str], collection_name: str
     ) -> List[str]:
         raise NotImplementedError
 
+    def delete(self, where: Dict[str, Any], media_type: Optional[MEDIA_TYPE] = None):
+        raise NotImplementedError
+
+    def _get_media_encoding(
+        self,
+        data: Any,
+        datasource: DataSource,
+        media_type: MEDIA_TYPE,
+        embedding_model: BaseEmbeddingModel,
+    ) -> Dict[str, Any]:
+        """Runs `embedding_model.get_media_encoding`, unless the artifact store has its output already."""
+        if not self.artifact_store:
+            return embedding_model.get_media_encoding(data, media_type, datasource)
+        return self._get_media_encodings(
+            [data], datasource, media_type, embedding_model
+        )[0]
+
+    def _get_media_encodings(
+        self,
+        data: List[Any],
+        datasource: DataSource,
+        media_type: MEDIA_TYPE,
+        embedding_model: BaseEmbeddingModel,
+    ) -> List[Dict[str, Any]]:
+        """
+        Runs `embedding_model.get_media_encodings` over the media missing from the artifact store,
+        and stores the new outputs.
+        """
+        if not self.artifact_store:
+            return embedding_model.get_media_encodings(data, media_type, datasource)
+
+        model_name = embedding_model.MODEL_NAME
+        model_version = embedding_model.get_model_version()
+        content_hashes = [get_media_hash(item) for item in data]
+        encodings = [
+            self.artifact_store.get(content_hash, model_name, model_version)
+            for content_hash in content_hashes
+        ]
+        # Copies of the same media within the batch are only encoded once
+        missing: Dict[str, List[int]] = {}
+        for i, (content_hash, encoding) in enumerate(zip(content_hashes, encodings)):
+            if encoding is None:
+                missing.setdefault(content_hash, []).append(i)
+        if not missing:
+            return encodings
+
+        new_encodings = embedding_model.get_media_encodings(
+            [data[indexes[0]] for indexes in missing.values()], media_type, datasource
+        )
+        for (content_hash, indexes), encoding in zip(missing.items(), new_encodings):
+            self.artifact_store.put(content_hash, model_name, model_version, encoding)
+            encodings[indexes[0]] = encoding
+            for i in indexes[1:]:
+                encodings[i] = self.artifact_store.get(
+                    content_hash, model_name, model_version
+                )
+        return encodings
+
     def _construct_metadata(
         self, metadata: List[Dict[str, Any]], source: str, document_id: str, len: int
     ):
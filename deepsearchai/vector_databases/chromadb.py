@@ -1,16 +1,23 @@
 from typing import Any, Dict, List, Optional
 
+import numpy as np
+
+from deepsearchai.caches.artifact_store import ArtifactStore
+from deepsearchai.caches.query_cache import QueryEmbeddingCache
 from deepsearchai.embedding_models.base import BaseEmbeddingModel
+from deepsearchai.embedding_models.text_embedding import TextEmbeddingModel
 from deepsearchai.embedding_models_config import EmbeddingModelsConfig
 from deepsearchai.enums import MEDIA_TYPE
 from deepsearchai.sources.data_source import DataSource
 from deepsearchai.types import MediaData
+from deepsearchai.utils import get_embedding_matrix
 from .base import BaseVectorDatabase
 from .configs.chromadb import ChromaDbConfig
+from .postprocessing import postprocess_query_result
 
 try:
     import chromadb
-    from chromadb import Collection, QueryResult
+    from chromadb import Collection
     from chromadb.config import Settings
     from chromadb.errors import InvalidDimensionException
 
@@ -22,16 +29,30 @@ class ChromaDB(BaseVectorDatabase):
     """Vector database using ChromaDB."""
 
     BATCH_SIZE = 100
+    # Metadata of the records whose documents were embedded by the text embedding function
+    TEXT_EMBEDDING_KEY = "text_embedding_model"
+    # Number of hits fetched per result requested, and the most fetched for a single query
+    OVERFETCH_FACTOR = 2
+    MAX_FETCHED_RESULTS = 1000
 
     def __init__(
         self,
-        embedding_models_config: EmbeddingModelsConfig = EmbeddingModelsConfig(),
+        embedding_models_config: Optional[EmbeddingModelsConfig] = None,
         config: Optional[ChromaDbConfig] = None,
+        artifact_store: Optional[ArtifactStore] = None,
+        query_cache: Optional[QueryEmbeddingCache] = None,
     ):
         """Initialize a new ChromaDB instance
 
+        :param embedding_models_config: Embedding models of the collections, defaults to None which
+            uses the default `EmbeddingModelsConfig`
+        :type embedding_models_config: Optional[EmbeddingModelsConfig], optional
         :param config: Configuration options for Chroma, defaults to None
         :type config: Optional[ChromaDbConfig], optional
+        :param artifact_store: Cache of model outputs, consulted before encoding any media, defaults to None
+        :type artifact_store: Optional[ArtifactStore], optional
+        :param query_cache: Cache of query embeddings, defaults to None which caches them in memory only
+        :type query_cache: Optional[QueryEmbeddingCache], optional
         """
         if config:
             self.config = config
@@ -39,9 +60,15 @@ class ChromaDB(BaseVectorDatabase):
             self.config = ChromaDbConfig()
 
         self.client = chromadb.Client(self.config.settings)
-        self.embedding_models_config = embedding_models_config
+        self.embedding_models_config = (
+            embedding_models_config
+            if embedding_models_config
+            else EmbeddingModelsConfig()
+        )
         self._set_all_collections()
-        super().__init__(config=self.config)
+        super().__init__(
+            config=self.config, artifact_store=artifact_store, query_cache=query_cache
+        )
 
     def add(
         self,
@@ -52,48 +79,91 @@ class ChromaDB(BaseVectorDatabase):
         media_type: MEDIA_TYPE,
         embedding_model: BaseEmbeddingModel,
     ):
-        encodings_json = embedding_model.get_media_encoding(
-            data, media_type, datasource
+        encodings_json = self._get_media_encoding(
+            data, datasource, media_type, embedding_model
         )
-        embeddings = encodings_json.get("embedding", None)
-        documents = (
-            [file]
-            if not encodings_json.get("documents")
-            else encodings_json.get("documents")
+        embeddings, documents, metadata, ids = self._get_records(
+            encodings_json, file, source
         )
-        metadata = self._construct_metadata(
-            encodings_json.get("metadata", None), source, file, len(documents)
-        )
-        ids = encodings_json.get("ids", [])
-        size = len(documents)
-        if embeddings is not None and len(embeddings) != size:
-            raise ValueError(
-                "Cannot add documents to chromadb with inconsistent embeddings"
-            )
         collection = self._get_or_create_collection(
             embedding_model.get_collection_name(media_type)
         )
-        # embedding would be created by the llm model used
-        for i in range(0, len(documents), self.BATCH_SIZE):
-            print(
-                "Inserting batches from {} to {} in chromadb".format(
-                    i, min(len(documents), i + self.BATCH_SIZE)
-                )
+        self._insert(collection, embeddings, documents, ids, metadata)
+
+    def add_batch(
+        self,
+        data: List[Any],
+        datasource: DataSource,
+        files: List[str],
+        source: str,
+        media_type: MEDIA_TYPE,
+        embedding_model: BaseEmbeddingModel,
+    ):
+        """
+        Encodes all the supplied media with a single batched model call, and inserts the
+        resulting records together.
+        """
+        self.write_batch(
+            self.prepare_batch(
+                data, datasource, files, source, media_type, embedding_model
             )
-            if embeddings is not None:
-                collection.add(
-                    embeddings=embeddings[i : i + self.BATCH_SIZE],
-                    documents=documents[i : i + self.BATCH_SIZE],
-                    ids=ids[i : i + self.BATCH_SIZE],
-                    metadatas=metadata[i : i + self.BATCH_SIZE],
-                )
+        )
 
-            else:
-                collection.add(
-                    documents=documents[i : i + self.BATCH_SIZE],
-                    ids=ids[i : i + self.BATCH_SIZE],
-                    metadatas=metadata[i : i + self.BATCH_SIZE],
-                )
+    def prepare_batch(
+        self,
+        data: List[Any],
+        datasource: DataSource,
+        files: List[str],
+        source: str,
+        media_type: MEDIA_TYPE,
+        embedding_model: BaseEmbeddingModel,
+    ) -> Dict[str, Any]:
+        if len(data) != len(files):
+            raise ValueError("Every supplied media item should have a matching file")
+        all_encodings = self._get_media_encodings(
+            data, datasource, media_type, embedding_model
+        )
+        embeddings, documents, metadata, ids = [], [], [], []
+        for encodings_json, file in zip(all_encodings, files):
+            (
+                file_embeddings,
+                file_documents,
+                file_metadata,
+                file_ids,
+            ) = self._get_records(encodings_json, file, source)
+            if file_embeddings is not None:
+                embeddings.append(file_embeddings)
+            documents.extend(file_documents)
+            metadata.extend(file_metadata)
+            ids.extend(file_ids)
+        # The vectors of the whole batch are gathered into a single matrix
+        embeddings = np.concatenate(embeddings) if embeddings else None
+        if embeddings is not None and len(embeddings) != len(documents):
+            raise ValueError(
+                "Cannot add documents to chromadb with inconsistent embeddings"
+            )
+        return {
+            "collection_name": embedding_model.get_collection_name(media_type),
+            "embeddings": embeddings,
+            "documents": documents,
+            "ids": ids,
+            "metadata": metadata,
+            # A batch holds at least one record per file, so size the insert to write it in one call
+            "batch_size": max(self.BATCH_SIZE, len(files)),
+        }
+
+    def write_batch(self, prepared_batch: Dict[str, Any]):
+        if not prepared_batch["documents"]:
+            return
+        collection = self._get_or_create_collection(prepared_batch["collection_name"])
+        self._insert(
+            collection,
+            prepared_batch["embeddings"],
+            prepared_batch["documents"],
+            prepared_batch["ids"],
+            prepared_batch["metadata"],
+            prepared_batch["batch_size"],
+        )
 
     def query(
         self,
@@ -102,100 +172,168 @@ class ChromaDB(BaseVectorDatabase):
         media_type: MEDIA_TYPE,
         distance_threshold: float,
         embedding_model: BaseEmbeddingModel,
+        collapse: bool = False,
     ) -> List[MediaData]:
-        response = embedding_model.get_text_encoding(query)
-        input_embeddings = response.get("embedding", None)
-        input_query = response.get("text", None)
-        if input_embeddings:
-            query_params = {
-                "query_embeddings": [input_embeddings],
-                "n_results": n_results,
-            }
-        else:
-            query_params = {"query_texts": [input_query], "n_results": n_results}
+        """
+        Returns the `n_results` closest records of the collection of `embedding_model`, whose cosine
+        distance to the query is at most `distance_threshold`, from the closest.
 
-        media_data = []
+        :param collapse: Whether only the closest record of every document is returned, e.g. the best
+            matching segment of a transcript, defaults to False which returns every matching record
+        """
+        collection = self._get_or_create_collection(
+            embedding_model.get_collection_name(media_type)
+        )
+        query_embeddings = self._get_query_embedding(query, embedding_model)[np.newaxis]
+        return self._search(
+            collection, query_embeddings, n_results, distance_threshold, collapse
+        )[0]
 
+    def query_batch(
+        self,
+        queries: List[str],
+        n_results: int,
+        media_type: MEDIA_TYPE,
+        distance_threshold: float,
+        embedding_model: BaseEmbeddingModel,
+        collapse: bool = False,
+    ) -> List[List[MediaData]]:
+        """
+        Batch variant of `query`. Queries missing from the query cache are encoded together, and the
+        collection is searched for all of them in a single call.
+        """
+        if not queries:
+            return []
         collection = self._get_or_create_collection(
             embedding_model.get_collection_name(media_type)
         )
-        try:
-            results = collection.query(**query_params)
-        except InvalidDimensionException as e:
-            raise InvalidDimensionException(
-                e.message()
-                + ". This is commonly a side-effect when an embedding function, different from the one used to"
-                " add the embeddings, is used to retrieve an embedding from the database."
-            ) from None
-        filtered_results = self.filter_query_result_by_distance(
-            results, distance_threshold
+        query_embeddings = self._get_query_embeddings(queries, embedding_model)
+        return self._search(
+            collection, query_embeddings, n_results, distance_threshold, collapse
         )
-        if len(filtered_results.get("documents", [])) == 0:
-            return media_data
-
-        documents = filtered_results.get("documents")[0]
-        metadatas = filtered_results.get("metadatas")[0]
-        distances = filtered_results.get("distances")[0]
-        for document, metadata, distance in zip(documents, metadatas, distances):
-            media_data.append({"document": document, "metadata": metadata, "distance": distance})
+
+    def _search(
+        self,
+        collection: Collection,
+        query_embeddings: np.ndarray,
+        n_results: int,
+        distance_threshold: float,
+        collapse: bool,
+    ) -> List[List[MediaData]]:
+        """Searches a collection for every row of `query_embeddings`, and post-processes the hits."""
+        media_data: List[List[MediaData]] = [[] for _ in range(len(query_embeddings))]
+        # Over-fetched, so that enough hits remain once post-processed, and fetched again with a larger
+        # window for the queries which may have more of the collection within the threshold
+        pending = list(range(len(query_embeddings)))
+        n_fetched = n_results * self.OVERFETCH_FACTOR
+        while pending:
+            try:
+                results = collection.query(
+                    # chromadb only accepts lists of floats
+                    query_embeddings=query_embeddings[pending].tolist(),
+                    n_results=n_fetched,
+                )
+            except InvalidDimensionException as e:
+                raise InvalidDimensionException(
+                    e.message()
+                    + ". This is commonly a side-effect when an embedding function, different from the one used to"
+                    " add the embeddings, is used to retrieve an embedding from the database."
+                ) from None
+            unfinished = []
+            for row, i in enumerate(pending):
+                query_result = self._get_query_result_row(results, row)
+                media_data[i] = postprocess_query_result(
+                    query_result, distance_threshold, n_results, collapse
+                )
+                returned_distances = query_result.get("distances", [[]])[0] or []
+                if not (
+                    len(media_data[i]) >= n_results
+                    or len(returned_distances) < n_fetched
+                    or n_fetched >= self.MAX_FETCHED_RESULTS
+                    # Hits come from the closest, those further away are beyond the threshold as well
+                    or returned_distances[-1] > distance_threshold
+                ):
+                    unfinished.append(i)
+            pending = unfinished
+            n_fetched = min(n_fetched * 2, self.MAX_FETCHED_RESULTS)
+        for query_media_data in media_data:
+            self._check_text_embedding([item["metadata"] for item in query_media_data])
         return media_data
 
-    def filter_query_result_by_distance(
-        self, query_result: QueryResult, distance_threshold: float
-    ) -> QueryResult:
-        filtered_result: QueryResult = {
-            "ids": [],
-            "embeddings": [],
-            "documents": [],
-            "metadatas": [],
-            "distances": [],
-        }
+    @staticmethod
+    def _get_query_result_row(results: Dict[str, Any], row: int) -> Dict[str, Any]:
+        """Returns the hits of a single query of a multi-query result, as a result of its own."""
+        query_result = {}
+        for key in ["documents", "metadatas", "distances"]:
+            values = results.get(key)
+            if values and row < len(values):
+                query_result[key] = [values[row]]
+        return query_result
+
+    def _get_query_embedding(
+        self, query: str, embedding_model: BaseEmbeddingModel
+    ) -> np.ndarray:
+        """Returns the embedding of a query for the collections of `embedding_model`, through the query cache."""
+
+        def encode():
+            response = embedding_model.get_text_encoding(query)
+            return self._get_embedding_matrix([response])[0]
+
+        return self.query_cache.get_or_compute(
+            self._get_query_cache_model(embedding_model), query, encode
+        )
 
-        for i, ids in enumerate(query_result["ids"]):
-            filtered_subresult = {
-                "ids": [],
-                "embeddings": [],
-                "documents": [],
-                "metadatas": [],
-                "distances": [],
+    def _get_query_embeddings(
+        self, queries: List[str], embedding_model: BaseEmbeddingModel
+    ) -> np.ndarray:
+        """Batch variant of `_get_query_embedding`, encoding the queries missing from the cache together."""
+        model = self._get_query_cache_model(embedding_model)
+        embeddings = [self.query_cache.get(model, query) for query in queries]
+        # Duplicated queries are only encoded once
+        missing = list(
+            dict.fromkeys(
+                query
+                for query, embedding in zip(queries, embeddings)
+                if embedding is None
+            )
+        )
+        if missing:
+            encoded = self._get_embedding_matrix(
+                embedding_model.get_text_encodings(missing)
+            )
+            computed = {
+                query: self.query_cache.put(model, query, embedding)
+                for query, embedding in zip(missing, encoded)
             }
-            if query_result["distances"][i] is None:
-                continue
-
-            for j, distance in enumerate(query_result["distances"][i]):
-                if distance >= distance_threshold:
-                    filtered_subresult["ids"].append(query_result["ids"][i][j])
-
-                    if "embeddings" in query_result and query_result["embeddings"]:
-                        embeddings = query_result["embeddings"][i]
-                        filtered_subresult["embeddings"].append(embeddings[j])
-
-                    if "documents" in query_result and query_result["documents"]:
-                        documents = query_result["documents"][i]
-                        filtered_subresult["documents"].append(documents[j])
-
-                    if "metadatas" in query_result and query_result["metadatas"]:
-                        metadatas = query_result["metadatas"][i]
-                        filtered_subresult["metadatas"].append(metadatas[j])
-
-                    filtered_subresult["distances"].append(distance)
-
-            if filtered_subresult["ids"]:
-                filtered_result["ids"].append(filtered_subresult["ids"])
-                filtered_result["distances"].append(filtered_subresult["distances"])
-
-                if filtered_subresult["embeddings"]:
-                    filtered_result["embeddings"].append(
-                        filtered_subresult["embeddings"]
-                    )
-
-                if filtered_subresult["documents"]:
-                    filtered_result["documents"].append(filtered_subresult["documents"])
-
-                if filtered_subresult["metadatas"]:
-                    filtered_result["metadatas"].append(filtered_subresult["metadatas"])
-
-        return filtered_result
+            embeddings = [
+                computed[query] if embedding is None else embedding
+                for query, embedding in zip(queries, embeddings)
+            ]
+        return np.stack(embeddings)
+
+    def _get_embedding_matrix(self, responses: List[Dict[str, Any]]) -> np.ndarray:
+        """Gathers the embeddings of text encodings into a matrix with one row per encoding."""
+        embeddings: List[Any] = [response.get("embedding") for response in responses]
+        # Models storing text, e.g. captions or transcripts, are searched with the embedding function
+        texts = [
+            response.get("text", None)
+            for response, embedding in zip(responses, embeddings)
+            if embedding is None
+        ]
+        if texts:
+            text_embeddings = iter(self._embed_documents(texts))
+            embeddings = [
+                next(text_embeddings) if embedding is None else embedding
+                for embedding in embeddings
+            ]
+        return np.stack([get_embedding_matrix(embedding)[0] for embedding in embeddings])
+
+    def _get_query_cache_model(self, embedding_model: BaseEmbeddingModel) -> str:
+        return "{}/{}/{}".format(
+            embedding_model.MODEL_NAME,
+            embedding_model.get_model_version(),
+            self._get_text_embedding_name(),
+        )
 
     def get_existing_document_ids(
         self, metadata_filters, collection_name: str
@@ -259,6 +397,94 @@ class ChromaDB(BaseVectorDatabase):
                     ) from None
         self._set_all_collections()
 
+    def _get_records(self, encodings_json: Dict[str, Any], file: str, source: str):
+        if "ids" in encodings_json and not encodings_json["ids"]:
+            # The model found nothing to index in the file, e.g. a video without any frame
+            return None, [], [], []
+        embeddings = encodings_json.get("embedding", None)
+        if embeddings is not None:
+            embeddings = get_embedding_matrix(embeddings)
+        documents = (
+            [file]
+            if not encodings_json.get("documents")
+            else encodings_json.get("documents")
+        )
+        metadata = self._construct_metadata(
+            encodings_json.get("metadata", None), source, file, len(documents)
+        )
+        ids = encodings_json.get("ids", [])
+        if embeddings is None:
+            # Transcripts and captions are embedded here, rather than by chromadb on insert
+            embeddings = self._embed_documents(documents)
+            for record_metadata in metadata:
+                record_metadata[self.TEXT_EMBEDDING_KEY] = self._get_text_embedding_name()
+        if embeddings is not None and len(embeddings) != len(documents):
+            raise ValueError(
+                "Cannot add documents to chromadb with inconsistent embeddings"
+            )
+        return embeddings, documents, metadata, ids
+
+    def _embed_documents(self, documents: List[str]) -> np.ndarray:
+        embedding_function = self.config.embedding_function
+        if isinstance(embedding_function, TextEmbeddingModel):
+            return embedding_function.embed(documents)
+        embeddings = []
+        for i in range(0, len(documents), self.BATCH_SIZE):
+            embeddings.extend(embedding_function(documents[i : i + self.BATCH_SIZE]))
+        return get_embedding_matrix(embeddings)
+
+    def _get_text_embedding_name(self) -> str:
+        embedding_function = self.config.embedding_function
+        if isinstance(embedding_function, TextEmbeddingModel):
+            return embedding_function.get_model_version()
+        return type(embedding_function).__name__
+
+    def _check_text_embedding(self, metadatas: List[Dict[str, Any]]):
+        """Raises if documents were embedded by another text model than the one embedding queries."""
+        text_embedding_name = self._get_text_embedding_name()
+        for metadata in metadatas:
+            stored_name = (metadata or {}).get(self.TEXT_EMBEDDING_KEY)
+            if stored_name is not None and stored_name != text_embedding_name:
+                raise ValueError(
+                    "Documents were embedded with {}, but queries are embedded with {}. Use the same "
+                    "embedding function, or re-index the documents.".format(
+                        stored_name, text_embedding_name
+                    )
+                )
+
+    def _insert(
+        self,
+        collection: Collection,
+        embeddings: Optional[np.ndarray],
+        documents: List[str],
+        ids: List[str],
+        metadata: List[Dict[str, Any]],
+        batch_size: Optional[int] = None,
+    ):
+        batch_size = batch_size if batch_size else self.BATCH_SIZE
+        # embedding would be created by the llm model used
+        for i in range(0, len(documents), batch_size):
+            print(
+                "Inserting batches from {} to {} in chromadb".format(
+                    i, min(len(documents), i + batch_size)
+                )
+            )
+            if embeddings is not None:
+                collection.add(
+                    # Converted to the lists of floats chromadb expects one insert at a time
+                    embeddings=embeddings[i : i + batch_size].tolist(),
+                    documents=documents[i : i + batch_size],
+                    ids=ids[i : i + batch_size],
+                    metadatas=metadata[i : i + batch_size],
+                )
+
+            else:
+                collection.add(
+                    documents=documents[i : i + batch_size],
+                    ids=ids[i : i + batch_size],
+                    metadatas=metadata[i : i + batch_size],
+                )
+
     def _get_or_create_collection(
         self,
         collection_name: str,
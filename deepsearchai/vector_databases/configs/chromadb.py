@@ -1,14 +1,13 @@
 import logging
 from typing import Optional
 
+from deepsearchai.embedding_models.text_embedding import TextEmbeddingModel
 from .base import BaseVectorDatabaseConfig, EmbeddingFunction
 
 try:
     import chromadb
     from chromadb.config import Settings
     from chromadb.errors import InvalidDimensionException
-    from chromadb.utils.embedding_functions import \
-        SentenceTransformerEmbeddingFunction
 
 except RuntimeError:
     pass
@@ -37,12 +36,15 @@ class ChromaDbConfig(BaseVectorDatabaseConfig):
         :type allow_reset: bool
         :param chroma_settings: Chroma settings dict, defaults to None
         :type chroma_settings: Optional[dict], optional
+        :param embedding_function: Embeds the documents of transcription and captioning models, and the
+            queries searching them, defaults to None which uses `TextEmbeddingModel()`
+        :type embedding_function: Optional[EmbeddingFunction], optional
         """
 
         self.settings = Settings()
         self.settings.allow_reset = allow_reset
         self.embedding_function = (
-            SentenceTransformerEmbeddingFunction()
+            TextEmbeddingModel()
             if not embedding_function
             else embedding_function
         )
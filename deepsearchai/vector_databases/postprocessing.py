@@ -0,0 +1,134 @@
+import heapq
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from deepsearchai.types import MediaData
+
+# Smoothing constant of reciprocal rank fusion, the value of the original paper. Larger values flatten the
+# difference between the first ranks
+RRF_K = 60
+
+
+def get_scores(distances: np.ndarray) -> np.ndarray:
+    """Converts cosine distances, between 0 and 2, to scores between 0 and 1, 1 being an exact match."""
+    return np.clip(1.0 - distances / 2.0, 0.0, 1.0)
+
+
+def select_results(
+    distances: Sequence[Optional[float]],
+    distance_threshold: float,
+    n_results: int,
+    keys: Optional[Sequence[Optional[str]]] = None,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Selects the `n_results` closest hits whose cosine distance is at most `distance_threshold`.
+
+    Returns their positions in `distances`, from the closest, along with their scores. Hits are
+    thresholded and ranked in a single pass over the array, whatever order they come in. When `keys` are
+    supplied, only the closest hit of every key is selected, hits without a key are all kept.
+    """
+    # Missing distances become NaN, which fails the threshold
+    distances = np.asarray(
+        [np.nan if distance is None else distance for distance in distances],
+        dtype=np.float64,
+    )
+    candidates = np.flatnonzero(distances <= distance_threshold)
+    if keys is not None:
+        candidates = candidates[np.argsort(distances[candidates], kind="stable")]
+        candidate_keys = np.array(
+            [
+                "\0{}".format(position) if keys[position] is None else keys[position]
+                for position in candidates.tolist()
+            ],
+            dtype=object,
+        )
+        # First, i.e. closest, occurrence of every key, back in the order of the distances
+        _, first = np.unique(candidate_keys, return_index=True)
+        positions = candidates[np.sort(first)][:n_results]
+        return positions, get_scores(distances[positions])
+    if n_results < len(candidates):
+        # Partial selection, only the kept hits are sorted
+        closest = np.argpartition(distances[candidates], n_results - 1)[:n_results]
+        candidates = candidates[closest]
+    positions = candidates[np.argsort(distances[candidates], kind="stable")]
+    return positions, get_scores(distances[positions])
+
+
+def postprocess_query_result(
+    query_result: Dict[str, Any],
+    distance_threshold: float,
+    n_results: int,
+    collapse: bool = False,
+) -> List[MediaData]:
+    """
+    Turns the hits of the first query of a ChromaDB query result into media data, keeping the
+    `n_results` closest ones whose cosine distance is at most `distance_threshold`.
+
+    :param collapse: Whether only the closest hit of every document is kept, e.g. the best matching
+        segment of a transcript, defaults to False
+    """
+    distances = (query_result.get("distances") or [None])[0]
+    if not distances or n_results < 1:
+        return []
+    documents = (query_result.get("documents") or [None])[0]
+    metadatas = (query_result.get("metadatas") or [None])[0]
+    keys = None
+    if collapse and metadatas:
+        keys = [(metadata or {}).get("document_id") for metadata in metadatas]
+    positions, scores = select_results(distances, distance_threshold, n_results, keys)
+    return [
+        {
+            "document": documents[position] if documents else None,
+            "metadata": metadatas[position] if metadatas else None,
+            "distance": distances[position],
+            "score": float(score),
+        }
+        for position, score in zip(positions.tolist(), scores)
+    ]
+
+
+def get_document_id(media_data: MediaData) -> str:
+    """Returns the id of the document a hit belongs to, e.g. the file of a transcript segment."""
+    metadata = media_data.get("metadata") or {}
+    return metadata.get("document_id") or media_data.get("document")
+
+
+def fuse_results(
+    result_lists: Sequence[List[MediaData]], n_results: int, rrf_k: int = RRF_K
+) -> List[MediaData]:
+    """
+    Merges the hits of several collections into a single list of the `n_results` best documents, with
+    reciprocal rank fusion.
+
+    Distances of different models cannot be compared, e.g. CLIP's and those of the text embeddings of
+    captions, so every document is scored by its ranks instead: the sum over the lists it appears in of
+    `1 / (rrf_k + rank)`. Every list has to be sorted from its best hit. Hits are collapsed to one per
+    document, keeping the best ranked one, e.g. the best matching segment of a transcript, which is
+    returned with its fused score.
+    """
+    fused_scores: Dict[str, float] = {}
+    best_hits: Dict[str, Tuple[int, float, MediaData]] = {}
+    for results in result_lists:
+        rank = 0
+        seen = set()
+        for media_data in results:
+            document_id = get_document_id(media_data)
+            if document_id in seen:
+                continue
+            seen.add(document_id)
+            rank += 1
+            fused_scores[document_id] = fused_scores.get(document_id, 0.0) + 1.0 / (
+                rrf_k + rank
+            )
+            # Ties between collections go to the hit with the best score of its own
+            ranking = (rank, -media_data.get("score", 0.0))
+            best_hit = best_hits.get(document_id)
+            if best_hit is None or ranking < best_hit[:2]:
+                best_hits[document_id] = (*ranking, media_data)
+    # Ties keep the order the documents were first seen in
+    top = heapq.nlargest(n_results, fused_scores.items(), key=lambda item: item[1])
+    return [
+        {**best_hits[document_id][2], "fused_score": fused_score}
+        for document_id, fused_score in top
+    ]